@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU map whose entries also expire ``ttl`` seconds after they were set."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one; every caller gets its outcome.
+
+    The in-flight call is a ``concurrent.futures.Future``, so threads block on it and
+    coroutines await it from any event loop. ``do``/``do_async`` return ``(value, shared)``
+    where ``shared`` is True for callers that waited on someone else's call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = self._calls[key] = Future()
+            return call, True
+
+    def _settle(self, key: Hashable, call: Future, value: Any = None, error: BaseException | None = None) -> None:
+        # Forget the key first: callers arriving after this start a fresh call
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is None:
+            call.set_result(value)
+        else:
+            call.set_exception(error)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        call, leader = self._join(key)
+        if not leader:
+            return call.result(), True
+        try:
+            value = fn()
+        except BaseException as e:
+            self._settle(key, call, error=e)
+            raise
+        self._settle(key, call, value)
+        return value, False
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        call, leader = self._join(key)
+        if not leader:
+            # A cancelled waiter must not cancel the call the others are waiting on
+            return await asyncio.shield(asyncio.wrap_future(call)), True
+        try:
+            value = await fn()
+        except BaseException as e:
+            self._settle(key, call, error=e)
+            raise
+        self._settle(key, call, value)
+        return value, False
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class BloomFilter:
+    """Set membership with no false negatives; ``False`` from ``might_contain`` means never added."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        positions = self._positions(key)
+        # Setting a bit is a read-modify-write of its byte; concurrent adds must not lose bits
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def might_contain(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bits = bytearray(len(self._bits))
+            self.count = 0
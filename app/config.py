@@ -13,13 +13,154 @@ def get_database_url() -> str:
     return f"sqlite:///{db_path}"
 
 
+def get_async_database_url(url: str) -> str:
+    env_url = os.getenv("ASYNC_DATABASE_URL")
+    if env_url:
+        return env_url
+    return to_async_driver(url)
+
+
+def get_async_read_url(url: str | None) -> str | None:
+    env_url = os.getenv("ASYNC_DATABASE_READ_URL")
+    if env_url:
+        return env_url
+    return to_async_driver(url) if url else None
+
+
+def to_async_driver(url: str) -> str:
+    # Swap the sync driver for its asyncio counterpart
+    scheme, _, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect in {"postgresql", "postgres"}:
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def env_route_map(name: str, default: str = "") -> dict[str, float]:
+    # "/chat/inbound=800,/chat/reply=500" -> {"/chat/inbound": 800.0, "/chat/reply": 500.0}
+    routes = {}
+    for item in os.getenv(name, default).split(","):
+        route, _, value = item.partition("=")
+        if route.strip() and value.strip():
+            routes[route.strip()] = float(value)
+    return routes
+
+
 class Settings:
     database_url: str = get_database_url()
+    async_database_url: str = get_async_database_url(database_url)
+    # Engine profile: auto (from the URL's dialect), sqlite, postgresql or default (driver defaults)
+    database_profile: str = os.getenv("DATABASE_PROFILE", "auto")
+    # Optional read-only engine (e.g. a Postgres replica) for job listings, slot previews and proposal lookups
+    database_read_url: str | None = os.getenv("DATABASE_READ_URL") or None
+    async_database_read_url: str | None = get_async_read_url(database_read_url)
+    # sqlite profile, applied on every new connection
+    sqlite_journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # Negative values are KiB, as in PRAGMA cache_size
+    sqlite_cache_size: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+    # postgresql profile: connection pool per engine (and per process)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    # Fraction of info-level events to keep, e.g. "lead_received=0.1,inbound_understood=0.5"
+    log_sample_rates: str = os.getenv("LOG_SAMPLE_RATES", "")
     app_name: str = os.getenv("APP_NAME", "revin-mini")
     openai_api_key: str | None = os.getenv("OPENAI_API_KEY")
+    # Shared LLM client: connection pool size and per-operation timeout (s) / retry budget
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    llm_max_keepalive: int = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+    llm_timeout_proposal: float = float(os.getenv("LLM_TIMEOUT_PROPOSAL", "10"))
+    llm_timeout_extract: float = float(os.getenv("LLM_TIMEOUT_EXTRACT", "8"))
+    llm_timeout_classify: float = float(os.getenv("LLM_TIMEOUT_CLASSIFY", "5"))
+    llm_retries_proposal: int = int(os.getenv("LLM_RETRIES_PROPOSAL", "1"))
+    llm_retries_extract: int = int(os.getenv("LLM_RETRIES_EXTRACT", "1"))
+    llm_retries_classify: int = int(os.getenv("LLM_RETRIES_CLASSIFY", "0"))
+    # Cap on extraction/classification calls per request; further calls use the local fallback
+    llm_max_nlu_calls_per_request: int = int(os.getenv("LLM_MAX_NLU_CALLS_PER_REQUEST", "1"))
+    # How long a request waits on the LLM before answering with the local fallback (the late
+    # answer still fills the cache); LLM_ROUTE_BUDGETS_MS overrides per route, 0 waits the full timeout
+    llm_budget_ms: float = float(os.getenv("LLM_BUDGET_MS", "800"))
+    llm_route_budgets_ms: dict[str, float] = env_route_map("LLM_ROUTE_BUDGETS_MS")
+    # Circuit breaker: after this many failed or over-budget calls in a row, skip the LLM for the cooldown
+    llm_breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    llm_breaker_cooldown_seconds: float = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+    # Local first-pass reply classifier (scripts/train_reply_model.py); replies below the
+    # confidence floor go to the LLM. An empty path disables it.
+    reply_model_path: str | None = os.getenv(
+        "REPLY_MODEL_PATH", str(Path(__file__).resolve().parent.parent / "data" / "reply_model.json")
+    ) or None
+    reply_model_min_confidence: float = float(os.getenv("REPLY_MODEL_MIN_CONFIDENCE", "0.8"))
+    # NLU result cache; set NLU_CACHE_DB to a file path to persist entries across restarts
+    nlu_cache_size: int = int(os.getenv("NLU_CACHE_SIZE", "4096"))
+    nlu_cache_ttl_seconds: float = float(os.getenv("NLU_CACHE_TTL_SECONDS", "86400"))
+    nlu_cache_path: str | None = os.getenv("NLU_CACHE_DB") or None
+    # Local service matcher: below this confidence the LLM is asked to extract the service
+    service_match_min_confidence: float = float(os.getenv("SERVICE_MATCH_MIN_CONFIDENCE", "0.7"))
+    # Phone -> tenant directory: polled for changes; POST /admin/tenants/reload forces a reload
+    tenant_directory_refresh_seconds: float = float(os.getenv("TENANT_DIRECTORY_REFRESH_SECONDS", "30"))
+    service_catalog_refresh_seconds: float = float(os.getenv("SERVICE_CATALOG_REFRESH_SECONDS", "60"))
+    service_synonyms_file: str | None = os.getenv("SERVICE_SYNONYMS_FILE") or None
+    # In-process free-slot index in front of the capacity table
+    slot_index_enabled: bool = env_bool("SLOT_INDEX_ENABLED")
+    slot_index_reconcile_seconds: float = float(os.getenv("SLOT_INDEX_RECONCILE_SECONDS", "30"))
+    # How long a proposed slot stays reserved for the customer
+    proposal_hold_seconds: float = float(os.getenv("PROPOSAL_HOLD_SECONDS", "900"))
+    # Per-process cache of each phone's open proposal for /chat/reply and /sms/callback
+    conversation_cache_size: int = int(os.getenv("CONVERSATION_CACHE_SIZE", "50000"))
+    conversation_cache_ttl_seconds: float = float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "900"))
+    # Proposal text templates: variants generated per (tenant, service), optional JSON config
+    proposal_templates_file: str | None = os.getenv("PROPOSAL_TEMPLATES_FILE") or None
+    proposal_template_variants: int = int(os.getenv("PROPOSAL_TEMPLATE_VARIANTS", "3"))
+    proposal_template_refresh_seconds: float = float(os.getenv("PROPOSAL_TEMPLATE_REFRESH_SECONDS", "300"))
+    # Outgoing SMS: provider (log | mock) and the outbox delivery worker
+    sms_provider: str = os.getenv("SMS_PROVIDER", "log")
+    sms_mock_delay_ms: float = float(os.getenv("SMS_MOCK_DELAY_MS", "0"))
+    outbox_poll_seconds: float = float(os.getenv("OUTBOX_POLL_SECONDS", "0.5"))
+    outbox_batch_size: int = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+    outbox_concurrency: int = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+    outbox_backoff_seconds: float = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "2"))
+    outbox_backoff_max_seconds: float = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "300"))
+    # A claimed batch not finished within this long (worker crash) is picked up again
+    outbox_lease_seconds: float = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
 
+    # Maintenance sweeper (0 disables): each run deletes at most max_batches x batch_size rows per
+    # table, one short transaction per batch
+    maintenance_interval_seconds: float = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "300"))
+    maintenance_batch_size: int = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+    maintenance_max_batches: int = int(os.getenv("MAINTENANCE_MAX_BATCHES", "20"))
+    # Retention: unbooked windows that started this long ago, booked ones (the job keeps the booking)
+    capacity_retention_hours: float = float(os.getenv("CAPACITY_RETENTION_HOURS", "24"))
+    capacity_booked_retention_days: float = float(os.getenv("CAPACITY_BOOKED_RETENTION_DAYS", "90"))
+    # PROPOSED proposals older than this become EXPIRED and release their hold
+    proposal_expire_seconds: float = float(os.getenv("PROPOSAL_EXPIRE_SECONDS", "86400"))
+    proposal_retention_days: float = float(os.getenv("PROPOSAL_RETENTION_DAYS", "30"))
+    # A retry of an event older than this is treated as a new event
+    idempotency_retention_days: float = float(os.getenv("IDEMPOTENCY_RETENTION_DAYS", "30"))
+    # SENT and DEAD outbox rows
+    outbox_retention_days: float = float(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
 
-settings = Settings()
+    # POST /leads/batch: leads per transaction (one claim per group, one executemany per table)
+    bulk_chunk_size: int = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+    # Bloom filter of idempotency keys, warmed at startup; new events skip the lookup
+    idempotency_filter_enabled: bool = env_bool("IDEMPOTENCY_FILTER_ENABLED")
+    idempotency_filter_capacity: int = int(os.getenv("IDEMPOTENCY_FILTER_CAPACITY", "1000000"))
+    idempotency_filter_error_rate: float = float(os.getenv("IDEMPOTENCY_FILTER_ERROR_RATE", "0.01"))
 
 
+settings = Settings()
+
@@ -1,15 +1,170 @@
+import time
+from datetime import datetime
 from contextlib import contextmanager
-from typing import Iterator
+from contextvars import ContextVar
+from functools import wraps
+from typing import AsyncIterator, Iterator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Delete, Insert, Update, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 
+from app import metrics
 from app.config import settings
 
 
-# SQLite needs check_same_thread=False for use with FastAPI default threading model
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def engine_profile(url: str) -> str:
+    if settings.database_profile != "auto":
+        return settings.database_profile
+    return make_url(url).get_backend_name()
+
+
+def engine_options(url: str) -> dict:
+    """create_engine keyword arguments for the profile that ``url`` runs under."""
+    profile = engine_profile(url)
+    if profile == "sqlite":
+        # FastAPI runs sync code on a threadpool; connections move between threads
+        return {"connect_args": {"check_same_thread": False}} if make_url(url).get_driver_name() == "pysqlite" else {}
+    if profile == "postgresql":
+        return {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": True,
+        }
+    return {}
+
+
+def sqlite_pragmas(read_only: bool = False) -> list[str]:
+    # WAL lets readers run alongside the single writer; busy_timeout makes writers
+    # queue instead of failing with "database is locked"
+    pragmas = [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA cache_size={settings.sqlite_cache_size}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _apply_profile(target, url: str, read_only: bool = False) -> None:
+    if engine_profile(url) != "sqlite":
+        return
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _make_engine(url: str, read_only: bool = False):
+    engine = create_engine(url, **engine_options(url))
+    _apply_profile(engine, url, read_only)
+    return engine
+
+
+def _make_async_engine(url: str, read_only: bool = False):
+    engine = create_async_engine(url, **engine_options(url))
+    _apply_profile(engine.sync_engine, url, read_only)
+    return engine
+
+
+_use_read_engine: ContextVar[bool] = ContextVar("use_read_engine", default=False)
+
+
+@contextmanager
+def read_replica() -> Iterator[None]:
+    """Route this block's SELECTs to the read engine, when one is configured."""
+    token = _use_read_engine.set(True)
+    try:
+        yield
+    finally:
+        _use_read_engine.reset(token)
+
+
+def replica_reads(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with read_replica():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Session that sends reads made under ``read_replica()`` to ``info["read_bind"]``.
+
+    Writes and flushes always go to the primary, so a session can read from the
+    replica and then write without any change at the call site.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        read_bind = self.info.get("read_bind")
+        if (
+            read_bind is not None
+            and _use_read_engine.get()
+            and not self._flushing
+            and not isinstance(clause, (Insert, Update, Delete))
+        ):
+            return read_bind
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+engine = _make_engine(settings.database_url)
+read_engine = _make_engine(settings.database_read_url, read_only=True) if settings.database_read_url else None
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, info={"read_bind": read_engine}
+)
+# Sessions that only ever read (exports); the primary when no read engine is configured
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine or engine)
+
+# Request path: routes await I/O on this engine instead of parking a threadpool worker.
+# Objects stay loaded after commit because touching an expired attribute would need I/O.
+async_engine = _make_async_engine(settings.async_database_url)
+async_read_engine = (
+    _make_async_engine(settings.async_database_read_url, read_only=True) if settings.async_database_read_url else None
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    info={"read_bind": async_read_engine.sync_engine if async_read_engine else None},
+)
+
+
+def _instrument(target, name: str) -> None:
+    # Time every statement; the metrics middleware also totals them per request
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        metrics.db_queries.observe(elapsed, name)
+        usage = metrics.db_usage.get()
+        if usage is not None:
+            usage.queries += 1
+            usage.seconds += elapsed
+
+
+_instrument(engine, "sync")
+_instrument(async_engine.sync_engine, "async")
+if read_engine is not None:
+    _instrument(read_engine, "read")
+if async_read_engine is not None:
+    _instrument(async_read_engine.sync_engine, "async_read")
 
 
 def get_db() -> Iterator[Session]:
@@ -20,7 +175,121 @@ def get_db() -> Iterator[Session]:
         db.close()
 
 
-def init_db(Base) -> None:
-    Base.metadata.create_all(bind=engine)
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def init_db(Base, bind=None) -> None:
+    bind = bind if bind is not None else engine
+    Base.metadata.create_all(bind=bind)
+    added = _add_missing_columns(Base, bind)
+    _migrate_capacity_counts(bind, added)
+    _unique_capacity_windows(Base, bind)
+
+
+def _add_missing_columns(Base, bind) -> set[tuple[str, str]]:
+    # create_all never alters existing tables; add columns introduced since the DB was created.
+    # Only nullable or server-defaulted columns can be added in place. Returns (table, column) added.
+    added = set()
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+                added.add((table.name, column.name))
+            for index in table.indexes:
+                # Existing rows may violate a new unique index; the data migrations create those
+                if not index.unique:
+                    index.create(conn, checkfirst=True)
+    return added
+
+
+def _migrate_capacity_counts(bind, added: set[tuple[str, str]]) -> None:
+    # capacity used to hold one row per bookable unit, with booked_bool and a soft hold
+    # (held_by, held_until) on the row itself. Fold those rows into counted windows and
+    # move live holds to capacity_holds, then drop the old columns. Runs once.
+    inspector = inspect(bind)
+    if not inspector.has_table("capacity"):
+        return
+    columns = {col["name"] for col in inspector.get_columns("capacity")}
+    if "booked_bool" not in columns:
+        if ("capacity", "available") in added:
+            with bind.begin() as conn:
+                conn.execute(text("UPDATE capacity SET available = total - booked - held"))
+        return
+    legacy = {"booked_bool", "held_by", "held_until"}
+    legacy_indexes = [ix["name"] for ix in inspector.get_indexes("capacity") if legacy & set(ix["column_names"])]
+    with bind.begin() as conn:
+        conn.execute(text("UPDATE capacity SET total = 1, booked = CASE WHEN booked_bool THEN 1 ELSE 0 END, held = 0"))
+        if {"held_by", "held_until"} <= columns:
+            conn.execute(
+                text(
+                    "INSERT INTO capacity_holds (holder, capacity_id, held_until) "
+                    "SELECT held_by, id, held_until FROM capacity "
+                    "WHERE held_by IS NOT NULL AND NOT booked_bool AND held_until > :now"
+                ),
+                {"now": datetime.utcnow()},
+            )
+            conn.execute(text("UPDATE capacity SET held = 1 WHERE id IN (SELECT capacity_id FROM capacity_holds)"))
+        _merge_capacity_windows(conn)
+        conn.execute(text("UPDATE capacity SET available = total - booked - held"))
+        for name in legacy_indexes:
+            conn.execute(text(f"DROP INDEX {name}"))
+        for name in sorted(legacy & columns):
+            conn.execute(text(f"ALTER TABLE capacity DROP COLUMN {name}"))
+
+
+_WINDOW = "tenant_id, service, start_dt, end_dt"
+
+
+def _merge_capacity_windows(conn) -> bool:
+    # Fold rows sharing a window into the lowest id, summing the counts and re-pointing holds.
+    # Returns whether anything was merged; callers recompute ``available`` afterwards.
+    groups = conn.execute(
+        text(
+            f"SELECT MIN(id) AS id, SUM(total) AS total, SUM(booked) AS booked, SUM(held) AS held "
+            f"FROM capacity GROUP BY {_WINDOW} HAVING COUNT(*) > 1"
+        )
+    ).mappings().all()
+    if groups:
+        conn.execute(text("UPDATE capacity SET total = :total, booked = :booked, held = :held WHERE id = :id"), groups)
+        conn.execute(
+            text(
+                "UPDATE capacity_holds SET capacity_id = ("
+                "SELECT MIN(k.id) FROM capacity c JOIN capacity k ON k.tenant_id = c.tenant_id "
+                "AND k.service = c.service AND k.start_dt = c.start_dt AND k.end_dt = c.end_dt "
+                "WHERE c.id = capacity_holds.capacity_id)"
+            )
+        )
+        conn.execute(text(f"DELETE FROM capacity WHERE id NOT IN (SELECT MIN(id) FROM capacity GROUP BY {_WINDOW})"))
+    return bool(groups)
 
 
+def _unique_capacity_windows(Base, bind) -> None:
+    # idx_capacity_tenant_service_start used to be a plain (tenant_id, service, start_dt)
+    # index; it is now unique over the whole window so imports can ON CONFLICT DO NOTHING.
+    table = Base.metadata.tables.get("capacity")
+    inspector = inspect(bind)
+    if table is None or not inspector.has_table("capacity"):
+        return
+    index = next(ix for ix in table.indexes if ix.name == "idx_capacity_tenant_service_start")
+    current = {ix["name"]: ix for ix in inspector.get_indexes("capacity")}.get(index.name)
+    if current is not None and current.get("unique"):
+        return
+    with bind.begin() as conn:
+        if _merge_capacity_windows(conn):
+            conn.execute(text("UPDATE capacity SET available = total - booked - held"))
+        if current is not None:
+            conn.execute(text(f"DROP INDEX {index.name}"))
+        index.create(conn)
@@ -1,31 +1,99 @@
+import atexit
 import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
-from datetime import datetime
+import time
 
 from app.config import settings
 
+try:  # optional: ~5x faster encoding when installed
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def _dumps(payload: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=str).decode()
+    return json.dumps(payload, default=str)
+
 
 class JsonFormatter(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__()
+        self._ts_second = -1
+        self._ts_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        # strftime once per second; records within the same second only add milliseconds
+        second = int(created)
+        if second != self._ts_second:
+            self._ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._ts_second = second
+        return f"{self._ts_prefix}.{int((created - second) * 1000):03d}Z"
+
     def format(self, record: logging.LogRecord) -> str:
         payload = {
-            "ts": datetime.utcnow().isoformat() + "Z",
+            "ts": self._timestamp(record.created),
             "level": record.levelname,
             "message": record.getMessage(),
             "logger": record.name,
         }
-        # Include common tracing fields if provided via logging extra
-        for key in ("tenant_id", "event_id", "job_id"):
-            if key in record.__dict__:
-                payload[key] = record.__dict__[key]
-        return json.dumps(payload)
+        # Pass through every field supplied via logging extra
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return _dumps(payload)
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    # "lead_received=0.1,inbound_understood=0.5" -> {"lead_received": 0.1, ...}
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class SampleFilter(logging.Filter):
+    """Keep only a fraction of high-volume events; warnings and errors are never sampled."""
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.msg) if record.levelno < logging.WARNING else None
+        return rate is None or random.random() < rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records stay in-process, so skip the stock copy-and-format; formatting
+        # happens on the listener thread
+        return record
 
 
 log = logging.getLogger("revin")
 log.setLevel(getattr(logging, settings.log_level.upper(), logging.INFO))
 handler = logging.StreamHandler(sys.stdout)
 handler.setFormatter(JsonFormatter())
+# Request threads only enqueue; one listener thread formats and writes to stdout
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+listener = logging.handlers.QueueListener(_queue, handler, respect_handler_level=True)
 log.handlers.clear()
-log.addHandler(handler)
-
-
+log.filters.clear()
+log.addHandler(_QueueHandler(_queue))
+log.addFilter(SampleFilter(parse_sample_rates(settings.log_sample_rates)))
+listener.start()
+atexit.register(listener.stop)
@@ -1,5 +1,12 @@
-from fastapi import FastAPI, Depends
-from sqlalchemy.orm import Session
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Literal
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas import (
     LeadIn,
@@ -14,48 +21,98 @@ from app.schemas import (
     ChatReplyIn,
     ChatReplyOut,
 )
-from app.db import get_db, init_db
-from app.models import Base, Job
+from app.db import get_async_db, init_db
+from app.models import Base
 from app.services.intent import classify_intent
 from app.services.capacity import pick_slot
-from app.services.booking import book_job
-from app.services.notify import send_confirmation
+from app.services.booking import book_job, get_idempotent_job
 from app.logging import log
-from app.services.capacity import preview_slot
-from app.services.llm import generate_booking_proposal
+from app.services.capacity import hold_slot
+from app.services.llm import generate_booking_proposal_async
 from app.services.proposal import (
+    cancel_proposal,
     create_proposal,
+    new_proposal_id,
+    release_proposal_hold,
     get_proposal_by_message_id,
     confirm_proposal,
     get_latest_proposal_by_phone,
-    resolve_tenant_by_phone,
 )
-from app.services.llm import extract_entities_from_text, classify_reply_text
-from app.services.capacity import next_slot
+from app.services.llm import classify_reply_text_async
+from app.services.nlu import understand_inbound_async
+from app.services.catalog import service_catalog
+from app.services.templates import proposal_templates
+from app.services.outbox import run_outbox
+from app.services.idempotency import idempotency_filter
+from app.services.bulk import book_leads, iter_lead_chunks, iter_records
+from app.services.capacity_import import import_capacity, parse_capacity
+from app.services.maintenance import sweep
+from app.services.tenants import tenant_directory
+from app.services.jobs import JobFilter, export_jobs, list_jobs as query_jobs
+from app.services.capacity import reconcile_slot_index
+from app.config import settings
+from app.tasks import PeriodicTask
+from app.middleware import LLMCallScopeMiddleware, MetricsMiddleware
+from app import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks: list[PeriodicTask] = []
+    if settings.idempotency_filter_enabled:
+        log.info("idempotency_filter_warmed", extra={"keys": idempotency_filter.warm()})
+    if settings.slot_index_enabled:
+        count = reconcile_slot_index()
+        log.info("slot_index_warmed", extra={"slots": count})
+        tasks.append(PeriodicTask("slot-index-reconcile", settings.slot_index_reconcile_seconds, reconcile_slot_index).start())
+    log.info("tenant_directory_loaded", extra={"phones": tenant_directory.reload()})
+    tasks.append(PeriodicTask("tenant-directory-refresh", settings.tenant_directory_refresh_seconds, tenant_directory.refresh).start())
+    log.info("service_catalog_loaded", extra={"pairs": service_catalog.refresh()})
+    tasks.append(PeriodicTask("service-catalog-refresh", settings.service_catalog_refresh_seconds, service_catalog.refresh).start())
+    log.info("proposal_templates_loaded", extra={"templates": proposal_templates.refresh()})
+    tasks.append(PeriodicTask("proposal-template-refresh", settings.proposal_template_refresh_seconds, proposal_templates.refresh).start())
+    tasks.append(PeriodicTask("outbox-delivery", settings.outbox_poll_seconds, run_outbox).start())
+    if settings.maintenance_interval_seconds > 0:
+        tasks.append(PeriodicTask("maintenance", settings.maintenance_interval_seconds, sweep).start())
+    yield
+    for task in tasks:
+        task.stop()
 
 
 def create_app() -> FastAPI:
     init_db(Base)
-    app = FastAPI(title="revin-mini")
+    app = FastAPI(title="revin-mini", lifespan=lifespan)
+    app.add_middleware(LLMCallScopeMiddleware)
+    app.add_middleware(MetricsMiddleware)
 
     @app.get("/healthz", response_model=HealthOut)
-    def healthz() -> HealthOut:
+    async def healthz() -> HealthOut:
         return HealthOut(ok=True)
 
+    @app.get("/metrics")
+    async def metrics_endpoint():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    @app.post("/admin/tenants/reload")
+    async def reload_tenants():
+        phones = await run_in_threadpool(tenant_directory.reload)
+        return {"status": "OK", "phones": phones}
+
     @app.post("/lead", response_model=JobOut | HandoffOut | NeedsDispatchOut)
-    def handle_lead(lead: LeadIn, db: Session = Depends(get_db)):
+    async def handle_lead(lead: LeadIn, db: AsyncSession = Depends(get_async_db)):
         log.info("lead_received", extra={"tenant_id": lead.tenant_id, "event_id": lead.event_id})
         intent = classify_intent(lead)
         if intent != "book":
             return HandoffOut(reason=intent)
 
-        slot = pick_slot(db, lead.tenant_id, lead.service)
-        if not slot:
-            log.warning("no_capacity", extra={"tenant_id": lead.tenant_id, "event_id": lead.event_id})
-            return NeedsDispatchOut()
-
-        job = book_job(db, lead, slot)
-        send_confirmation(job)
+        # Retries of a booked event return the stored job without claiming another slot
+        job = await db.run_sync(get_idempotent_job, lead.event_id)
+        if not job:
+            slot = await db.run_sync(pick_slot, lead.tenant_id, lead.service)
+            if not slot:
+                log.warning("no_capacity", extra={"tenant_id": lead.tenant_id, "event_id": lead.event_id})
+                return NeedsDispatchOut()
+            job = await db.run_sync(book_job, lead, slot)
         log.info(
             "job_booked",
             extra={"tenant_id": job.tenant_id, "event_id": job.source_event_id, "job_id": job.job_id},
@@ -71,42 +128,82 @@ def create_app() -> FastAPI:
             source_event=job.source_event_id,
         )
 
+    @app.post("/leads/batch")
+    async def handle_leads_batch(request: Request, db: AsyncSession = Depends(get_async_db)):
+        # Body is a JSON array of leads or NDJSON (one lead per line); results come back in input order
+        results = []
+        async for chunk in iter_lead_chunks(request.stream(), settings.bulk_chunk_size):
+            results.extend(await db.run_sync(book_leads, chunk))
+        counts = Counter(r["status"] for r in results)
+        log.info("lead_batch_processed", extra={"leads": len(results), **counts})
+        return {"counts": dict(counts), "results": results}
+
+    @app.post("/capacity/bulk")
+    async def import_capacity_bulk(request: Request, db: AsyncSession = Depends(get_async_db)):
+        # JSON array, NDJSON, or CSV (Content-Type: text/csv) with a header row:
+        # tenant_id,service,start[,end|duration_minutes][,total][,booked]
+        csv_body = request.headers.get("content-type", "").startswith("text/csv")
+        totals = Counter()
+        async for chunk in iter_records(request.stream(), settings.bulk_chunk_size, parse_capacity, csv_body=csv_body):
+            totals.update(await db.run_sync(import_capacity, chunk))
+        # Rebuild the service catalog off the request path so new services become matchable
+        service_catalog.invalidate()
+        log.info("capacity_imported", extra=dict(totals))
+        return {"inserted": totals["inserted"], "duplicates": totals["duplicates"], "invalid": totals["invalid"]}
+
     @app.get("/jobs")
-    def list_jobs(db: Session = Depends(get_db)):
-        rows = db.query(Job).order_by(Job.created_at.desc()).limit(50).all()
-        return [
-            {
-                "job_id": j.job_id,
-                "tenant_id": j.tenant_id,
-                "customer_name": j.customer_name,
-                "service": j.service,
-                "slot_start": j.slot_start.isoformat(),
-                "slot_end": j.slot_end.isoformat(),
-                "status": j.status,
-            }
-            for j in rows
-        ]
+    async def list_jobs(
+        response: Response,
+        tenant_id: str | None = None,
+        status: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        limit: int = Query(50, ge=1, le=500),
+        cursor: str | None = None,
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        # Newest first; pass the X-Next-Cursor header back as ?cursor= for the next page
+        filters = JobFilter(tenant_id=tenant_id, status=status, created_from=created_from, created_to=created_to)
+        try:
+            rows, next_cursor = await db.run_sync(query_jobs, filters, limit, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return rows
+
+    @app.get("/jobs/export")
+    async def export_jobs_stream(
+        format: Literal["ndjson", "csv"] = "ndjson",
+        tenant_id: str | None = None,
+        status: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+    ):
+        # Starlette drains the sync generator in its threadpool; it opens its own session
+        filters = JobFilter(tenant_id=tenant_id, status=status, created_from=created_from, created_to=created_to)
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(export_jobs(filters, format), media_type=media_type)
 
     @app.post("/lead/propose", response_model=ProposalOut | HandoffOut | NeedsDispatchOut)
-    def propose_lead(lead: LeadIn, db: Session = Depends(get_db)):
+    async def propose_lead(lead: LeadIn, db: AsyncSession = Depends(get_async_db)):
         log.info("lead_received", extra={"tenant_id": lead.tenant_id, "event_id": lead.event_id})
         intent = classify_intent(lead)
         if intent != "book":
             return HandoffOut(reason=intent)
 
-        slot = preview_slot(db, lead.tenant_id, lead.service)
+        proposal_id = new_proposal_id()
+        slot = await db.run_sync(hold_slot, lead.tenant_id, lead.service, holder=proposal_id)
         if not slot:
             log.warning("no_capacity", extra={"tenant_id": lead.tenant_id, "event_id": lead.event_id})
             return NeedsDispatchOut()
 
         start, end = slot
-        text = generate_booking_proposal(lead, start, end)
+        text = await generate_booking_proposal_async(lead, start, end)
 
-        # Send SMS via mock, save proposal
-        from app.services.notify import send_sms
-
-        message_id = send_sms(lead.phone, text)
-        proposal = create_proposal(db, lead, start, end, text, message_id)
+        # Save proposal; its SMS is queued in the same transaction
+        proposal = await db.run_sync(create_proposal, lead, start, end, text, proposal_id=proposal_id)
+        message_id = proposal.message_id
         log.info(
             "proposal_sent",
             extra={"tenant_id": lead.tenant_id, "event_id": lead.event_id, "job_id": proposal.proposal_id},
@@ -114,17 +211,16 @@ def create_app() -> FastAPI:
         return ProposalOut(proposal_id=proposal.proposal_id, message_id=message_id)
 
     @app.post("/sms/callback")
-    def sms_callback(payload: SmsCallbackIn, db: Session = Depends(get_db)):
-        proposal = get_proposal_by_message_id(db, payload.message_id)
+    async def sms_callback(payload: SmsCallbackIn, db: AsyncSession = Depends(get_async_db)):
+        proposal = await db.run_sync(get_proposal_by_message_id, payload.message_id, payload.from_phone)
         if not proposal or proposal.phone != payload.from_phone:
             return {"status": "IGNORED"}
 
         body = payload.body.strip().lower()
         if body in {"yes", "y", "confirm", "ok"}:
-            job = confirm_proposal(db, proposal)
+            job = await db.run_sync(confirm_proposal, proposal)
             if not job:
                 return {"status": "NEEDS_DISPATCH"}
-            send_confirmation(job)
             return {
                 "status": "BOOKED",
                 "job_id": job.job_id,
@@ -138,21 +234,23 @@ def create_app() -> FastAPI:
             return {"status": "IGNORED"}
 
     @app.post("/chat/inbound", response_model=ChatInboundOut)
-    def chat_inbound(payload: ChatInboundIn, db: Session = Depends(get_db)):
-        # Resolve tenant by phone first; fall back to NLU extraction
-        tenant_id = resolve_tenant_by_phone(db, payload.from_phone)
-        log.info("tenant_resolved", extra={"phone": payload.from_phone, "tenant_id": tenant_id})
-        if not tenant_id:
-            entities = extract_entities_from_text(payload.text)
-            tenant_id = entities.get("tenant_id")
-            log.info("tenant_from_nlu", extra={"tenant_id": tenant_id})
-        # Always use NLU for service from text (or simple heuristics)
-        service = extract_entities_from_text(payload.text).get("service")
-        log.info("service_extracted", extra={"service": service})
+    async def chat_inbound(payload: ChatInboundIn, db: AsyncSession = Depends(get_async_db)):
+        # Resolve tenant by phone first; one NLU pass supplies the fallback tenant, service and intent
+        phone_tenant = tenant_directory.resolve(payload.from_phone)
+        log.info("tenant_resolved", extra={"phone": payload.from_phone, "tenant_id": phone_tenant})
+        nlu = await understand_inbound_async(payload.text, tenant_id=phone_tenant)
+        tenant_id, service = nlu.tenant_id, nlu.service
+        log.info(
+            "inbound_understood",
+            extra={"tenant_id": tenant_id, "service": service, "intent": nlu.intent, "tenant_source": nlu.tenant_source},
+        )
         if not tenant_id or not service:
             return ChatInboundOut(status="HANDOFF", message="Could not determine tenant or service.")
+        if nlu.intent != "book":
+            return ChatInboundOut(status="HANDOFF", tenant_id=tenant_id, service=service, message=f"Routing {nlu.intent} request to our team.")
 
-        slot = preview_slot(db, tenant_id, service)
+        proposal_id = new_proposal_id()
+        slot = await db.run_sync(hold_slot, tenant_id, service, holder=proposal_id)
         if not slot:
             return ChatInboundOut(status="NEEDS_DISPATCH", tenant_id=tenant_id, service=service)
         start, end = slot
@@ -168,11 +266,8 @@ def create_app() -> FastAPI:
             address=None,
             service=service,
         )
-        text = generate_booking_proposal(lead, start, end)
-        from app.services.notify import send_sms
-
-        message_id = send_sms(payload.from_phone, text)
-        proposal = create_proposal(db, lead, start, end, text, message_id)
+        text = await generate_booking_proposal_async(lead, start, end)
+        proposal = await db.run_sync(create_proposal, lead, start, end, text, proposal_id=proposal_id)
         return ChatInboundOut(
             status="PROPOSED",
             tenant_id=tenant_id,
@@ -182,24 +277,29 @@ def create_app() -> FastAPI:
         )
 
     @app.post("/chat/reply", response_model=ChatReplyOut)
-    def chat_reply(payload: ChatReplyIn, db: Session = Depends(get_db)):
+    async def chat_reply(payload: ChatReplyIn, db: AsyncSession = Depends(get_async_db)):
         # Find the latest proposal for this phone
-        proposal = get_latest_proposal_by_phone(db, payload.from_phone)
+        proposal = await db.run_sync(get_latest_proposal_by_phone, payload.from_phone)
         if not proposal:
             return ChatReplyOut(status="HANDOFF", message="No active proposal found.")
 
-        label = classify_reply_text(payload.text)
+        label = await classify_reply_text_async(payload.text)
         if label == "yes":
-            job = confirm_proposal(db, proposal)
+            job = await db.run_sync(confirm_proposal, proposal)
             if not job:
                 return ChatReplyOut(status="NEEDS_DISPATCH", proposal_id=proposal.proposal_id)
-            send_confirmation(job)
             confirmation_msg = f"Confirmed! Your {job.service} is booked for {job.slot_start.strftime('%B %d, %Y at %-I:%M %p')}. See you then!"
             return ChatReplyOut(status="BOOKED", job_id=job.job_id, proposal_id=proposal.proposal_id, message=confirmation_msg)
-        elif label == "no":
-            ns = next_slot(db, proposal.tenant_id, proposal.service, after=proposal.slot_start)
+        elif label == "cancel":
+            await db.run_sync(cancel_proposal, proposal)
+            return ChatReplyOut(status="CANCELLED", proposal_id=proposal.proposal_id, message="No problem, we've cancelled that visit.")
+        elif label in {"no", "reschedule"}:
+            new_id = new_proposal_id()
+            ns = await db.run_sync(hold_slot, proposal.tenant_id, proposal.service, holder=new_id, after=proposal.slot_start)
             if not ns:
                 return ChatReplyOut(status="NEEDS_DISPATCH", proposal_id=proposal.proposal_id)
+            # The customer declined this time; let someone else have it
+            await db.run_sync(release_proposal_hold, proposal)
             start, end = ns
             # Build a new proposal message
             from types import SimpleNamespace
@@ -211,10 +311,8 @@ def create_app() -> FastAPI:
                 address=proposal.address,
                 service=proposal.service,
             )
-            new_text = generate_booking_proposal(lead_like, start, end)
-            from app.services.notify import send_sms
-            new_msg = send_sms(proposal.phone, new_text)
-            new_prop = create_proposal(db, lead_like, start, end, new_text, new_msg)
+            new_text = await generate_booking_proposal_async(lead_like, start, end)
+            new_prop = await db.run_sync(create_proposal, lead_like, start, end, new_text, proposal_id=new_id)
             return ChatReplyOut(status="PROPOSED", proposal_id=new_prop.proposal_id, message=new_text)
         else:
             return ChatReplyOut(status="CLARIFY", proposal_id=proposal.proposal_id, message="Please reply YES to confirm or say RESCHEDULE.")
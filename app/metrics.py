@@ -0,0 +1,186 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+
+# Seconds; spans sub-millisecond cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Sharded:
+    """Per-thread value shards: writers only touch their own thread's dict, so the hot
+    path takes no lock; ``collect`` merges the shards when /metrics is scraped."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _snapshots(self) -> list[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict() copies in one C call, so a concurrent writer cannot tear the copy
+        return [dict(shard) for shard in shards]
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__()
+        self.name, self.help, self.labelnames = name, help, labelnames
+
+    def inc(self, *labels: str, value: float = 1.0) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0.0) + value
+
+    def collect(self) -> dict[tuple, float]:
+        totals: dict[tuple, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def samples(self) -> Iterator[tuple[str, dict, float]]:
+        for labels, value in sorted(self.collect().items()):
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Histogram(_Sharded):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__()
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # per-bucket counts (last slot is +Inf), then sum
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def collect(self) -> dict[tuple, list]:
+        totals: dict[tuple, list] = {}
+        for shard in self._snapshots():
+            for labels, state in shard.items():
+                total = totals.setdefault(labels, [0] * len(state[:-1]) + [0.0])
+                for i, value in enumerate(list(state)):
+                    total[i] += value
+        return totals
+
+    def samples(self) -> Iterator[tuple[str, dict, float]]:
+        for labels, state in sorted(self.collect().items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", base, state[-1]
+            yield f"{self.name}_count", base, cumulative
+
+
+@dataclass
+class CallbackMetric:
+    """Values read from existing stats at scrape time (cache sizes, per-route call counts)."""
+
+    name: str
+    help: str
+    type: str
+    labelnames: tuple[str, ...]
+    fn: Callable[[], dict[tuple, float]]
+
+    def samples(self) -> Iterator[tuple[str, dict, float]]:
+        for labels, value in sorted(self.fn().items()):
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+REGISTRY: list = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_str}}} {_format_value(value)}" if label_str else f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+http_requests = register(Counter("http_requests_total", "HTTP requests by route and status", ("route", "method", "status")))
+http_latency = register(Histogram("http_request_duration_seconds", "HTTP request latency", ("route", "method")))
+db_queries = register(Histogram("db_query_duration_seconds", "Time per SQL statement", ("engine",)))
+db_request_queries = register(Histogram(
+    "db_queries_per_request", "SQL statements issued while serving one request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+))
+db_request_time = register(Histogram("db_time_per_request_seconds", "SQL time spent serving one request", ("route",)))
+llm_latency = register(Histogram("llm_request_duration_seconds", "External LLM call latency", ("operation", "outcome")))
+nlu_requests = register(Counter(
+    "nlu_requests_total", "Extraction/classification requests by how they were answered", ("operation", "source"),
+))
+llm_budget_exceeded = register(Counter(
+    "llm_budget_exceeded_total", "Requests that answered locally because the LLM missed the latency budget", ("route", "operation"),
+))
+llm_short_circuits = register(Counter("llm_short_circuits_total", "LLM calls skipped while the circuit breaker is open", ("operation",)))
+reply_first_pass = register(Counter(
+    "reply_first_pass_total", "Reply classifications answered locally or escalated to the LLM", ("outcome",),
+))
+llm_coalesced = register(Counter(
+    "llm_calls_coalesced_total", "LLM calls saved by joining an identical in-flight call", ("operation",),
+))
+proposal_texts = register(Counter("proposal_texts_total", "Proposal texts by source", ("source",)))
+sms_send_latency = register(Histogram("sms_send_duration_seconds", "SMS provider send latency", ("outcome",)))
+maintenance_rows = register(Counter("maintenance_rows_total", "Rows deleted or expired by the maintenance sweeper", ("table", "action")))
+
+
+@dataclass
+class DbUsage:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+# Set by the metrics middleware; engine hooks add to it for the request being served
+db_usage: ContextVar[DbUsage | None] = ContextVar("db_usage", default=None)
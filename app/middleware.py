@@ -0,0 +1,77 @@
+import time
+
+from starlette.routing import Match
+
+from app import metrics
+from app.config import settings
+from app.services.llm_client import llm_call_scope
+
+
+def llm_budget(path: str) -> float | None:
+    budget_ms = settings.llm_route_budgets_ms.get(path, settings.llm_budget_ms)
+    return budget_ms / 1000 if budget_ms > 0 else None
+
+
+def route_template(scope) -> str:
+    # The template of the route that will serve the request, resolved before routing runs;
+    # anything else shares "unmatched" so per-route state stays bounded
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return "unmatched"
+
+
+class LLMCallScopeMiddleware:
+    """Open an LLM call scope around each HTTP request so calls are counted per route,
+    capped at ``settings.llm_max_nlu_calls_per_request`` NLU calls and given the route's
+    latency budget. Scopes are keyed by route template, like the metrics labels."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = route_template(scope)
+        with llm_call_scope(route, nlu_limit=settings.llm_max_nlu_calls_per_request, budget=llm_budget(route)):
+            await self.app(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """Record latency, status and per-request SQL usage for each HTTP request.
+
+    Routes are labelled by their path template (``/jobs``, not ``/jobs?cursor=..``);
+    requests that match no route share one ``unmatched`` label to bound cardinality.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        usage = metrics.DbUsage()
+        token = metrics.db_usage.set(usage)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.db_usage.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            metrics.http_requests.inc(route, method, str(status))
+            metrics.http_latency.observe(elapsed, route, method)
+            metrics.db_request_queries.observe(usage.queries, route)
+            metrics.db_request_time.observe(usage.seconds, route)
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, Boolean, Text, Integer, Index
+from sqlalchemy import String, DateTime, Text, Integer, Index
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
 
 
@@ -24,6 +24,13 @@ class Job(Base):
 
 
 Index("idx_jobs_tenant_created", Job.tenant_id, Job.created_at)
+# Keyset pagination across all tenants orders by (created_at, job_id)
+Index("idx_jobs_created_job", Job.created_at, Job.job_id)
+
+
+def _available_default(context) -> int:
+    params = context.get_current_parameters()
+    return (params.get("total") or 1) - (params.get("booked") or 0) - (params.get("held") or 0)
 
 
 class Capacity(Base):
@@ -34,10 +41,49 @@ class Capacity(Base):
     service: Mapped[str] = mapped_column(String)
     start_dt: Mapped[datetime] = mapped_column(DateTime, index=True)
     end_dt: Mapped[datetime] = mapped_column(DateTime)
-    booked_bool: Mapped[bool] = mapped_column(Boolean, default=False)
-
-
-Index("idx_capacity_tenant_service_start", Capacity.tenant_id, Capacity.service, Capacity.start_dt)
+    # Technicians available in the window; booked and held never add up to more than total
+    total: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    booked: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Units reserved by capacity_holds rows, including expired holds not yet released
+    held: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # total - booked - held, kept by every claim and release so "has a free unit" is a
+    # plain column test that the partial index below can serve
+    available: Mapped[int] = mapped_column(Integer, nullable=True, default=_available_default)
+
+
+# One row per window; imports rely on it to skip windows that already exist
+Index(
+    "idx_capacity_tenant_service_start",
+    Capacity.tenant_id,
+    Capacity.service,
+    Capacity.start_dt,
+    Capacity.end_dt,
+    unique=True,
+)
+# Only windows with a unit left; covers the slot lookups (end_dt included) so they never read the table
+_has_free_unit = Capacity.available > 0
+Index(
+    "idx_capacity_free",
+    Capacity.tenant_id,
+    Capacity.service,
+    Capacity.start_dt,
+    Capacity.end_dt,
+    sqlite_where=_has_free_unit,
+    postgresql_where=_has_free_unit,
+)
+
+
+class CapacityHold(Base):
+    """One unit of a capacity window soft-reserved by a proposal; lapses once held_until passes."""
+
+    __tablename__ = "capacity_holds"
+
+    holder: Mapped[str] = mapped_column(String, primary_key=True)
+    capacity_id: Mapped[int] = mapped_column(Integer)
+    held_until: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+Index("idx_capacity_holds_capacity_until", CapacityHold.capacity_id, CapacityHold.held_until)
 
 
 class Idempotency(Base):
@@ -45,7 +91,7 @@ class Idempotency(Base):
 
     key: Mapped[str] = mapped_column(String, primary_key=True)
     job_id: Mapped[str] = mapped_column(String)
-    created_at: Mapped[datetime] = mapped_column(DateTime)
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True)
 
 
 class Proposal(Base):
@@ -65,6 +111,10 @@ class Proposal(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime)
 
 Index("idx_proposals_tenant_created", Proposal.tenant_id, Proposal.created_at)
+# Reply handling: a phone's latest open proposal
+Index("idx_proposals_phone_status_created", Proposal.phone, Proposal.status, Proposal.created_at)
+# Sweeper: stale PROPOSED rows and old terminal rows
+Index("idx_proposals_status_created", Proposal.status, Proposal.created_at)
 
 
 class TenantPhone(Base):
@@ -78,3 +128,35 @@ class TenantPhone(Base):
 Index("idx_tenant_phone_unique_phone", TenantPhone.phone, unique=True)
 
 
+class ProposalTemplate(Base):
+    __tablename__ = "proposal_templates"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[str] = mapped_column(String)
+    service: Mapped[str] = mapped_column(String)
+    # str.format-style body using {name}, {service}, {start}, {end}
+    body: Mapped[str] = mapped_column(Text)
+    source: Mapped[str] = mapped_column(String, default="llm")  # llm | config
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+
+Index("idx_proposal_templates_tenant_service", ProposalTemplate.tenant_id, ProposalTemplate.service)
+
+
+class Outbox(Base):
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    message_id: Mapped[str] = mapped_column(String, unique=True)
+    kind: Mapped[str] = mapped_column(String)  # sms | confirmation
+    phone: Mapped[str] = mapped_column(String)
+    body: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(String, default="PENDING")  # PENDING | SENDING | SENT | DEAD
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime)
+    claim_token: Mapped[str] = mapped_column(String, nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+Index("idx_outbox_status_next_attempt", Outbox.status, Outbox.next_attempt_at)
+Index("idx_outbox_claim_token", Outbox.claim_token)
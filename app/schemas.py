@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Optional, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class LeadIn(BaseModel):
@@ -79,3 +80,21 @@ class ChatReplyOut(BaseModel):
     message: Optional[str] = None
 
 
+
+
+class CapacityIn(BaseModel):
+    tenant_id: str
+    service: str
+    start: datetime
+    # Either an explicit end or a duration
+    end: Optional[datetime] = None
+    duration_minutes: int = Field(60, gt=0)
+    # Technicians available in the window and how many are already booked
+    total: int = Field(1, gt=0)
+    booked: int = Field(0, ge=0)
+
+    @model_validator(mode="after")
+    def _booked_within_total(self):
+        if self.booked > self.total:
+            raise ValueError("booked exceeds total")
+        return self
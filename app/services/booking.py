@@ -1,23 +1,64 @@
 from datetime import datetime
-from typing import Tuple
+from typing import Optional, Tuple
 import uuid
 
-from sqlalchemy import select
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.models import Job, Idempotency
+from app.services.capacity import release_slot
+from app.services.idempotency import idempotency_filter
+from app.services.notify import enqueue_confirmation
 
 
-def book_job(db: Session, lead, slot: Tuple[datetime, datetime]) -> Job:
-    idem_key = f"{lead.event_id}:book_job"
+def idempotency_key(event_id: str) -> str:
+    return f"{event_id}:book_job"
 
-    existing_idem = db.execute(select(Idempotency).where(Idempotency.key == idem_key)).scalar_one_or_none()
-    if existing_idem:
-        existing_job = db.execute(select(Job).where(Job.job_id == existing_idem.job_id)).scalar_one()
-        return existing_job
 
+def _claim_key(db: Session, values: dict) -> bool:
+    # INSERT ... ON CONFLICT DO NOTHING: True if this call created the key. Concurrent
+    # claimers of the same key wait on it instead of failing on the primary key.
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(Idempotency).values(**values)
+        return db.execute(stmt.on_conflict_do_nothing(index_elements=["key"])).rowcount == 1
+    try:
+        with db.begin_nested():
+            db.execute(insert(Idempotency).values(**values))
+        return True
+    except IntegrityError:
+        return False
+
+
+def _job_for_key(db: Session, key: str) -> Optional[Job]:
+    return db.execute(
+        select(Job).join(Idempotency, Idempotency.job_id == Job.job_id).where(Idempotency.key == key)
+    ).scalar_one_or_none()
+
+
+def get_idempotent_job(db: Session, event_id: str) -> Optional[Job]:
+    """Job already booked for ``event_id``, if any; skips the query for keys the filter has never seen."""
+    key = idempotency_key(event_id)
+    if not idempotency_filter.might_exist(key):
+        return None
+    return _job_for_key(db, key)
+
+
+def book_job(db: Session, lead, slot: Tuple[datetime, datetime]) -> Job:
+    idem_key = idempotency_key(lead.event_id)
     job_id = uuid.uuid4().hex
     now = datetime.utcnow()
+
+    if not _claim_key(db, dict(key=idem_key, job_id=job_id, created_at=now)):
+        # A retry of an event that is already booked: hand back its job and give up the unit
+        # we claimed. Callers always claim a fresh unit, even in the job's own window.
+        db.rollback()
+        existing_job = _job_for_key(db, idem_key)
+        release_slot(db, lead.tenant_id, lead.service, *slot)
+        return existing_job
+
     job = Job(
         job_id=job_id,
         tenant_id=lead.tenant_id,
@@ -32,8 +73,8 @@ def book_job(db: Session, lead, slot: Tuple[datetime, datetime]) -> Job:
         created_at=now,
     )
     db.add(job)
-    db.add(Idempotency(key=idem_key, job_id=job_id, created_at=now))
+    # The confirmation SMS commits with the job; the outbox worker sends it
+    enqueue_confirmation(db, job)
     db.commit()
+    idempotency_filter.add(idem_key)
     return job
-
-
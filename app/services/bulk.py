@@ -0,0 +1,230 @@
+import csv
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Iterable
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Idempotency, Job, Outbox
+from app.schemas import LeadIn
+from app.services.booking import book_job, get_idempotent_job, idempotency_key
+from app.services.capacity import claim_slots, pick_slot
+from app.services.idempotency import idempotency_filter
+from app.services.intent import classify_intent
+from app.services.notify import confirmation_text, outbox_values
+from app.services.slot_index import slot_index
+
+
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+
+@dataclass(frozen=True)
+class BatchError:
+    index: int
+    error: str
+
+
+def _idem_key(lead: LeadIn) -> str:
+    # Same key as book_job, so batch and single-lead retries dedupe against each other
+    return idempotency_key(lead.event_id)
+
+
+def _booked(job) -> dict:
+    return {
+        "event_id": job.source_event_id,
+        "status": "BOOKED",
+        "job_id": job.job_id,
+        "tenant_id": job.tenant_id,
+        "slot": {"start": job.slot_start.isoformat(), "end": job.slot_end.isoformat()},
+    }
+
+
+def _existing_jobs(db: Session, keys: list[str]) -> dict[str, Job]:
+    found: dict[str, Job] = {}
+    keys = [key for key in keys if idempotency_filter.might_exist(key)]
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        rows = db.execute(
+            select(Idempotency.key, Job)
+            .join(Job, Job.job_id == Idempotency.job_id)
+            .where(Idempotency.key.in_(keys[i : i + LOOKUP_CHUNK]))
+        ).all()
+        found.update({row.key: row.Job for row in rows})
+    return found
+
+
+def _book_one_by_one(db: Session, leads: list[LeadIn]) -> dict[str, dict]:
+    # Fallback when the bulk transaction collides with a concurrent single-lead booking
+    results = {}
+    for lead in leads:
+        existing = get_idempotent_job(db, lead.event_id)
+        if existing:
+            results[lead.event_id] = _booked(existing)
+            continue
+        slot = pick_slot(db, lead.tenant_id, lead.service)
+        results[lead.event_id] = _booked(book_job(db, lead, slot)) if slot else {"event_id": lead.event_id, "status": "NEEDS_DISPATCH"}
+    return results
+
+
+def book_leads(db: Session, items: list[LeadIn | BatchError]) -> list[dict]:
+    """Book a chunk of leads in one transaction; returns one result per item, in order.
+
+    Idempotency keys are looked up together, slots are claimed with one statement per
+    (tenant, service) and jobs, idempotency keys and confirmations are inserted with one
+    executemany each.
+    """
+    results: dict[str, dict] = {}
+    new: list[LeadIn] = []
+    for item in items:
+        if isinstance(item, BatchError) or item.event_id in results:
+            continue
+        intent = classify_intent(item)
+        if intent != "book":
+            results[item.event_id] = {"event_id": item.event_id, "status": "HANDOFF", "reason": intent}
+            continue
+        results[item.event_id] = {}
+        new.append(item)
+
+    existing = _existing_jobs(db, [_idem_key(lead) for lead in new])
+    groups: dict[tuple[str, str], list[LeadIn]] = {}
+    for lead in new:
+        job = existing.get(_idem_key(lead))
+        if job:
+            results[lead.event_id] = _booked(job)
+        else:
+            groups.setdefault((lead.tenant_id, lead.service), []).append(lead)
+
+    now = datetime.utcnow()
+    jobs, keys, messages, claimed = [], [], [], []
+    try:
+        for (tenant_id, service), group in groups.items():
+            slots = claim_slots(db, tenant_id, service, len(group))
+            claimed.extend((tenant_id, service, slot) for slot in slots)
+            for lead, slot in zip(group, slots):
+                job = dict(
+                    job_id=uuid.uuid4().hex,
+                    tenant_id=lead.tenant_id,
+                    customer_name=lead.name,
+                    phone=lead.phone,
+                    address=lead.address,
+                    service=lead.service,
+                    slot_start=slot[0],
+                    slot_end=slot[1],
+                    status="BOOKED",
+                    source_event_id=lead.event_id,
+                    created_at=now,
+                )
+                jobs.append(job)
+                keys.append(dict(key=_idem_key(lead), job_id=job["job_id"], created_at=now))
+                messages.append(outbox_values(lead.phone, confirmation_text(SimpleNamespace(**job)), kind="confirmation"))
+                results[lead.event_id] = _booked(SimpleNamespace(**job))
+            for lead in group[len(slots) :]:
+                results[lead.event_id] = {"event_id": lead.event_id, "status": "NEEDS_DISPATCH"}
+        if jobs:
+            db.execute(insert(Job), jobs)
+            db.execute(insert(Idempotency), keys)
+            db.execute(insert(Outbox), messages)
+        db.commit()
+        for values in keys:
+            idempotency_filter.add(values["key"])
+    except IntegrityError:
+        # Another request booked one of these events meanwhile; the rollback also frees our claims
+        db.rollback()
+        claimed = []
+        results.update(_book_one_by_one(db, [lead for group in groups.values() for lead in group]))
+    for tenant_id, service, slot in claimed:
+        slot_index.discard(tenant_id, service, *slot)
+
+    out = []
+    for item in items:
+        if isinstance(item, BatchError):
+            out.append({"index": item.index, "status": "INVALID", "error": item.error})
+        else:
+            out.append(results[item.event_id])
+    return out
+
+
+def _parse(index: int, data) -> LeadIn | BatchError:
+    try:
+        return LeadIn.model_validate(data)
+    except ValidationError as e:
+        return BatchError(index, e.errors(include_url=False)[0]["msg"])
+
+
+def _chunks(items: Iterable, size: int) -> Iterable[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _decode_line(index: int, line: bytes, parse: Callable, header: list[str] | None):
+    try:
+        if header is not None:
+            values = next(csv.reader([line.decode()]))
+            return parse(index, dict(zip(header, values)))
+        return parse(index, json.loads(line))
+    except (json.JSONDecodeError, UnicodeDecodeError, csv.Error) as e:
+        return BatchError(index, f"invalid line: {e}")
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes], size: int, parse: Callable[[int, Any], Any], csv_body: bool = False
+) -> AsyncIterator[list]:
+    """Parse a JSON array, NDJSON or (``csv_body``) CSV-with-header request body into
+    chunks of ``size`` records, each ``parse(index, data)`` or a BatchError.
+
+    NDJSON and CSV are parsed line by line as the body streams in, so work starts before
+    the upload finishes; a JSON array has to be read whole.
+    """
+    buffer = b""
+    index = 0
+    array = None
+    header: list[str] | None = None
+    pending: list = []
+    async for data in chunks:
+        buffer += data
+        if array is None and not csv_body and buffer.lstrip():
+            array = buffer.lstrip().startswith(b"[")
+        if array:
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            if csv_body and header is None:
+                header = [h.strip() for h in next(csv.reader([line.decode()]))]
+                continue
+            pending.append(_decode_line(index, line, parse, header))
+            index += 1
+            if len(pending) >= size:
+                yield pending
+                pending = []
+
+    if array:
+        try:
+            data = json.loads(buffer)
+        except json.JSONDecodeError as e:
+            yield [BatchError(0, f"invalid JSON: {e.msg}")]
+            return
+        for chunk in _chunks((parse(i, item) for i, item in enumerate(data)), size):
+            yield chunk
+        return
+    if buffer.strip() and not (csv_body and header is None):
+        pending.append(_decode_line(index, buffer, parse, header))
+    if pending:
+        yield pending
+
+
+def iter_lead_chunks(chunks: AsyncIterator[bytes], size: int) -> AsyncIterator[list[LeadIn | BatchError]]:
+    return iter_records(chunks, size, _parse)
@@ -1,81 +1,348 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Tuple
 
-from sqlalchemy import select, update
+from sqlalchemy import delete, insert, literal_column, select, update
 from sqlalchemy.orm import Session
 
-from app.models import Capacity
+from app.config import settings
+from app.db import SessionLocal
+from app.models import Capacity, CapacityHold
+from app.services.slot_index import slot_index
 
 
-def pick_slot(db: Session, tenant_id: str, service: str) -> Optional[Tuple[datetime, datetime]]:
-    slot_row = db.execute(
-        select(Capacity).where(
+# (tenant_id, service, start_dt, end_dt) of a capacity window
+Window = Tuple[str, str, datetime, datetime]
+
+# How many times a claim re-runs when a concurrent writer takes the candidate row first
+CLAIM_ATTEMPTS = 5
+
+
+def _has_free_unit():
+    # Exactly the predicate of the partial index idx_capacity_free, so the hot lookups
+    # only ever touch windows with a unit left. The 0 is inlined rather than bound: a
+    # generic prepared plan cannot prove "available > $1" implies the index predicate.
+    return Capacity.available > literal_column("0")
+
+
+def _free_slot_ids(tenant_id: str, service: str, after: datetime, now: datetime):
+    return (
+        select(Capacity.id)
+        .where(
             Capacity.tenant_id == tenant_id,
             Capacity.service == service,
-            Capacity.booked_bool.is_(False),
-            Capacity.start_dt > datetime.utcnow(),
-        ).order_by(Capacity.start_dt.asc()).limit(1)
-    ).scalar_one_or_none()
+            _has_free_unit(),
+            Capacity.start_dt > max(after, now),
+        )
+        .order_by(Capacity.start_dt.asc())
+    )
+
+
+def _release_lapsed(
+    db: Session, now: datetime, tenant_id: Optional[str] = None, service: Optional[str] = None, limit: int = 1000
+) -> list[Window]:
+    stmt = select(CapacityHold.holder).where(CapacityHold.held_until <= now)
+    if tenant_id:
+        stmt = stmt.join(Capacity, Capacity.id == CapacityHold.capacity_id).where(
+            Capacity.tenant_id == tenant_id, Capacity.service == service
+        )
+    return drop_holds(db, db.execute(stmt.limit(limit)).scalars().all())
+
+
+def _claim_returning(
+    db: Session, tenant_id: str, service: str, after: datetime, column: str
+) -> Optional[tuple]:
+    # Find the earliest window with a free unit and take one in one statement. On Postgres the
+    # candidate is locked with SKIP LOCKED so concurrent claimers move on instead of queueing.
+    now = datetime.utcnow()
+    candidate = _free_slot_ids(tenant_id, service, after, now).limit(1).with_for_update(skip_locked=True)
+    target = getattr(Capacity, column)
+    return db.execute(
+        update(Capacity)
+        .where(Capacity.id == candidate.scalar_subquery(), _has_free_unit())
+        .values({target: target + 1, Capacity.available: Capacity.available - 1})
+        .returning(Capacity.id, Capacity.start_dt, Capacity.end_dt)
+        # Plain Core semantics: an ORM "fetch" sync would splice the primary key into RETURNING
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def _claim_conditional(
+    db: Session, tenant_id: str, service: str, after: datetime, column: str
+) -> Optional[tuple]:
+    # Dialects without UPDATE ... RETURNING: conditional update per candidate, checking rowcount
+    now = datetime.utcnow()
+    candidates = db.execute(
+        select(Capacity.id, Capacity.start_dt, Capacity.end_dt).where(
+            Capacity.id.in_(_free_slot_ids(tenant_id, service, after, now).limit(CLAIM_ATTEMPTS))
+        ).order_by(Capacity.start_dt.asc())
+    ).all()
+    target = getattr(Capacity, column)
+    for cand in candidates:
+        result = db.execute(
+            update(Capacity)
+            .where(Capacity.id == cand.id, _has_free_unit())
+            .values({target: target + 1, Capacity.available: Capacity.available - 1})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            return cand
+    return None
 
-    if not slot_row:
+
+def _claim_indexed(
+    db: Session, tenant_id: str, service: str, after: datetime, column: str
+) -> Optional[tuple]:
+    # The slot index names the earliest free window; take a unit of exactly that window
+    # through its unique key instead of scanning for one
+    slot = slot_index.first(tenant_id, service, after=after)
+    if slot is None:
         return None
+    row = db.execute(
+        select(Capacity.id, Capacity.start_dt, Capacity.end_dt).where(*_window(tenant_id, service, *slot))
+    ).first()
+    target = getattr(Capacity, column)
+    if row is not None and db.execute(
+        update(Capacity)
+        .where(Capacity.id == row.id, _has_free_unit())
+        .values({target: target + 1, Capacity.available: Capacity.available - 1})
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1:
+        return row
+    # The index was ahead of the table; drop the unit it offered and fall back to the scan
+    slot_index.discard(tenant_id, service, *slot)
+    return None
+
+
+def _has_free_slot(db: Session, tenant_id: str, service: str, after: datetime) -> bool:
+    now = datetime.utcnow()
+    return db.execute(_free_slot_ids(tenant_id, service, after, now).limit(1)).first() is not None
+
+
+def _claim(
+    db: Session,
+    tenant_id: str,
+    service: str,
+    column: str,
+    after: Optional[datetime] = None,
+    hold: Optional[dict] = None,
+) -> Optional[Tuple[datetime, datetime]]:
+    # Take one unit of the earliest free window: ``column`` (booked or held) up, available down
+    after = after or datetime.min
+    claim = _claim_returning if db.get_bind().dialect.update_returning else _claim_conditional
+    released = False
+    for attempt in range(CLAIM_ATTEMPTS):
+        # With the slot index warm the first attempt goes straight to its candidate
+        row = _claim_indexed(db, tenant_id, service, after, column) if attempt == 0 and slot_index.ready else None
+        row = row or claim(db, tenant_id, service, after, column)
+        if row:
+            if hold:
+                db.execute(insert(CapacityHold).values(capacity_id=row.id, **hold))
+            db.commit()
+            slot_index.discard(tenant_id, service, row.start_dt, row.end_dt)
+            return row.start_dt, row.end_dt
+        # Lost the race for every candidate we saw; retry only if something is still free
+        db.rollback()
+        if not _has_free_slot(db, tenant_id, service, after):
+            # Units under lapsed holds are free too; give them back once, then look again
+            freed = [] if released else _release_lapsed(db, datetime.utcnow(), tenant_id, service)
+            if not freed:
+                return None
+            db.commit()
+            restore_slots(freed)
+            released = True
+    return None
+
+
+def pick_slot(db: Session, tenant_id: str, service: str) -> Optional[Tuple[datetime, datetime]]:
+    return _claim(db, tenant_id, service, "booked")
+
+
+def hold_slot(
+    db: Session,
+    tenant_id: str,
+    service: str,
+    holder: str,
+    after: Optional[datetime] = None,
+    ttl_seconds: Optional[float] = None,
+) -> Optional[Tuple[datetime, datetime]]:
+    """Soft-reserve one unit of the earliest free window for ``holder`` (a proposal id) until the TTL lapses."""
+    ttl = settings.proposal_hold_seconds if ttl_seconds is None else ttl_seconds
+    held_until = datetime.utcnow() + timedelta(seconds=ttl)
+    return _claim(db, tenant_id, service, "held", after=after, hold={"holder": holder, "held_until": held_until})
 
-    # Mark booked and return times
+
+def _drop_hold(db: Session, holder: str) -> Optional[Window]:
+    # Deleting the hold row first makes release single-shot even when callers race.
+    # Returns the window the unit went back to, or None if the hold was already gone.
+    row = db.execute(
+        select(CapacityHold.capacity_id, Capacity.tenant_id, Capacity.service, Capacity.start_dt, Capacity.end_dt)
+        .join(Capacity, Capacity.id == CapacityHold.capacity_id)
+        .where(CapacityHold.holder == holder)
+    ).first()
+    if row is None:
+        return None
+    result = db.execute(
+        delete(CapacityHold).where(CapacityHold.holder == holder).execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return None
     db.execute(
         update(Capacity)
-        .where(Capacity.id == slot_row.id, Capacity.booked_bool.is_(False))
-        .values(booked_bool=True)
+        .where(Capacity.id == row.capacity_id)
+        .values(held=Capacity.held - 1, available=Capacity.available + 1)
+        .execution_options(synchronize_session=False)
     )
+    return row.tenant_id, row.service, row.start_dt, row.end_dt
+
+
+def restore_slots(windows: list[Window]) -> None:
+    """Put units freed by a committed release back in the slot index; started windows are skipped."""
+    now = datetime.utcnow()
+    for tenant_id, service, start, end in windows:
+        if start > now:
+            slot_index.add(tenant_id, service, start, end)
+
+
+def release_hold(
+    db: Session, tenant_id: str, service: str, start: datetime, end: datetime, holder: str
+) -> bool:
+    released = _drop_hold(db, holder) is not None
     db.commit()
-    return slot_row.start_dt, slot_row.end_dt
+    if released and start > datetime.utcnow():
+        slot_index.add(tenant_id, service, start, end)
+        return True
+    return False
 
 
-def preview_slot(db: Session, tenant_id: str, service: str) -> Optional[Tuple[datetime, datetime]]:
-    row = db.execute(
-        select(Capacity).where(
-            Capacity.tenant_id == tenant_id,
-            Capacity.service == service,
-            Capacity.booked_bool.is_(False),
-            Capacity.start_dt > datetime.utcnow(),
-        ).order_by(Capacity.start_dt.asc()).limit(1)
-    ).scalar_one_or_none()
-    if not row:
-        return None
-    return row.start_dt, row.end_dt
+def drop_holds(db: Session, holders: list[str]) -> list[Window]:
+    """Release the holds of ``holders`` (proposal ids) in the caller's transaction.
+
+    Returns the windows the units went back to; pass them to ``restore_slots`` once committed.
+    """
+    return [window for holder in holders if (window := _drop_hold(db, holder)) is not None]
+
+
+def release_expired_holds(db: Session, limit: int = 1000) -> int:
+    """Give the units of up to ``limit`` lapsed holds back to their windows."""
+    freed = _release_lapsed(db, datetime.utcnow(), limit=limit)
+    db.commit()
+    restore_slots(freed)
+    return len(freed)
+
+
+def _window(tenant_id: str, service: str, start: datetime, end: datetime):
+    return (
+        Capacity.tenant_id == tenant_id,
+        Capacity.service == service,
+        Capacity.start_dt == start,
+        Capacity.end_dt == end,
+    )
 
 
 def try_mark_slot_booked(
-    db: Session, tenant_id: str, service: str, start: datetime, end: datetime
+    db: Session,
+    tenant_id: str,
+    service: str,
+    start: datetime,
+    end: datetime,
+    holder: Optional[str] = None,
 ) -> bool:
+    # Book a unit of the exact window. A hold by ``holder`` is released in the same
+    # transaction, so a live hold always converts; a lapsed one only if a unit is still free.
+    converted = _drop_hold(db, holder) is not None if holder else False
+    candidate = select(Capacity.id).where(*_window(tenant_id, service, start, end), _has_free_unit()).limit(1)
     result = db.execute(
         update(Capacity)
-        .where(
-            Capacity.tenant_id == tenant_id,
-            Capacity.service == service,
-            Capacity.start_dt == start,
-            Capacity.end_dt == end,
-            Capacity.booked_bool.is_(False),
-        )
-        .values(booked_bool=True)
+        .where(Capacity.id == candidate.scalar_subquery(), _has_free_unit())
+        .values(booked=Capacity.booked + 1, available=Capacity.available - 1)
+        .execution_options(synchronize_session=False)
     )
     if result.rowcount and result.rowcount > 0:
         db.commit()
+        # A converted hold's unit already left the index when it was held
+        if not converted:
+            slot_index.discard(tenant_id, service, start, end)
         return True
     db.rollback()
     return False
 
 
-def next_slot(db: Session, tenant_id: str, service: str, after: datetime) -> Optional[Tuple[datetime, datetime]]:
-    row = db.execute(
-        select(Capacity).where(
-            Capacity.tenant_id == tenant_id,
-            Capacity.service == service,
-            Capacity.booked_bool.is_(False),
-            Capacity.start_dt > after,
-        ).order_by(Capacity.start_dt.asc()).limit(1)
-    ).scalar_one_or_none()
-    if not row:
-        return None
-    return row.start_dt, row.end_dt
+def release_slot(db: Session, tenant_id: str, service: str, start: datetime, end: datetime) -> bool:
+    # Undo a booking claim that ended up unused (e.g. the event was already booked)
+    candidate = select(Capacity.id).where(*_window(tenant_id, service, start, end), Capacity.booked > 0).limit(1)
+    result = db.execute(
+        update(Capacity)
+        .where(Capacity.id == candidate.scalar_subquery(), Capacity.booked > 0)
+        .values(booked=Capacity.booked - 1, available=Capacity.available + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount and start > datetime.utcnow():
+        slot_index.add(tenant_id, service, start, end)
+        return True
+    return False
+
+
+def claim_slots(db: Session, tenant_id: str, service: str, count: int) -> list[Tuple[datetime, datetime]]:
+    """Book up to ``count`` of the earliest free units, earliest first; a window with several
+    free units is claimed with one conditional update.
+
+    Runs in the caller's transaction: nothing is committed and the slot index is not
+    touched, so the caller can commit the claims together with the rows that use them.
+    """
+    slots: list[Tuple[datetime, datetime]] = []
+    released = False
+    for _ in range(CLAIM_ATTEMPTS):
+        wanted = count - len(slots)
+        if wanted <= 0:
+            break
+        now = datetime.utcnow()
+        candidates = db.execute(
+            select(Capacity.id, Capacity.start_dt, Capacity.end_dt, Capacity.available.label("free"))
+            .where(Capacity.id.in_(_free_slot_ids(tenant_id, service, datetime.min, now).limit(wanted)))
+            .order_by(Capacity.start_dt.asc())
+        ).all()
+        claimed = 0
+        for cand in candidates:
+            take = min(cand.free, wanted - claimed)
+            if take <= 0:
+                break
+            result = db.execute(
+                update(Capacity)
+                .where(Capacity.id == cand.id, Capacity.available >= take)
+                .values(booked=Capacity.booked + take, available=Capacity.available - take)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                slots.extend([(cand.start_dt, cand.end_dt)] * take)
+                claimed += take
+        # Short only because concurrent claimers took units we saw; stop when nothing is left
+        if claimed < wanted and not _has_free_slot(db, tenant_id, service, datetime.min):
+            # Runs in the caller's transaction, so freed units reach the index at the next reconcile
+            if released or not _release_lapsed(db, now, tenant_id, service):
+                break
+            released = True
+    return sorted(slots)
 
 
+def reconcile_slot_index() -> int:
+    db = SessionLocal()
+    try:
+        # Lapsed holds go back to their windows first, so the index counts exactly the
+        # ``available`` units and every later release can add its unit back without double counting
+        release_expired_holds(db)
+        now = datetime.utcnow()
+        # Claims and releases from here on are replayed over the snapshot when it is swapped in
+        slot_index.begin_load()
+        rows = db.execute(
+            select(Capacity.tenant_id, Capacity.service, Capacity.start_dt, Capacity.end_dt, Capacity.available.label("free"))
+            .where(_has_free_unit(), Capacity.start_dt > now)
+            .order_by(Capacity.tenant_id, Capacity.service, Capacity.start_dt)
+        ).all()
+    except Exception:
+        slot_index.abandon_load()
+        raise
+    finally:
+        db.close()
+    slot_index.load(rows)
+    return len(rows)
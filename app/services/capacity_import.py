@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Capacity
+from app.schemas import CapacityIn
+from app.services.bulk import BatchError
+from app.services.slot_index import slot_index
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # Capacity stores naive UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def parse_capacity(index: int, data) -> CapacityIn | BatchError:
+    if isinstance(data, dict):
+        # CSV leaves optional columns as empty strings
+        data = {k: v for k, v in data.items() if v not in ("", None)}
+    try:
+        return CapacityIn.model_validate(data)
+    except ValidationError as e:
+        err = e.errors(include_url=False)[0]
+        loc = ".".join(map(str, err["loc"]))
+        return BatchError(index, f"{loc}: {err['msg']}" if loc else err["msg"])
+
+
+def _insert_windows(db: Session, rows: list[dict]) -> list:
+    # INSERT ... ON CONFLICT DO NOTHING against the unique window index; returns the rows
+    # actually inserted, so windows that already exist (or race in) are left untouched.
+    dialect = db.get_bind().dialect.name
+    returned = (Capacity.tenant_id, Capacity.service, Capacity.start_dt, Capacity.end_dt, Capacity.total, Capacity.booked)
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(Capacity)
+        stmt = stmt.on_conflict_do_nothing(index_elements=["tenant_id", "service", "start_dt", "end_dt"])
+        return db.execute(stmt.returning(*returned), rows).all()
+    inserted = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                inserted += db.execute(insert(Capacity).values(**row).returning(*returned)).all()
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def import_capacity(db: Session, items: list[CapacityIn | BatchError]) -> dict:
+    """Insert a chunk of capacity rows in one statement, skipping any (tenant_id, service,
+    start_dt, end_dt) window that already exists or repeats within the chunk.
+    """
+    counts = {"inserted": 0, "duplicates": 0, "invalid": 0}
+    windows: dict[tuple[str, str, datetime, datetime], dict] = {}
+    for item in items:
+        if isinstance(item, BatchError):
+            counts["invalid"] += 1
+            continue
+        start = _naive_utc(item.start)
+        end = _naive_utc(item.end) if item.end else start + timedelta(minutes=item.duration_minutes)
+        key = (item.tenant_id, item.service, start, end)
+        if key in windows:
+            counts["duplicates"] += 1
+        else:
+            windows[key] = dict(tenant_id=item.tenant_id, service=item.service, start_dt=start, end_dt=end, total=item.total, booked=item.booked)
+
+    inserted = _insert_windows(db, list(windows.values())) if windows else []
+    db.commit()
+    counts["inserted"] = len(inserted)
+    counts["duplicates"] += len(windows) - len(inserted)
+
+    now = datetime.utcnow()
+    if slot_index.ready:
+        for row in inserted:
+            if row.booked < row.total and row.start_dt > now:
+                slot_index.add(row.tenant_id, row.service, row.start_dt, row.end_dt, row.total - row.booked)
+    return counts
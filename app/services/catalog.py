@@ -0,0 +1,186 @@
+import itertools
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.db import SessionLocal
+from app.logging import log
+from app.models import Capacity
+from app.services.nlu_cache import normalize_text
+
+
+# Customer phrasings for the services we seed; keys are canonical service names.
+# SERVICE_SYNONYMS_FILE can add more as {"Service": ["phrase", ...]}.
+DEFAULT_SYNONYMS: dict[str, list[str]] = {
+    "AC Repair": ["ac", "a/c", "air conditioning", "air conditioner", "aircon", "ac not cooling", "not cooling"],
+    "Plumbing": ["plumber", "leak", "leaking", "pipe", "pipes", "clogged", "drain", "toilet", "water heater"],
+    "Electrical": ["electrician", "wiring", "outlet", "breaker", "power out"],
+    "HVAC": ["heating", "furnace", "heat pump", "ventilation"],
+    "Installation": ["install", "installer"],
+}
+
+EXACT_CONFIDENCE = 1.0
+SYNONYM_CONFIDENCE = 0.8
+AMBIGUOUS_CONFIDENCE = 0.4
+
+_END = object()
+
+
+@dataclass(frozen=True)
+class ServiceMatch:
+    service: str
+    confidence: float
+    phrase: str
+
+
+class ServiceMatcher:
+    """Token trie over service names and synonyms.
+
+    ``match`` walks the text once, taking the longest phrase that starts at each
+    token, so "ac repair" wins over "ac" and overlapping phrases are not rescanned.
+    """
+
+    def __init__(self, phrases: dict[str, tuple[str, float]]) -> None:
+        self._root: dict = {}
+        for phrase, target in phrases.items():
+            node = self._root
+            for token in phrase.split():
+                node = node.setdefault(token, {})
+            node[_END] = target
+
+    def find_all(self, text: str) -> list[ServiceMatch]:
+        tokens = normalize_text(text).split()
+        found: list[ServiceMatch] = []
+        i = 0
+        while i < len(tokens):
+            node = self._root
+            best: tuple[int, tuple[str, float]] | None = None
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if _END in node:
+                    best = (j, node[_END])
+            if best:
+                end, (service, confidence) = best
+                found.append(ServiceMatch(service, confidence, " ".join(tokens[i:end])))
+                i = end
+            else:
+                i += 1
+        return found
+
+    def match(self, text: str) -> ServiceMatch | None:
+        found = self.find_all(text)
+        if not found:
+            return None
+        services = {m.service for m in found}
+        best = max(found, key=lambda m: (m.confidence, len(m.phrase)))
+        if len(services) > 1:
+            # Text names several services; let the LLM (or a human) decide
+            return ServiceMatch(best.service, AMBIGUOUS_CONFIDENCE, best.phrase)
+        return best
+
+
+def _load_synonyms() -> dict[str, list[str]]:
+    synonyms = {name: list(phrases) for name, phrases in DEFAULT_SYNONYMS.items()}
+    if settings.service_synonyms_file:
+        with open(settings.service_synonyms_file) as fh:
+            for name, phrases in json.load(fh).items():
+                synonyms.setdefault(name, []).extend(phrases)
+    return synonyms
+
+
+def _compile(services: set[str], synonyms: dict[str, list[str]]) -> ServiceMatcher:
+    by_key = {normalize_text(name): phrases for name, phrases in synonyms.items()}
+    phrases: dict[str, tuple[str, float]] = {}
+    for service in services:
+        for phrase in by_key.get(normalize_text(service), []):
+            phrases.setdefault(normalize_text(phrase), (service, SYNONYM_CONFIDENCE))
+    # Service names themselves outrank synonyms
+    for service in services:
+        phrases[normalize_text(service)] = (service, EXACT_CONFIDENCE)
+    return ServiceMatcher(phrases)
+
+
+class ServiceCatalog:
+    """Per-tenant service matchers built from the distinct capacity services plus synonyms.
+
+    Loaded at startup and rebuilt by a periodic refresh; in-process writers that add
+    services call ``invalidate`` to rebuild on a background thread. Lookups never touch
+    the database: they use the current matchers until the rebuilt ones are swapped in.
+    """
+
+    def __init__(self) -> None:
+        self._tenants: dict[str, ServiceMatcher] = {}
+        self._global: ServiceMatcher | None = None
+        self._fallback: ServiceMatcher | None = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-catalog")
+        self._pending: Future | None = None
+        self._generations = itertools.count(1)
+        self._applied = 0
+
+    def refresh(self) -> int:
+        # A slow refresh must not overwrite one that started after it
+        generation = next(self._generations)
+        db = SessionLocal()
+        try:
+            rows = db.execute(select(Capacity.tenant_id, Capacity.service).distinct()).all()
+        finally:
+            db.close()
+        synonyms = _load_synonyms()
+        by_tenant: dict[str, set[str]] = {}
+        for row in rows:
+            by_tenant.setdefault(row.tenant_id, set()).add(row.service)
+        all_services = set(synonyms) | {row.service for row in rows}
+        tenants = {tenant: _compile(services, synonyms) for tenant, services in by_tenant.items()}
+        global_matcher = _compile(all_services, synonyms)
+        with self._lock:
+            if generation > self._applied:
+                self._tenants = tenants
+                self._global = global_matcher
+                self._applied = generation
+        return len(rows)
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            log.exception("service_catalog_refresh_failed")
+
+    def invalidate(self) -> Future:
+        """Schedule a rebuild; returns its future. A rebuild that has not started yet is shared."""
+        with self._lock:
+            pending = self._pending
+            if pending is not None and not pending.running() and not pending.done():
+                return pending
+            self._pending = self._executor.submit(self._refresh_in_background)
+            return self._pending
+
+    def _matcher(self, tenant_id: str | None) -> ServiceMatcher:
+        global_matcher = self._global
+        if global_matcher is None:
+            # Not loaded yet: answer from the synonyms alone while the load runs elsewhere
+            self.invalidate()
+            if self._fallback is None:
+                synonyms = _load_synonyms()
+                self._fallback = _compile(set(synonyms), synonyms)
+            return self._fallback
+        if tenant_id:
+            return self._tenants.get(tenant_id, global_matcher)
+        return global_matcher
+
+    def match(self, text: str, tenant_id: str | None = None) -> ServiceMatch | None:
+        return self._matcher(tenant_id).match(text)
+
+    def resolve(self, name: str, tenant_id: str | None = None) -> str:
+        # Map a free-form service name (e.g. from the LLM) onto the catalog's spelling
+        found = self.match(name, tenant_id)
+        return found.service if found else name.title()
+
+
+service_catalog = ServiceCatalog()
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app import metrics
+from app.cache import MISSING, TTLCache
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class ActiveProposal:
+    """Snapshot of a phone's open proposal; safe to share across sessions and threads."""
+
+    proposal_id: str
+    tenant_id: str
+    customer_name: str
+    phone: str
+    address: Optional[str]
+    service: str
+    slot_start: datetime
+    slot_end: datetime
+    message_id: Optional[str]
+    created_at: datetime
+    # Only open proposals are cached
+    status: str = "PROPOSED"
+
+    @classmethod
+    def of(cls, proposal) -> "ActiveProposal":
+        return cls(
+            proposal_id=proposal.proposal_id,
+            tenant_id=proposal.tenant_id,
+            customer_name=proposal.customer_name,
+            phone=proposal.phone,
+            address=proposal.address,
+            service=proposal.service,
+            slot_start=proposal.slot_start,
+            slot_end=proposal.slot_end,
+            message_id=proposal.message_id,
+            created_at=proposal.created_at,
+        )
+
+
+class ConversationStore:
+    """Write-through LRU+TTL map of phone -> active proposal.
+
+    Entries are set after the proposal commits and dropped when it is confirmed or
+    expired, so a hit never needs the database. Only open proposals are cached; a miss
+    falls through to one indexed query. The map is per process: the TTL bounds how long
+    another worker's confirmation can go unseen.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.cache = TTLCache(maxsize, ttl)
+
+    def get(self, phone: str) -> Optional[ActiveProposal]:
+        value = self.cache.get(phone)
+        return None if value is MISSING else value
+
+    def remember(self, proposal) -> ActiveProposal:
+        active = proposal if isinstance(proposal, ActiveProposal) else ActiveProposal.of(proposal)
+        current = self.get(active.phone)
+        # Out-of-order writes must not replace a newer proposal with an older one
+        if current is None or current.created_at <= active.created_at:
+            self.cache.set(active.phone, active)
+        return active
+
+    def forget(self, phone: str, proposal_id: str | None = None) -> None:
+        current = self.get(phone)
+        if current is not None and (proposal_id is None or current.proposal_id == proposal_id):
+            self.cache.pop(phone)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+conversations = ConversationStore(settings.conversation_cache_size, settings.conversation_cache_ttl_seconds)
+
+metrics.register(metrics.CallbackMetric(
+    "conversation_cache_lookups_total", "Active-proposal cache lookups by result", "counter", ("result",),
+    lambda: {(name,): value for name, value in conversations.stats().items() if name != "size"},
+))
+metrics.register(metrics.CallbackMetric(
+    "conversation_cache_entries", "Phones with a cached active proposal", "gauge", (), lambda: {(): len(conversations.cache)},
+))
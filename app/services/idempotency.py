@@ -0,0 +1,41 @@
+from sqlalchemy import select
+
+from app.cache import BloomFilter
+from app.config import settings
+from app.db import SessionLocal
+from app.models import Idempotency
+
+
+class IdempotencyFilter:
+    """Bloom filter over every idempotency key, so new events can skip the lookup.
+
+    Until ``warm`` has loaded the existing keys (or when disabled) every key "might
+    exist" and callers read as before. Keys written by other processes are not seen;
+    that only costs the skipped read, because ``book_job`` still claims the key with an
+    insert-on-conflict.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self._bloom = BloomFilter(capacity, error_rate)
+        self.ready = False
+
+    def warm(self, batch_size: int = 10_000) -> int:
+        self._bloom.clear()
+        db = SessionLocal()
+        try:
+            result = db.execute(select(Idempotency.key).execution_options(yield_per=batch_size))
+            for key in result.scalars():
+                self._bloom.add(key)
+        finally:
+            db.close()
+        self.ready = True
+        return self._bloom.count
+
+    def might_exist(self, key: str) -> bool:
+        return not self.ready or self._bloom.might_contain(key)
+
+    def add(self, key: str) -> None:
+        self._bloom.add(key)
+
+
+idempotency_filter = IdempotencyFilter(settings.idempotency_filter_capacity, settings.idempotency_filter_error_rate)
@@ -1,8 +1,8 @@
 from app.schemas import LeadIn
 
 
-def classify_intent(lead: LeadIn) -> str:
-    text = (lead.notes or "").lower()
+def classify_text_intent(text: str | None) -> str:
+    text = (text or "").lower()
     if "cancel" in text:
         return "cancel"
     if "resched" in text or "reschedule" in text:
@@ -10,3 +10,6 @@ def classify_intent(lead: LeadIn) -> str:
     return "book"
 
 
+def classify_intent(lead: LeadIn) -> str:
+    return classify_text_intent(lead.notes)
+
@@ -0,0 +1,114 @@
+import base64
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.db import ReadSessionLocal, replica_reads
+from app.models import Job
+
+
+EXPORT_COLUMNS = ("job_id", "tenant_id", "customer_name", "service", "slot_start", "slot_end", "status", "created_at")
+EXPORT_BATCH = 1000
+
+
+@dataclass(frozen=True)
+class JobFilter:
+    tenant_id: Optional[str] = None
+    status: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    def apply(self, stmt):
+        if self.tenant_id:
+            stmt = stmt.where(Job.tenant_id == self.tenant_id)
+        if self.status:
+            stmt = stmt.where(Job.status == self.status)
+        if self.created_from:
+            stmt = stmt.where(Job.created_at >= self.created_from)
+        if self.created_to:
+            stmt = stmt.where(Job.created_at < self.created_to)
+        return stmt
+
+
+def encode_cursor(created_at: datetime, job_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{job_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Raises ValueError for cursors we did not issue."""
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), job_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def job_dict(j) -> dict:
+    return {
+        "job_id": j.job_id,
+        "tenant_id": j.tenant_id,
+        "customer_name": j.customer_name,
+        "service": j.service,
+        "slot_start": j.slot_start.isoformat(),
+        "slot_end": j.slot_end.isoformat(),
+        "status": j.status,
+    }
+
+
+@replica_reads
+def list_jobs(
+    db: Session, filters: JobFilter, limit: int = 50, cursor: Optional[str] = None
+) -> tuple[list[dict], Optional[str]]:
+    """Newest-first page of jobs and the cursor for the next page (None on the last page).
+
+    Keyset pagination on (created_at, job_id): each page is an index range scan on
+    idx_jobs_tenant_created / idx_jobs_created_job, however deep the caller pages.
+    """
+    stmt = filters.apply(select(Job))
+    if cursor:
+        stmt = stmt.where(tuple_(Job.created_at, Job.job_id) < decode_cursor(cursor))
+    rows = db.execute(stmt.order_by(Job.created_at.desc(), Job.job_id.desc()).limit(limit + 1)).scalars().all()
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].job_id) if len(rows) > limit else None
+    return [job_dict(j) for j in page], next_cursor
+
+
+def _export_value(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_jobs(filters: JobFilter, fmt: str = "ndjson") -> Iterator[str]:
+    """Stream matching jobs oldest-first as NDJSON lines or CSV, a batch at a time.
+
+    Owns its session for the life of the response; ``stream_results`` keeps a
+    server-side cursor open on Postgres so memory stays flat for any result size.
+    """
+    columns = [getattr(Job, name) for name in EXPORT_COLUMNS]
+    stmt = filters.apply(select(*columns)).order_by(Job.created_at.asc(), Job.job_id.asc())
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_BATCH))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        for batch in result.partitions():
+            for row in batch:
+                values = [_export_value(v) for v in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values))) + "\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
@@ -1,7 +1,28 @@
-import os
+import json
 from datetime import datetime
 
+from app import metrics
+from app.cache import SingleFlight
+from app.config import settings
+from app.logging import log
 from app.schemas import LeadIn
+from app.services.catalog import ServiceMatch, service_catalog
+from app.services.llm_client import (
+    complete,
+    complete_async,
+    llm_available,
+    strip_code_fences,
+    within_budget,
+    within_budget_async,
+)
+from app.services.templates import proposal_templates
+from app.services.nlu_cache import nlu_cache
+from app.services.reply_model import LABELS as REPLY_LABELS, reply_classifier
+
+
+# Identical NLU requests in flight at once (e.g. a campaign's replies) share one LLM call;
+# keys are the NLU cache keys, so "YES!" and "yes" coalesce too
+llm_flight = SingleFlight()
 
 
 def _fallback_message(lead: LeadIn, start: datetime, end: datetime) -> str:
@@ -14,134 +35,257 @@ def _fallback_message(lead: LeadIn, start: datetime, end: datetime) -> str:
 
 
 def generate_booking_proposal(lead: LeadIn, start: datetime, end: datetime) -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return _fallback_message(lead, start, end)
+    """Fill a stored per-(tenant, service) template; never waits on the LLM.
 
-    try:
-        # Lazy import to avoid mandatory dependency during interviews
-        from openai import OpenAI
-
-        client = OpenAI(api_key=api_key)
-        start_iso = start.isoformat()
-        end_iso = end.isoformat()
-        prompt = (
-            "You are a helpful scheduling assistant. Write a concise, friendly SMS to the customer. "
-            f"They requested: {lead.service}. Proposed slot: {start_iso} to {end_iso} (customer local time). "
-            "Keep it under 200 characters. Ask them to reply YES to confirm or reply RESCHEDULE."
-        )
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You write concise SMS confirmations."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.3,
-            max_tokens=120,
-        )
-        text = resp.choices[0].message.content.strip()
-        return text or _fallback_message(lead, start, end)
-    except Exception:
-        return _fallback_message(lead, start, end)
-
-
-def extract_entities_from_text(text: str) -> dict:
-    """Extract tenant_id and service from free text via OpenAI; fallback to simple heuristics."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    print(f"[DEBUG] API key present: {api_key is not None}, text: '{text}'")
-    if not api_key:
-        # naive heuristics
-        lower = text.lower()
-        tenant_id = None
-        service = None
-        # heuristic: tokens like t_* map to tenant
-        for token in lower.replace("\n", " ").split():
-            if token.startswith("t_"):
-                tenant_id = token
-                break
-        # simple service keyword samples
-        for svc in ["ac repair", "plumbing", "electrical", "hvac", "installation"]:
-            if svc in lower:
-                service = svc.title()
-                break
-        return {"tenant_id": tenant_id, "service": service}
+    Without templates the fixed fallback is sent and templates are generated in the
+    background for the next proposal.
+    """
+    text = proposal_templates.render(lead, start, end)
+    if text:
+        metrics.proposal_texts.inc("template")
+        return text
+    proposal_templates.request(lead.tenant_id, lead.service)
+    metrics.proposal_texts.inc("fallback")
+    return _fallback_message(lead, start, end)
+
+
+async def generate_booking_proposal_async(lead: LeadIn, start: datetime, end: datetime) -> str:
+    # Rendering is a local string join, so the async path shares the sync one
+    return generate_booking_proposal(lead, start, end)
+
+
+def _local_entities(text: str, tenant_id: str | None = None) -> tuple[dict, ServiceMatch | None]:
+    # heuristic: tokens like t_* map to tenant
+    text_tenant = None
+    for token in text.lower().replace("\n", " ").split():
+        if token.startswith("t_"):
+            text_tenant = token
+            break
+    match = service_catalog.match(text, tenant_id)
+    return {"tenant_id": text_tenant, "service": match.service if match else None}, match
+
+
+def _entities_request(text: str) -> dict:
+    prompt = (
+        "Extract tenant_id (string, like t_acme) and service (short phrase) from the user text. "
+        "Respond strictly as JSON with keys tenant_id and service. Text: " + text
+    )
+    return dict(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=120,
+    )
 
+
+def _parse_entities(content: str, tenant_id: str | None = None) -> dict:
+    data = json.loads(strip_code_fences(content))
+    # Normalize service to match DB conventions
+    service = data.get("service")
+    if service:
+        service = service_catalog.resolve(service, tenant_id)
+    return {"tenant_id": data.get("tenant_id"), "service": service}
+
+
+def _count_llm(operation: str, shared: bool) -> None:
+    if shared:
+        metrics.llm_coalesced.inc(operation)
+        metrics.nlu_requests.inc(operation, "coalesced")
+    else:
+        metrics.nlu_requests.inc(operation, "llm")
+
+
+def _extract_llm(text: str, tenant_id: str | None, key: str) -> dict:
+    # A call that just finished may have filled the cache between our lookup and the flight
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        return cached
+    content = complete("extract", _entities_request(text))
+    result = _parse_entities(content, tenant_id)
+    log.debug("llm_entities_extracted", extra={"content": content, **result})
+    nlu_cache.set(key, result)
+    return result
+
+
+async def _extract_llm_async(text: str, tenant_id: str | None, key: str) -> dict:
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        return cached
+    content = await complete_async("extract", _entities_request(text))
+    result = _parse_entities(content, tenant_id)
+    log.debug("llm_entities_extracted", extra={"content": content, **result})
+    nlu_cache.set(key, result)
+    return result
+
+
+def extract_entities_from_text(text: str, tenant_id: str | None = None) -> dict:
+    """Extract tenant_id and service from free text.
+
+    The tenant's service catalog answers locally; OpenAI is only asked when the local
+    match is missing or ambiguous. ``tenant_id`` (if already known) narrows the catalog.
+    """
+    local, match = _local_entities(text, tenant_id)
+    if match and match.confidence >= settings.service_match_min_confidence:
+        metrics.nlu_requests.inc("extract", "local")
+        return local
+    if not llm_available():
+        metrics.nlu_requests.inc("extract", "fallback")
+        return local
+
+    key = nlu_cache.key("extract", text, tenant_id)
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        metrics.nlu_requests.inc("extract", "cache")
+        return dict(cached)
     try:
-        from openai import OpenAI
+        result, shared = within_budget("extract", lambda: llm_flight.do(key, lambda: _extract_llm(text, tenant_id, key)))
+        _count_llm("extract", shared)
+        return dict(result)
+    except Exception as e:
+        log.warning("llm_extract_failed", extra={"error": f"{type(e).__name__}: {str(e)[:200]}"})
+        metrics.nlu_requests.inc("extract", "fallback")
+        return local
 
-        client = OpenAI(api_key=api_key)
-        prompt = (
-            "Extract tenant_id (string, like t_acme) and service (short phrase) from the user text. "
-            "Respond strictly as JSON with keys tenant_id and service. Text: " + text
-        )
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=120,
+
+async def extract_entities_from_text_async(text: str, tenant_id: str | None = None) -> dict:
+    local, match = _local_entities(text, tenant_id)
+    if match and match.confidence >= settings.service_match_min_confidence:
+        metrics.nlu_requests.inc("extract", "local")
+        return local
+    if not llm_available():
+        metrics.nlu_requests.inc("extract", "fallback")
+        return local
+
+    key = nlu_cache.key("extract", text, tenant_id)
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        metrics.nlu_requests.inc("extract", "cache")
+        return dict(cached)
+    try:
+        result, shared = await within_budget_async(
+            "extract", lambda: llm_flight.do_async(key, lambda: _extract_llm_async(text, tenant_id, key))
         )
-        content = resp.choices[0].message.content.strip()
-        print(f"[DEBUG] OpenAI response: {content}")
-        import json
-        
-        # Strip markdown code fences if present
-        if content.startswith("```"):
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1]) if len(lines) > 2 else content
-            content = content.strip()
-
-        data = json.loads(content)
-        # Normalize service to match DB conventions
-        service = data.get("service")
-        if service:
-            # Handle common service name mappings
-            service_lower = service.lower()
-            if "ac" in service_lower or "air conditioning" in service_lower:
-                service = "AC Repair"
-            elif "plumb" in service_lower:
-                service = "Plumbing"
-            elif "electr" in service_lower:
-                service = "Electrical"
-            elif "hvac" in service_lower:
-                service = "HVAC"
-            else:
-                service = service.title()
-        result = {"tenant_id": data.get("tenant_id"), "service": service}
-        print(f"[DEBUG] Extracted: {result}")
-        return result
+        _count_llm("extract", shared)
+        return dict(result)
     except Exception as e:
-        print(f"[DEBUG] OpenAI failed: {type(e).__name__}: {str(e)[:200]}")
-        return {"tenant_id": None, "service": None}
+        log.warning("llm_extract_failed", extra={"error": f"{type(e).__name__}: {str(e)[:200]}"})
+        metrics.nlu_requests.inc("extract", "fallback")
+        return local
 
 
-def classify_reply_text(text: str) -> str:
-    """Classify free-text reply into yes/confirm, no/reschedule, or unknown."""
-    api_key = os.getenv("OPENAI_API_KEY")
+def _fast_reply_label(text: str) -> str | None:
     lower = text.strip().lower()
     # fast-path heuristics
     if lower in {"yes", "y", "ok", "confirm", "sure", "book"}:
         return "yes"
-    if "resched" in lower or lower in {"no", "n", "later", "another time"}:
+    if "resched" in lower or lower in {"later", "another time"}:
+        return "reschedule"
+    if lower in {"no", "n"}:
         return "no"
-    if not api_key:
+    return None
+
+
+def _first_pass_label(text: str) -> str | None:
+    # Exact words, then the local model; None escalates to the LLM
+    label, source = _fast_reply_label(text), "local"
+    if label is None:
+        label, source = reply_classifier.confident_label(text), "model"
+    if label is None:
+        metrics.reply_first_pass.inc("escalated")
+        return None
+    metrics.reply_first_pass.inc("local")
+    metrics.nlu_requests.inc("classify", source)
+    return label
+
+
+def _reply_request(text: str) -> dict:
+    prompt = (
+        "Classify the user's SMS reply to an appointment offer as one of: yes, no, reschedule, cancel, unknown. "
+        "Return only the label. Reply: " + text
+    )
+    return dict(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=3,
+    )
+
+
+def _parse_reply_label(content: str) -> str:
+    label = content.strip().lower()
+    return label if label in REPLY_LABELS else "unknown"
+
+
+def _classify_llm(text: str, key: str) -> str:
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        return cached
+    label = _parse_reply_label(complete("classify", _reply_request(text)))
+    nlu_cache.set(key, label)
+    return label
+
+
+async def _classify_llm_async(text: str, key: str) -> str:
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        return cached
+    label = _parse_reply_label(await complete_async("classify", _reply_request(text)))
+    nlu_cache.set(key, label)
+    return label
+
+
+def classify_reply_text(text: str) -> str:
+    """Classify a free-text reply as yes, no, reschedule, cancel or unknown.
+
+    The local first pass answers confident cases; only the rest go to the LLM.
+    """
+    label = _first_pass_label(text)
+    if label:
+        return label
+    if not llm_available():
+        metrics.nlu_requests.inc("classify", "fallback")
         return "unknown"
+    key = nlu_cache.key("classify", text)
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        metrics.nlu_requests.inc("classify", "cache")
+        return cached
     try:
-        from openai import OpenAI
+        label, shared = within_budget("classify", lambda: llm_flight.do(key, lambda: _classify_llm(text, key)))
+        _count_llm("classify", shared)
+        return label
+    except Exception:
+        metrics.nlu_requests.inc("classify", "fallback")
+        return "unknown"
 
-        client = OpenAI(api_key=api_key)
-        prompt = (
-            "Classify the user's SMS reply as one of: yes, no, unknown. "
-            "Return only the label. Reply: " + text
-        )
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=3,
-        )
-        label = resp.choices[0].message.content.strip().lower()
-        return label if label in {"yes", "no"} else "unknown"
+
+async def classify_reply_text_async(text: str) -> str:
+    label = _first_pass_label(text)
+    if label:
+        return label
+    if not llm_available():
+        metrics.nlu_requests.inc("classify", "fallback")
+        return "unknown"
+    key = nlu_cache.key("classify", text)
+    cached = nlu_cache.get(key)
+    if cached is not None:
+        metrics.nlu_requests.inc("classify", "cache")
+        return cached
+    try:
+        label, shared = await within_budget_async("classify", lambda: llm_flight.do_async(key, lambda: _classify_llm_async(text, key)))
+        _count_llm("classify", shared)
+        return label
     except Exception:
+        metrics.nlu_requests.inc("classify", "fallback")
         return "unknown"
 
 
+def _escalation_ratio() -> dict[tuple, float]:
+    counts = metrics.reply_first_pass.collect()
+    total = sum(counts.values())
+    return {(): counts.get(("escalated",), 0.0) / total if total else 0.0}
+
+
+metrics.register(metrics.CallbackMetric(
+    "reply_llm_escalation_ratio", "Share of replies the local first pass sent to the LLM", "gauge", (), _escalation_ratio,
+))
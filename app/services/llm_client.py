@@ -0,0 +1,349 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterator, Protocol
+
+from app import metrics
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class OperationPolicy:
+    timeout: float
+    max_retries: int
+
+
+# Per-operation timeout (seconds) and retry budget for the external call
+POLICIES: dict[str, OperationPolicy] = {
+    "proposal": OperationPolicy(settings.llm_timeout_proposal, settings.llm_retries_proposal),
+    "extract": OperationPolicy(settings.llm_timeout_extract, settings.llm_retries_extract),
+    "classify": OperationPolicy(settings.llm_timeout_classify, settings.llm_retries_classify),
+}
+
+
+# Operations that interpret customer text; a request may spend at most
+# settings.llm_max_nlu_calls_per_request external calls on these
+NLU_OPERATIONS = {"extract", "classify"}
+
+
+class LLMCallLimitExceeded(RuntimeError):
+    pass
+
+
+class LLMUnavailable(RuntimeError):
+    """Raised instead of calling out while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Refuse calls for ``cooldown`` seconds after ``threshold`` consecutive failures.
+
+    Once the cooldown has passed a single trial call is let through (and the cooldown
+    restarts); its success closes the breaker, its failure keeps it open.
+    """
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.cooldown:
+                return False
+            self._opened_at = now
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.success()
+
+
+class LLMBackend(Protocol):
+    def complete(self, operation: str, request: dict) -> str: ...
+
+    async def complete_async(self, operation: str, request: dict) -> str: ...
+
+
+class OpenAIBackend:
+    """OpenAI-compatible chat completions over one keep-alive connection pool per process.
+
+    ``base_url`` lets tests and benchmarks aim the same code at a local stub server.
+    """
+
+    def __init__(self, api_key: str, base_url: str | None = None) -> None:
+        # Lazy import to avoid mandatory dependency during interviews
+        import httpx
+        from openai import OpenAI
+
+        self.api_key = api_key
+        self.base_url = base_url
+        self._limits = httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive,
+        )
+        base = OpenAI(api_key=api_key, base_url=base_url, http_client=httpx.Client(limits=self._limits), max_retries=0)
+        # with_options copies share the underlying httpx pool
+        self._clients = {
+            op: base.with_options(timeout=policy.timeout, max_retries=policy.max_retries)
+            for op, policy in POLICIES.items()
+        }
+        self._async_clients: dict = {}
+        self._async_loop = None
+        self._async_lock = threading.Lock()
+
+    def _async_client(self, operation: str):
+        # An httpx.AsyncClient pool belongs to the event loop that opened it
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            if self._async_loop is not loop:
+                import httpx
+                from openai import AsyncOpenAI
+
+                base = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=httpx.AsyncClient(limits=self._limits),
+                    max_retries=0,
+                )
+                self._async_clients = {
+                    op: base.with_options(timeout=policy.timeout, max_retries=policy.max_retries)
+                    for op, policy in POLICIES.items()
+                }
+                self._async_loop = loop
+            return self._async_clients[operation]
+
+    def complete(self, operation: str, request: dict) -> str:
+        resp = self._clients[operation].chat.completions.create(**request)
+        return (resp.choices[0].message.content or "").strip()
+
+    async def complete_async(self, operation: str, request: dict) -> str:
+        resp = await self._async_client(operation).chat.completions.create(**request)
+        return (resp.choices[0].message.content or "").strip()
+
+
+@dataclass
+class LLMCallScope:
+    route: str
+    nlu_limit: int | None
+    # Seconds the request will wait on one LLM answer; None waits for the call's own timeout
+    budget: float | None = None
+    calls: Counter = field(default_factory=Counter)
+
+    @property
+    def nlu_calls(self) -> int:
+        return sum(self.calls[op] for op in NLU_OPERATIONS)
+
+
+_scope: ContextVar[LLMCallScope | None] = ContextVar("llm_call_scope", default=None)
+_route_calls: dict[str, Counter] = {}
+_route_lock = threading.Lock()
+
+
+@contextmanager
+def llm_call_scope(route: str, nlu_limit: int | None = None, budget: float | None = None) -> Iterator[LLMCallScope]:
+    """Count external LLM calls made while handling one request to ``route``."""
+    scope = LLMCallScope(route=route, nlu_limit=nlu_limit, budget=budget)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+        with _route_lock:
+            totals = _route_calls.setdefault(route, Counter())
+            totals["requests"] += 1
+            totals.update(scope.calls)
+
+
+def llm_call_stats() -> dict[str, dict[str, int]]:
+    with _route_lock:
+        return {route: dict(counts) for route, counts in _route_calls.items()}
+
+
+def _count_call(operation: str) -> None:
+    scope = _scope.get()
+    if scope is None:
+        return
+    if operation in NLU_OPERATIONS and scope.nlu_limit is not None and scope.nlu_calls >= scope.nlu_limit:
+        raise LLMCallLimitExceeded(f"{scope.route} already made {scope.nlu_calls} NLU call(s)")
+    scope.calls[operation] += 1
+
+
+def _budget() -> float | None:
+    scope = _scope.get()
+    return scope.budget if scope is not None else None
+
+
+# Sync callers run the call on a pool thread so they can stop waiting while it finishes
+_budget_pool = ThreadPoolExecutor(max_workers=settings.llm_max_connections, thread_name_prefix="llm-budget")
+_late_tasks: set[asyncio.Task] = set()
+
+
+def within_budget(operation: str, fn: Callable[[], Any]) -> Any:
+    """Run ``fn`` but give up waiting once the request's budget is spent.
+
+    Raises ``TimeoutError``; ``fn`` keeps running, so a late answer can still fill caches.
+    """
+    budget = _budget()
+    if budget is None:
+        return fn()
+    future = _budget_pool.submit(contextvars.copy_context().run, fn)
+    try:
+        return future.result(timeout=budget)
+    except TimeoutError:
+        metrics.llm_budget_exceeded.inc(_scope.get().route, operation)
+        raise
+
+
+def _finish_late(task: asyncio.Task) -> None:
+    _late_tasks.discard(task)
+    if not task.cancelled():
+        task.exception()  # retrieved: a late failure was already handled by the caller's fallback
+
+
+async def within_budget_async(operation: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    budget = _budget()
+    if budget is None:
+        return await fn()
+    task = asyncio.ensure_future(fn())
+    # The loop only holds tasks weakly; keep late ones alive until they finish
+    _late_tasks.add(task)
+    task.add_done_callback(_finish_late)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), budget)
+    except TimeoutError:
+        metrics.llm_budget_exceeded.inc(_scope.get().route, operation)
+        raise
+
+
+breaker = CircuitBreaker(settings.llm_breaker_failures, settings.llm_breaker_cooldown_seconds)
+
+
+def _record(started: float) -> None:
+    # A call that outlived the request's budget counts against the breaker like an error
+    budget = _budget()
+    if budget is not None and time.perf_counter() - started > budget:
+        breaker.failure()
+    else:
+        breaker.success()
+
+
+_backend: LLMBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> LLMBackend | None:
+    """Process-wide backend, built on first use; None when no LLM is configured."""
+    global _backend
+    if _backend is not None:
+        return _backend
+    api_key = os.getenv("OPENAI_API_KEY")
+    base_url = os.getenv("LLM_BASE_URL")
+    if not api_key and not base_url:
+        return None
+    with _backend_lock:
+        if _backend is None:
+            # Local stub servers accept any key
+            _backend = OpenAIBackend(api_key or "stub", base_url=base_url)
+    return _backend
+
+
+def set_backend(backend: LLMBackend | None) -> None:
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def llm_available() -> bool:
+    return get_backend() is not None
+
+
+def strip_code_fences(content: str) -> str:
+    # OpenAI responses may wrap JSON in markdown fences
+    if content.startswith("```"):
+        lines = content.split("\n")
+        content = "\n".join(lines[1:-1]) if len(lines) > 2 else content
+        content = content.strip()
+    return content
+
+
+def complete(operation: str, request: dict) -> str:
+    backend = get_backend()
+    if backend is None:
+        raise RuntimeError("LLM backend not configured")
+    if not breaker.allow():
+        metrics.llm_short_circuits.inc(operation)
+        raise LLMUnavailable("LLM circuit breaker is open")
+    _count_call(operation)
+    start, outcome = time.perf_counter(), "error"
+    try:
+        content = backend.complete(operation, request)
+        outcome = "ok"
+        return content
+    except Exception:
+        breaker.failure()
+        raise
+    finally:
+        if outcome == "ok":
+            _record(start)
+        metrics.llm_latency.observe(time.perf_counter() - start, operation, outcome)
+
+
+async def complete_async(operation: str, request: dict) -> str:
+    backend = get_backend()
+    if backend is None:
+        raise RuntimeError("LLM backend not configured")
+    if not breaker.allow():
+        metrics.llm_short_circuits.inc(operation)
+        raise LLMUnavailable("LLM circuit breaker is open")
+    _count_call(operation)
+    start, outcome = time.perf_counter(), "error"
+    try:
+        content = await backend.complete_async(operation, request)
+        outcome = "ok"
+        return content
+    except Exception:
+        breaker.failure()
+        raise
+    finally:
+        if outcome == "ok":
+            _record(start)
+        metrics.llm_latency.observe(time.perf_counter() - start, operation, outcome)
+
+
+def _route_call_samples() -> dict[tuple, float]:
+    return {(route, op): n for route, counts in llm_call_stats().items() for op, n in counts.items() if op != "requests"}
+
+
+metrics.register(metrics.CallbackMetric(
+    "llm_route_calls_total", "External LLM calls made while serving each route", "counter",
+    ("route", "operation"), _route_call_samples,
+))
+metrics.register(metrics.CallbackMetric(
+    "llm_breaker_open", "1 while the LLM circuit breaker is refusing calls", "gauge", (), lambda: {(): float(breaker.is_open)},
+))
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.config import settings
+from app.db import SessionLocal
+from app.logging import log
+from app.models import Capacity, Idempotency, Outbox, Proposal
+from app.services.capacity import drop_holds, release_expired_holds, restore_slots
+from app.services.conversation import conversations
+
+
+def _batches(db: Session, step: Callable[[Session, int], int], batch_size: int, max_batches: int) -> int:
+    # One commit per batch keeps each write lock short; stop on a short batch or at the cap
+    done = 0
+    for _ in range(max_batches):
+        count = step(db, batch_size)
+        db.commit()
+        done += count
+        if count < batch_size:
+            break
+    return done
+
+
+def _delete_where(pk, *conditions) -> Callable[[Session, int], int]:
+    def step(db: Session, batch_size: int) -> int:
+        ids = select(pk).where(*conditions).limit(batch_size).scalar_subquery()
+        result = db.execute(delete(pk.class_).where(pk.in_(ids)).execution_options(synchronize_session=False))
+        return result.rowcount or 0
+
+    return step
+
+
+def _expire_proposals(cutoff: datetime) -> Callable[[Session, int], int]:
+    def step(db: Session, batch_size: int) -> int:
+        rows = db.execute(
+            select(Proposal.proposal_id, Proposal.phone)
+            .where(Proposal.status == "PROPOSED", Proposal.created_at < cutoff)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return 0
+        ids = [r.proposal_id for r in rows]
+        freed = drop_holds(db, ids)
+        for r in rows:
+            conversations.forget(r.phone, r.proposal_id)
+        result = db.execute(
+            update(Proposal)
+            .where(Proposal.proposal_id.in_(ids), Proposal.status == "PROPOSED")
+            .values(status="EXPIRED")
+            .execution_options(synchronize_session=False)
+        )
+        # The freed units are offered again only once the batch is committed
+        db.commit()
+        restore_slots(freed)
+        return result.rowcount or 0
+
+    return step
+
+
+def sweep(now: Optional[datetime] = None) -> dict[str, int]:
+    """Expire stale proposals and delete rows past retention, a small batch at a time.
+
+    Returns the number of rows handled per step.
+    """
+    now = now or datetime.utcnow()
+    batch, cap = settings.maintenance_batch_size, settings.maintenance_max_batches
+    # step name -> ((table, action) metric labels, step)
+    steps = {
+        "holds_released": (("holds", "released"), lambda db, n: release_expired_holds(db, limit=n)),
+        "proposals_expired": (
+            ("proposals", "expired"),
+            _expire_proposals(now - timedelta(seconds=settings.proposal_expire_seconds)),
+        ),
+        "capacity_deleted": (
+            ("capacity", "deleted"),
+            _delete_where(
+                Capacity.id,
+                Capacity.start_dt < now - timedelta(hours=settings.capacity_retention_hours),
+                Capacity.booked == 0,
+                Capacity.held == 0,
+            ),
+        ),
+        "capacity_booked_deleted": (
+            ("capacity", "booked_deleted"),
+            _delete_where(
+                Capacity.id,
+                Capacity.start_dt < now - timedelta(days=settings.capacity_booked_retention_days),
+                Capacity.held == 0,
+            ),
+        ),
+        "proposals_deleted": (
+            ("proposals", "deleted"),
+            _delete_where(
+                Proposal.proposal_id,
+                Proposal.status != "PROPOSED",
+                Proposal.created_at < now - timedelta(days=settings.proposal_retention_days),
+            ),
+        ),
+        "idempotency_deleted": (
+            ("idempotency", "deleted"),
+            _delete_where(Idempotency.key, Idempotency.created_at < now - timedelta(days=settings.idempotency_retention_days)),
+        ),
+        "outbox_deleted": (
+            ("outbox", "deleted"),
+            _delete_where(
+                Outbox.id,
+                Outbox.status.in_(("SENT", "DEAD")),
+                Outbox.created_at < now - timedelta(days=settings.outbox_retention_days),
+            ),
+        ),
+    }
+    counts = {}
+    db = SessionLocal()
+    try:
+        for name, (_, step) in steps.items():
+            counts[name] = _batches(db, step, batch, cap)
+    finally:
+        db.close()
+    for name, count in counts.items():
+        if count:
+            table, action = steps[name][0]
+            metrics.maintenance_rows.inc(table, action, value=count)
+    if any(counts.values()):
+        log.info("maintenance_swept", extra=counts)
+    return counts
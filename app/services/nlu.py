@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+
+from app.services.intent import classify_text_intent
+from app.services.llm import extract_entities_from_text, extract_entities_from_text_async
+
+
+@dataclass
+class InboundNlu:
+    """Everything an inbound message handler needs from the text, resolved in one pass."""
+
+    tenant_id: str | None
+    service: str | None
+    intent: str
+    tenant_source: str | None
+
+
+def _build(entities: dict, text: str, tenant_id: str | None) -> InboundNlu:
+    if tenant_id:
+        source = "phone"
+    else:
+        tenant_id = entities.get("tenant_id")
+        source = "nlu" if tenant_id else None
+    return InboundNlu(
+        tenant_id=tenant_id,
+        service=entities.get("service"),
+        intent=classify_text_intent(text),
+        tenant_source=source,
+    )
+
+
+def understand_inbound(text: str, tenant_id: str | None = None) -> InboundNlu:
+    # ``tenant_id`` is the phone-directory answer, which wins over anything in the text
+    return _build(extract_entities_from_text(text, tenant_id=tenant_id), text, tenant_id)
+
+
+async def understand_inbound_async(text: str, tenant_id: str | None = None) -> InboundNlu:
+    return _build(await extract_entities_from_text_async(text, tenant_id=tenant_id), text, tenant_id)
@@ -0,0 +1,88 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from app import metrics
+from app.cache import MISSING, TTLCache
+from app.config import settings
+
+
+_PUNCT = re.compile(r"[^\w\s/']")
+
+
+def normalize_text(text: str) -> str:
+    # "AC not cooling!!" and "ac  not cooling" are the same question
+    return " ".join(_PUNCT.sub(" ", text.lower()).split())
+
+
+class NluCache:
+    """LRU+TTL cache of LLM NLU results, optionally backed by a SQLite file so warm
+    entries survive restarts. Keys are ``operation|tenant|normalized text``."""
+
+    def __init__(self, maxsize: int, ttl: float, path: str | None = None) -> None:
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize, ttl)
+        self.disk_hits = 0
+        self._disk: sqlite3.Connection | None = None
+        self._disk_lock = threading.Lock()
+        if path:
+            self._disk = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS nlu_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def key(operation: str, text: str, tenant_id: str | None = None) -> str:
+        return f"{operation}|{tenant_id or ''}|{normalize_text(text)}"
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not MISSING or self._disk is None:
+            return None if value is MISSING else value
+        with self._disk_lock:
+            row = self._disk.execute("SELECT value, expires_at FROM nlu_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        value = json.loads(row[0])
+        self.disk_hits += 1
+        self.memory.set(key, value, ttl=remaining)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO nlu_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + self.ttl),
+                )
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk_hits = 0
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM nlu_cache")
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        return stats
+
+
+nlu_cache = NluCache(settings.nlu_cache_size, settings.nlu_cache_ttl_seconds, settings.nlu_cache_path)
+
+metrics.register(metrics.CallbackMetric(
+    "nlu_cache_lookups_total", "NLU cache lookups by result", "counter", ("result",),
+    lambda: {(name,): value for name, value in nlu_cache.stats().items() if name != "size"},
+))
+metrics.register(metrics.CallbackMetric(
+    "nlu_cache_entries", "Entries in the in-memory NLU cache", "gauge", (), lambda: {(): len(nlu_cache.memory)},
+))
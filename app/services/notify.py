@@ -1,15 +1,89 @@
+import threading
+import time
 import uuid
+from datetime import datetime
+from typing import Protocol
 
-from app.models import Job
+from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.models import Job, Outbox
 
-def send_confirmation(job: Job) -> None:
-    print(f"[SMS] {job.phone}: Booked {job.service} {job.slot_start:%m/%d %I:%M%p}")
 
+class SmsProvider(Protocol):
+    def send(self, phone: str, text: str, message_id: str) -> None:
+        """Deliver one message; raise to have the outbox retry it."""
+        ...
 
-def send_sms(phone: str, text: str) -> str:
-    message_id = f"msg_{uuid.uuid4().hex}"
-    print(f"[SMS->{phone}] {text} (message_id={message_id})")
-    return message_id
 
+class LogProvider:
+    def send(self, phone: str, text: str, message_id: str) -> None:
+        print(f"[SMS->{phone}] {text} (message_id={message_id})")
 
+
+class MockProvider:
+    """Records deliveries in memory; ``fail`` lists how many times each phone should fail first."""
+
+    def __init__(self, fail: dict[str, int] | None = None, delay: float = 0.0) -> None:
+        self.sent: list[tuple[str, str, str]] = []
+        self.fail = dict(fail or {})
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def send(self, phone: str, text: str, message_id: str) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            if self.fail.get(phone, 0) > 0:
+                self.fail[phone] -= 1
+                raise RuntimeError(f"mock provider failure for {phone}")
+            self.sent.append((phone, text, message_id))
+
+
+_PROVIDERS = {"log": LogProvider, "mock": lambda: MockProvider(delay=settings.sms_mock_delay_ms / 1000)}
+_provider: SmsProvider | None = None
+
+
+def get_provider() -> SmsProvider:
+    global _provider
+    if _provider is None:
+        _provider = _PROVIDERS[settings.sms_provider]()
+    return _provider
+
+
+def set_provider(provider: SmsProvider | None) -> None:
+    global _provider
+    _provider = provider
+
+
+def new_message_id() -> str:
+    return f"msg_{uuid.uuid4().hex}"
+
+
+def outbox_values(phone: str, text: str, message_id: str | None = None, kind: str = "sms") -> dict:
+    now = datetime.utcnow()
+    return dict(
+        message_id=message_id or new_message_id(),
+        kind=kind,
+        phone=phone,
+        body=text,
+        status="PENDING",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+
+
+def enqueue_sms(db: Session, phone: str, text: str, message_id: str | None = None, kind: str = "sms") -> str:
+    """Add a message to the outbox in the caller's transaction; the outbox worker delivers it."""
+    values = outbox_values(phone, text, message_id=message_id, kind=kind)
+    db.add(Outbox(**values))
+    return values["message_id"]
+
+
+def confirmation_text(job: Job) -> str:
+    return f"Booked {job.service} {job.slot_start:%m/%d %I:%M%p}"
+
+
+def enqueue_confirmation(db: Session, job: Job) -> str:
+    return enqueue_sms(db, job.phone, confirmation_text(job), kind="confirmation")
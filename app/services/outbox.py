@@ -0,0 +1,126 @@
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from app import metrics
+from app.config import settings
+from app.db import SessionLocal
+from app.logging import log
+from app.models import Outbox
+from app.services.notify import SmsProvider, get_provider
+
+
+_executor = ThreadPoolExecutor(max_workers=settings.outbox_concurrency, thread_name_prefix="outbox-send")
+
+
+def _backoff(attempts: int) -> float:
+    # Exponential with jitter so a provider outage does not retry in lockstep
+    base = settings.outbox_backoff_seconds * 2 ** (attempts - 1)
+    return min(base, settings.outbox_backoff_max_seconds) * random.uniform(0.5, 1.0)
+
+
+def _claim_batch(batch_size: int) -> list[Outbox]:
+    # Pending rows, plus SENDING rows whose lease ran out because a worker died mid-batch
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = (
+        select(Outbox.id)
+        .where(Outbox.status.in_(("PENDING", "SENDING")), Outbox.next_attempt_at <= now)
+        .order_by(Outbox.next_attempt_at.asc(), Outbox.id.asc())
+        .limit(batch_size)
+    )
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Outbox)
+            .where(
+                Outbox.id.in_(due.scalar_subquery()),
+                Outbox.status.in_(("PENDING", "SENDING")),
+                Outbox.next_attempt_at <= now,
+            )
+            .values(
+                status="SENDING",
+                claim_token=token,
+                next_attempt_at=now + timedelta(seconds=settings.outbox_lease_seconds),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return db.execute(select(Outbox).where(Outbox.claim_token == token).order_by(Outbox.id)).scalars().all()
+    finally:
+        db.close()
+
+
+def _send(provider: SmsProvider, row: Outbox) -> str | None:
+    start = time.perf_counter()
+    try:
+        provider.send(row.phone, row.body, row.message_id)
+        metrics.sms_send_latency.observe(time.perf_counter() - start, "ok")
+        return None
+    except Exception as e:
+        metrics.sms_send_latency.observe(time.perf_counter() - start, "error")
+        return f"{type(e).__name__}: {str(e)[:200]}"
+
+
+def drain_outbox(batch_size: int | None = None, provider: SmsProvider | None = None) -> int:
+    """Claim one batch of due messages, send them concurrently and record the outcomes.
+
+    Returns the number of messages claimed.
+    """
+    provider = provider or get_provider()
+    rows = _claim_batch(batch_size or settings.outbox_batch_size)
+    if not rows:
+        return 0
+    errors = list(_executor.map(lambda row: _send(provider, row), rows))
+
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for row, error in zip(rows, errors):
+            # Only the claimant may settle a row; a lapsed lease may have handed it to another worker
+            owned = (Outbox.id == row.id, Outbox.claim_token == row.claim_token)
+            if error is None:
+                values = dict(status="SENT", sent_at=now, attempts=row.attempts + 1, claim_token=None, last_error=None)
+            else:
+                attempts = row.attempts + 1
+                dead = attempts >= settings.outbox_max_attempts
+                values = dict(
+                    status="DEAD" if dead else "PENDING",
+                    attempts=attempts,
+                    last_error=error,
+                    claim_token=None,
+                    next_attempt_at=now + timedelta(seconds=0 if dead else _backoff(attempts)),
+                )
+                log.warning(
+                    "outbox_send_failed",
+                    extra={"message_id": row.message_id, "attempts": attempts, "dead": dead, "error": error},
+                )
+            db.execute(update(Outbox).where(*owned).values(**values))
+        db.commit()
+    finally:
+        db.close()
+    return len(rows)
+
+
+def run_outbox() -> int:
+    # Periodic entry point: keep draining while batches come back full
+    batch_size = settings.outbox_batch_size
+    total = 0
+    while True:
+        claimed = drain_outbox(batch_size)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+def outbox_stats() -> dict[str, int]:
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(Outbox.status, func.count()).group_by(Outbox.status)).all()
+    finally:
+        db.close()
+    return {status: count for status, count in rows}
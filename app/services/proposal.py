@@ -5,9 +5,16 @@ from types import SimpleNamespace
 from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
-from app.models import Proposal, TenantPhone
-from app.services.booking import book_job
-from app.services.capacity import try_mark_slot_booked, pick_slot
+from app.models import Proposal
+from app.services.booking import book_job, get_idempotent_job
+from app.services.capacity import try_mark_slot_booked, release_hold
+from app.services.conversation import ActiveProposal, conversations
+from app.services.notify import enqueue_sms
+
+
+def new_proposal_id() -> str:
+    # Generated up front so the slot hold can be taken under the proposal's id
+    return uuid.uuid4().hex
 
 
 def create_proposal(
@@ -16,10 +23,13 @@ def create_proposal(
     start,
     end,
     message_text: str,
-    message_id: str,
+    message_id: str | None = None,
+    proposal_id: str | None = None,
 ):
+    # The proposal SMS goes into the outbox in the same transaction as the proposal row
+    message_id = enqueue_sms(db, lead.phone, message_text, message_id=message_id)
     proposal = Proposal(
-        proposal_id=uuid.uuid4().hex,
+        proposal_id=proposal_id or new_proposal_id(),
         tenant_id=lead.tenant_id,
         customer_name=lead.name,
         phone=lead.phone,
@@ -33,47 +43,88 @@ def create_proposal(
         created_at=datetime.utcnow(),
     )
     db.add(proposal)
+    active = ActiveProposal.of(proposal)
     db.commit()
+    conversations.remember(active)
     return proposal
 
 
-def get_proposal_by_message_id(db: Session, message_id: str):
+# Both lookups below feed a confirm, cancel or reschedule, so they read the primary: a
+# lagging replica could hand back a proposal that was already confirmed or cancelled.
+def get_proposal_by_message_id(db: Session, message_id: str, phone: str | None = None):
+    # The SMS being answered is usually the phone's open proposal, already in memory
+    if phone is not None:
+        active = conversations.get(phone)
+        if active is not None and active.message_id == message_id:
+            return active
     return db.execute(select(Proposal).where(Proposal.message_id == message_id)).scalar_one_or_none()
 
 
-def get_latest_proposal_by_phone(db: Session, phone: str):
-    return db.execute(
-        select(Proposal).where(Proposal.phone == phone).order_by(Proposal.created_at.desc()).limit(1)
+def get_latest_proposal_by_phone(db: Session, phone: str) -> ActiveProposal | None:
+    """The phone's newest open (PROPOSED) proposal: cached, else one index lookup."""
+    active = conversations.get(phone)
+    if active is not None:
+        return active
+    row = db.execute(
+        select(Proposal)
+        .where(Proposal.phone == phone, Proposal.status == "PROPOSED")
+        .order_by(Proposal.created_at.desc())
+        .limit(1)
     ).scalar_one_or_none()
+    return conversations.remember(row) if row is not None else None
 
 
-def resolve_tenant_by_phone(db: Session, phone: str) -> str | None:
-    rec = db.execute(select(TenantPhone).where(TenantPhone.phone == phone).limit(1)).scalar_one_or_none()
-    return rec.tenant_id if rec else None
+def release_proposal_hold(db: Session, proposal) -> bool:
+    return release_hold(
+        db, proposal.tenant_id, proposal.service, proposal.slot_start, proposal.slot_end, proposal.proposal_id
+    )
 
 
-def confirm_proposal(db: Session, proposal: Proposal):
-    # Attempt to book the proposed slot; if taken, pick next available
-    success = try_mark_slot_booked(
-        db, proposal.tenant_id, proposal.service, proposal.slot_start, proposal.slot_end
+def cancel_proposal(db: Session, proposal) -> None:
+    """Give the held slot back and close the proposal; the customer no longer wants the visit."""
+    release_proposal_hold(db, proposal)
+    db.execute(
+        update(Proposal)
+        .where(Proposal.proposal_id == proposal.proposal_id, Proposal.status == "PROPOSED")
+        .values(status="CANCELLED")
     )
-    if not success:
-        next_slot = pick_slot(db, proposal.tenant_id, proposal.service)
-        if not next_slot:
-            return None
-        start, end = next_slot
-    else:
-        start, end = proposal.slot_start, proposal.slot_end
+    db.commit()
+    conversations.forget(proposal.phone, proposal.proposal_id)
+
+
+def _confirm_event_id(proposal) -> str:
+    return f"{proposal.message_id}:confirm"
+
+
+def confirm_proposal(db: Session, proposal):
+    if proposal.status != "PROPOSED":
+        # A repeated YES: hand back the job the first one booked without claiming again
+        return get_idempotent_job(db, _confirm_event_id(proposal))
+    # Convert our hold into a booking. If it lapsed and the window filled up, the time the
+    # customer accepted is gone: close the proposal and leave it to dispatch rather than
+    # booking a window they never saw
+    if not try_mark_slot_booked(
+        db, proposal.tenant_id, proposal.service, proposal.slot_start, proposal.slot_end,
+        holder=proposal.proposal_id,
+    ):
+        db.execute(
+            update(Proposal)
+            .where(Proposal.proposal_id == proposal.proposal_id, Proposal.status == "PROPOSED")
+            .values(status="EXPIRED")
+        )
+        db.commit()
+        conversations.forget(proposal.phone, proposal.proposal_id)
+        return None
 
     lead_like = SimpleNamespace(
-        event_id=f"{proposal.message_id}:confirm",
+        event_id=_confirm_event_id(proposal),
         tenant_id=proposal.tenant_id,
         name=proposal.customer_name,
         phone=proposal.phone,
         address=proposal.address,
         service=proposal.service,
     )
-    job = book_job(db, lead_like, (start, end))
+    job = book_job(db, lead_like, (proposal.slot_start, proposal.slot_end))
     # Update proposal status
     db.execute(
         update(Proposal)
@@ -81,6 +132,7 @@ def confirm_proposal(db: Session, proposal: Proposal):
         .values(status="CONFIRMED")
     )
     db.commit()
+    conversations.forget(proposal.phone, proposal.proposal_id)
     return job
 
 
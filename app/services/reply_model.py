@@ -0,0 +1,172 @@
+import csv
+import json
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+from app.config import settings
+from app.logging import log
+from app.services.nlu_cache import normalize_text
+
+
+LABELS = ("yes", "no", "reschedule", "cancel", "unknown")
+# Labels that act irreversibly (cancelling a proposal); only the LLM answers these
+ESCALATED_LABELS = frozenset({"cancel"})
+DEFAULT_BUCKETS = 1 << 14
+
+
+def features(text: str, buckets: int) -> list[int]:
+    # Unigrams and bigrams hashed into a fixed space; crc32 is stable across processes
+    tokens = normalize_text(text).split()
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return [zlib.crc32(gram.encode()) % buckets for gram in grams]
+
+
+@dataclass(frozen=True)
+class Prediction:
+    label: str
+    confidence: float
+    # Features the model saw in training; a text with none has no evidence at all
+    known: int
+
+
+class ReplyModel:
+    """Multinomial naive Bayes over hashed unigram+bigram features.
+
+    Only buckets seen in training are stored. Unseen buckets carry no evidence, so text
+    made only of new words scores zero confidence instead of falling back to the prior.
+    """
+
+    def __init__(self, labels: Sequence[str], buckets: int, log_prior: Sequence[float], weights: dict[int, tuple[float, ...]]) -> None:
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self.log_prior = tuple(log_prior)
+        self.weights = weights
+
+    def _score(self, feats: Iterable[int]) -> Prediction:
+        totals = list(self.log_prior)
+        known = 0
+        for f in feats:
+            row = self.weights.get(f)
+            if row is None:
+                continue
+            known += 1
+            totals = [t + w for t, w in zip(totals, row)]
+        top = max(totals)
+        best = totals.index(top)
+        if not known:
+            return Prediction(self.labels[best], 0.0, 0)
+        norm = sum(math.exp(t - top) for t in totals)
+        return Prediction(self.labels[best], 1.0 / norm, known)
+
+    def predict(self, text: str) -> Prediction:
+        return self._score(features(text, self.buckets))
+
+    def to_dict(self) -> dict:
+        return {
+            "labels": list(self.labels),
+            "buckets": self.buckets,
+            "log_prior": [round(p, 5) for p in self.log_prior],
+            "weights": {str(f): [round(w, 5) for w in row] for f, row in sorted(self.weights.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReplyModel":
+        weights = {int(f): tuple(row) for f, row in data["weights"].items()}
+        return cls(data["labels"], data["buckets"], data["log_prior"], weights)
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "ReplyModel":
+        with open(path) as fh:
+            return cls.from_dict(json.load(fh))
+
+
+def train(examples: Iterable[tuple[str, str]], buckets: int = DEFAULT_BUCKETS, alpha: float = 0.5) -> ReplyModel:
+    """Fit on ``(text, label)`` pairs; labels outside ``LABELS`` are skipped."""
+    docs: Counter = Counter()
+    counts: dict[str, Counter] = {label: Counter() for label in LABELS}
+    for text, label in examples:
+        if label not in counts:
+            continue
+        docs[label] += 1
+        counts[label].update(features(text, buckets))
+    labels = [label for label in LABELS if docs[label]]
+    if not labels:
+        raise ValueError("no labelled examples")
+    vocabulary = set().union(*(counts[label] for label in labels))
+    n_docs = sum(docs.values())
+    log_prior = [math.log(docs[label] / n_docs) for label in labels]
+    denominators = {label: sum(counts[label].values()) + alpha * len(vocabulary) for label in labels}
+    weights = {
+        f: tuple(math.log((counts[label][f] + alpha) / denominators[label]) for label in labels)
+        for f in vocabulary
+    }
+    return ReplyModel(labels, buckets, log_prior, weights)
+
+
+def read_examples(path: str) -> list[tuple[str, str]]:
+    # CSV with ``text`` and ``label`` columns
+    with open(path, newline="") as fh:
+        return [(row["text"], row["label"].strip().lower()) for row in csv.DictReader(fh)]
+
+
+def answers_locally(prediction: Prediction, min_confidence: float) -> bool:
+    """Whether the first pass may act on ``prediction`` without asking the LLM."""
+    return prediction.label not in ESCALATED_LABELS and prediction.confidence >= min_confidence
+
+
+class ReplyClassifier:
+    """Lazily loaded model behind ``settings.reply_model_path``; absent file means no local model."""
+
+    def __init__(self, path: str | None, min_confidence: float) -> None:
+        self.path = path
+        self.min_confidence = min_confidence
+        self._model: ReplyModel | None = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> ReplyModel | None:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._model = self._load()
+                    self._loaded = True
+        return self._model
+
+    def _load(self) -> ReplyModel | None:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            return ReplyModel.load(self.path)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("reply_model_load_failed", extra={"path": self.path, "error": f"{type(e).__name__}: {e}"})
+            return None
+
+    def set_model(self, model: ReplyModel | None) -> None:
+        with self._lock:
+            self._model = model
+            self._loaded = True
+
+    def predict(self, text: str) -> Prediction | None:
+        model = self.model
+        return model.predict(text) if model is not None else None
+
+    def confident_label(self, text: str) -> str | None:
+        """The model's label when it clears ``min_confidence`` and is safe to act on; None
+        means ask someone smarter."""
+        prediction = self.predict(text)
+        if prediction is None or not answers_locally(prediction, self.min_confidence):
+            return None
+        return prediction.label
+
+
+reply_classifier = ReplyClassifier(settings.reply_model_path, settings.reply_model_min_confidence)
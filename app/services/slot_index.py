@@ -0,0 +1,118 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+
+Slot = Tuple[datetime, datetime]
+
+
+class SlotIndex:
+    """Time-ordered free windows per (tenant_id, service), with free units per window,
+    kept in process memory.
+
+    Answers preview/next-slot lookups without a query. Every claimed unit is discarded
+    and every released unit added back; a window leaves the index when its last unit
+    goes. A periodic reconcile releases lapsed holds and rebuilds it from the table,
+    which also picks up capacity inserted by other processes.
+    """
+
+    def __init__(self) -> None:
+        self._slots: dict[tuple[str, str], list[Slot]] = {}
+        self._free: dict[tuple[str, str, datetime, datetime], int] = {}
+        # Unit changes made while a reload reads the table: (window, +units or -1 for a claim)
+        self._pending: list[tuple[tuple[str, str, datetime, datetime], int]] | None = None
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def begin_load(self) -> None:
+        """Start recording claims and releases; call before reading the rows for ``load``."""
+        with self._lock:
+            self._pending = []
+
+    def abandon_load(self) -> None:
+        with self._lock:
+            self._pending = None
+
+    def load(self, rows: Iterable) -> None:
+        # ``rows`` carry tenant_id, service, start_dt, end_dt and free units, ordered by start_dt
+        slots: dict[tuple[str, str], list[Slot]] = {}
+        free: dict[tuple[str, str, datetime, datetime], int] = {}
+        for row in rows:
+            _add(slots, free, (row.tenant_id, row.service, row.start_dt, row.end_dt), row.free)
+        with self._lock:
+            # Claims and releases since begin_load() may be missing from ``rows``; replay
+            # them so the swap does not lose them
+            for key, units in self._pending or ():
+                if units > 0:
+                    _add(slots, free, key, units)
+                else:
+                    _discard(slots, free, key)
+            self._pending = None
+            self._slots = slots
+            self._free = free
+            self.ready = True
+
+    def first(self, tenant_id: str, service: str, after: Optional[datetime] = None) -> Optional[Slot]:
+        now = datetime.utcnow()
+        after = max(after, now) if after else now
+        with self._lock:
+            slots = self._slots.get((tenant_id, service))
+            if not slots:
+                return None
+            # Slots that have started are never offered again; drop them as we go
+            stale = bisect_right(slots, (now, datetime.max))
+            if stale:
+                for start, end in slots[:stale]:
+                    self._free.pop((tenant_id, service, start, end), None)
+                del slots[:stale]
+            i = bisect_right(slots, (after, datetime.max))
+            return slots[i] if i < len(slots) else None
+
+    def add(self, tenant_id: str, service: str, start: datetime, end: datetime, units: int = 1) -> None:
+        key = (tenant_id, service, start, end)
+        with self._lock:
+            _add(self._slots, self._free, key, units)
+            if self._pending is not None:
+                self._pending.append((key, units))
+
+    def discard(self, tenant_id: str, service: str, start: datetime, end: datetime) -> None:
+        # One unit of the window was claimed
+        key = (tenant_id, service, start, end)
+        with self._lock:
+            _discard(self._slots, self._free, key)
+            if self._pending is not None:
+                self._pending.append((key, -1))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots = {}
+            self._free = {}
+            self._pending = None
+            self.ready = False
+
+
+def _add(slots: dict, free: dict, key: tuple[str, str, datetime, datetime], units: int) -> None:
+    tenant_id, service, start, end = key
+    if key not in free:
+        insort(slots.setdefault((tenant_id, service), []), (start, end))
+        free[key] = 0
+    free[key] += units
+
+
+def _discard(slots: dict, free: dict, key: tuple[str, str, datetime, datetime]) -> None:
+    left = free.get(key)
+    if left is None:
+        return
+    if left > 1:
+        free[key] = left - 1
+        return
+    del free[key]
+    tenant_id, service, start, end = key
+    window = slots.get((tenant_id, service))
+    i = bisect_left(window, (start, end))
+    if i < len(window) and window[i] == (start, end):
+        del window[i]
+
+
+slot_index = SlotIndex()
@@ -0,0 +1,216 @@
+import json
+import string
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from app.config import settings
+from app.db import SessionLocal
+from app.logging import log
+from app.models import ProposalTemplate
+from app.schemas import LeadIn
+from app.services.llm_client import complete, llm_available, strip_code_fences
+
+
+# Placeholders a proposal template may use; every template must name the slot start
+FIELDS = {"name", "service", "start", "end"}
+REQUIRED_FIELDS = {"start"}
+WILDCARD = "*"
+
+_formatter = string.Formatter()
+
+
+class TemplateError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    body: str
+    # (literal text, field name or None) pairs from string.Formatter.parse
+    parts: tuple[tuple[str, str | None], ...]
+
+    def render(self, values: dict[str, str]) -> str:
+        return "".join(literal + values[field] if field else literal for literal, field in self.parts)
+
+
+def compile_template(body: str) -> CompiledTemplate:
+    try:
+        parsed = list(_formatter.parse(body))
+    except ValueError as e:
+        raise TemplateError(str(e)) from e
+    parts = []
+    seen = set()
+    for literal, field, spec, conversion in parsed:
+        if field is not None:
+            if field not in FIELDS or spec or conversion:
+                raise TemplateError(f"unsupported placeholder {{{field}}}")
+            seen.add(field)
+        parts.append((literal, field))
+    if not REQUIRED_FIELDS <= seen:
+        raise TemplateError("template must include {start}")
+    return CompiledTemplate(body, tuple(parts))
+
+
+def _compile_all(bodies: list[str]) -> list[CompiledTemplate]:
+    compiled = []
+    for body in bodies:
+        try:
+            compiled.append(compile_template(body))
+        except TemplateError as e:
+            log.warning("proposal_template_invalid", extra={"error": str(e)})
+    return compiled
+
+
+def _load_config() -> dict[tuple[str, str], list[str]]:
+    # {"t_acme": {"AC Repair": ["..."], "*": ["..."]}, "*": {"*": ["..."]}}
+    if not settings.proposal_templates_file:
+        return {}
+    with open(settings.proposal_templates_file) as fh:
+        data = json.load(fh)
+    return {(tenant, service): list(bodies) for tenant, services in data.items() for service, bodies in services.items()}
+
+
+def _template_request(tenant_id: str, service: str, variants: int) -> dict:
+    prompt = (
+        f"Write {variants} short, friendly SMS templates offering a {service} appointment. "
+        "Use the placeholders {name}, {service}, {start} and {end} exactly as written, "
+        "and ask the customer to reply YES to confirm or RE-SCHEDULE for other times. "
+        "Respond strictly as a JSON array of strings."
+    )
+    return dict(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+        max_tokens=120 * variants,
+    )
+
+
+class TemplateStore:
+    """Proposal text templates per (tenant, service), rendered locally.
+
+    Config templates (PROPOSAL_TEMPLATES_FILE, ``*`` matches any tenant or service) take
+    precedence over LLM-written ones stored in ``proposal_templates``. A miss queues one
+    background generation for the pair; callers send the fallback meanwhile. Lookups only
+    read memory: the store is warmed at startup and reloaded by the refresh task or the
+    generator thread, never on the request path.
+    """
+
+    def __init__(self) -> None:
+        self._templates: dict[tuple[str, str], list[CompiledTemplate]] = {}
+        self._loaded = False
+        self._pending: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="proposal-templates")
+
+    def refresh(self) -> int:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(ProposalTemplate.tenant_id, ProposalTemplate.service, ProposalTemplate.body)
+                .order_by(ProposalTemplate.id.asc())
+            ).all()
+        finally:
+            db.close()
+        bodies: dict[tuple[str, str], list[str]] = {}
+        for row in rows:
+            bodies.setdefault((row.tenant_id, row.service), []).append(row.body)
+        bodies.update(_load_config())
+        templates = {key: compiled for key, group in bodies.items() if (compiled := _compile_all(group))}
+        with self._lock:
+            self._templates = templates
+            self._loaded = True
+        return sum(len(group) for group in templates.values())
+
+    def lookup(self, tenant_id: str, service: str) -> list[CompiledTemplate]:
+        templates = self._templates
+        for key in ((tenant_id, service), (tenant_id, WILDCARD), (WILDCARD, service), (WILDCARD, WILDCARD)):
+            if key in templates:
+                return templates[key]
+        return []
+
+    def render(self, lead: LeadIn, start: datetime, end: datetime) -> str | None:
+        templates = self.lookup(lead.tenant_id, lead.service)
+        if not templates:
+            return None
+        # Same event, same wording: retries and reschedules of one lead stay consistent
+        template = templates[zlib.crc32(lead.event_id.encode()) % len(templates)]
+        return template.render(
+            {
+                "name": lead.name,
+                "service": lead.service,
+                "start": start.strftime("%a %b %d %-I:%M%p"),
+                "end": end.strftime("%-I:%M%p"),
+            }
+        )
+
+    def request(self, tenant_id: str, service: str):
+        """Queue LLM generation for a pair with no templates; returns the future or None."""
+        key = (tenant_id, service)
+        with self._lock:
+            # A store that was never loaded still needs its reload, LLM or not
+            if key in self._pending or (self._loaded and not llm_available()):
+                return None
+            self._pending.add(key)
+        return self._executor.submit(self._generate, tenant_id, service)
+
+    def _generate(self, tenant_id: str, service: str) -> int:
+        try:
+            if not self._loaded:
+                # Cold store: the pair may already have templates in the table or config
+                self.refresh()
+                if self.lookup(tenant_id, service):
+                    return 0
+            if not llm_available():
+                return 0
+            variants = settings.proposal_template_variants
+            content = complete("proposal", _template_request(tenant_id, service, variants))
+            bodies = json.loads(strip_code_fences(content))
+            compiled = _compile_all([b for b in bodies if isinstance(b, str)][:variants])
+            if not compiled:
+                return 0
+            self.save(tenant_id, service, [t.body for t in compiled])
+            with self._lock:
+                self._templates = {**self._templates, (tenant_id, service): compiled}
+            log.info("proposal_templates_generated", extra={"tenant_id": tenant_id, "service": service})
+            return len(compiled)
+        except Exception as e:
+            log.warning("proposal_templates_failed", extra={"tenant_id": tenant_id, "error": f"{type(e).__name__}: {e}"})
+            return 0
+        finally:
+            with self._lock:
+                self._pending.discard((tenant_id, service))
+
+    def save(self, tenant_id: str, service: str, bodies: list[str], source: str = "llm") -> None:
+        for body in bodies:
+            compile_template(body)
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.execute(
+                delete(ProposalTemplate).where(
+                    ProposalTemplate.tenant_id == tenant_id,
+                    ProposalTemplate.service == service,
+                    ProposalTemplate.source == source,
+                )
+            )
+            db.add_all(
+                ProposalTemplate(tenant_id=tenant_id, service=service, body=body, source=source, created_at=now)
+                for body in bodies
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        """Drop the in-memory templates; the next reload happens off the request path."""
+        with self._lock:
+            self._templates = {}
+            self._loaded = False
+
+
+proposal_templates = TemplateStore()
@@ -0,0 +1,84 @@
+import threading
+
+from sqlalchemy import func, select
+
+from app import metrics
+from app.db import SessionLocal
+from app.models import TenantPhone
+
+
+class TenantDirectory:
+    """In-memory phone -> tenant map of the ``tenant_phone`` table.
+
+    Loaded at startup and polled by ``refresh``, which reloads only when the table's
+    version - row count, highest id and newest ``created_at`` - has moved. A phone missing
+    from the map, or any phone before the first load, is answered as unknown without
+    touching the database, so resolution is a dict lookup either way. In-place edits of
+    existing rows do not move the version; call ``reload`` (or ``POST /admin/tenants/reload``)
+    after those. Both read the primary: a lagging replica would record a stale version.
+    """
+
+    def __init__(self) -> None:
+        self._phones: dict[str, str] = {}
+        self._version: tuple | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @staticmethod
+    def _probe(db) -> tuple:
+        row = db.execute(
+            select(func.count(), func.max(TenantPhone.id), func.max(TenantPhone.created_at))
+        ).one()
+        return tuple(row)
+
+    def reload(self) -> int:
+        db = SessionLocal()
+        try:
+            version = self._probe(db)
+            phones = dict(db.execute(select(TenantPhone.phone, TenantPhone.tenant_id)).tuples().all())
+        finally:
+            db.close()
+        with self._lock:
+            self._phones = phones
+            self._version = version
+            self.reloads += 1
+        return len(phones)
+
+    def refresh(self) -> bool:
+        """Reload if the table changed since the last load; returns whether it did."""
+        db = SessionLocal()
+        try:
+            version = self._probe(db)
+        finally:
+            db.close()
+        if version == self._version:
+            return False
+        self.reload()
+        return True
+
+    def resolve(self, phone: str) -> str | None:
+        tenant_id = self._phones.get(phone)
+        if tenant_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return tenant_id
+
+    def __len__(self) -> int:
+        return len(self._phones)
+
+    def stats(self) -> dict:
+        return {"size": len(self._phones), "hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+
+tenant_directory = TenantDirectory()
+
+metrics.register(metrics.CallbackMetric(
+    "tenant_directory_lookups_total", "Phone -> tenant lookups by result", "counter", ("result",),
+    lambda: {("hit",): tenant_directory.hits, ("miss",): tenant_directory.misses},
+))
+metrics.register(metrics.CallbackMetric(
+    "tenant_directory_entries", "Phones in the tenant directory", "gauge", (), lambda: {(): len(tenant_directory)},
+))
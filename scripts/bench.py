@@ -0,0 +1,286 @@
+"""Load-test the lead, propose and chat flows and report latency percentiles.
+
+    PYTHONPATH=$(pwd) python scripts/bench.py --requests 500 --concurrency 32 --out bench.json
+    PYTHONPATH=$(pwd) python scripts/bench.py --target uvicorn --llm-latency-ms 300 --baseline bench.json
+
+Targets: ``inproc`` drives the ASGI app directly (no sockets); ``uvicorn`` starts a
+server subprocess; any ``http://`` URL is used as-is (it must share --database-url).
+LLM calls go to a local stub (scripts/llm_stub.py) and SMS to the mock provider, each
+with configurable latency. Exits non-zero when --baseline shows a regression.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_stub import make_server  # noqa: E402
+
+
+SCENARIOS = ("lead", "propose", "callback", "inbound", "reply")
+SERVICES = ("AC Repair", "Plumbing", "Electrical", "HVAC", "Installation")
+REPLIES = ("yes", "no", "that works for me", "can we do a different day")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    # Nearest-rank percentile
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against a stored run: slower p95 or lower throughput beyond ``tolerance``."""
+    problems = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{name}: {current['rps']} rps vs baseline {base['rps']} rps")
+        if current["errors"] > base["errors"]:
+            problems.append(f"{name}: {current['errors']} errors vs baseline {base['errors']}")
+    return problems
+
+
+def seed(run_id: str, tenants: int, services: int, slots: int, phones: int) -> dict:
+    """Insert capacity for tenants x services x slots and tenant phone mappings for chat."""
+    from sqlalchemy import insert
+
+    from app.db import SessionLocal, init_db
+    from app.models import Base, Capacity, TenantPhone
+
+    init_db(Base)
+    tenant_ids = [f"t_bench_{run_id}_{i}" for i in range(tenants)]
+    names = list(SERVICES[:services])
+    base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    rows = [
+        dict(tenant_id=t, service=s, start_dt=base + timedelta(minutes=30 * i), end_dt=base + timedelta(minutes=30 * i + 60))
+        for t in tenant_ids
+        for s in names
+        for i in range(slots)
+    ]
+    phone_map = {f"+1999{run_id[:4]}{i:06d}": random.choice(tenant_ids) for i in range(phones)}
+    db = SessionLocal()
+    try:
+        for i in range(0, len(rows), 5000):
+            db.execute(insert(Capacity), rows[i : i + 5000])
+        db.execute(insert(TenantPhone), [dict(phone=p, tenant_id=t, created_at=datetime.utcnow()) for p, t in phone_map.items()])
+        db.commit()
+    finally:
+        db.close()
+    from app.services.catalog import service_catalog
+
+    service_catalog.invalidate()
+    return {"tenants": tenant_ids, "services": names, "phones": phone_map}
+
+
+class Runner:
+    def __init__(self, client, concurrency: int) -> None:
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(self, payloads: list[tuple[str, dict]]) -> tuple[dict, list]:
+        latencies: list[float] = []
+        responses: list = [None] * len(payloads)
+        errors = 0
+
+        async def one(i: int, path: str, body: dict) -> None:
+            nonlocal errors
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    r = await self.client.post(path, json=body)
+                    ok = r.status_code < 400
+                    responses[i] = r.json() if ok else None
+                except Exception:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += 0 if ok else 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i, path, body) for i, (path, body) in enumerate(payloads)))
+        return summarize(latencies, errors, time.perf_counter() - started), responses
+
+
+def _lead(world: dict, notes: str | None = None) -> dict:
+    return {
+        "event_id": f"evt_bench_{uuid.uuid4().hex}",
+        "tenant_id": random.choice(world["tenants"]),
+        "name": "Bench Customer",
+        "phone": f"+1888{random.randrange(10**7):07d}",
+        "service": random.choice(world["services"]),
+        "notes": notes,
+    }
+
+
+async def run_scenarios(client, world: dict, scenarios: list[str], requests: int, concurrency: int) -> dict:
+    runner = Runner(client, concurrency)
+    results: dict[str, dict] = {}
+    proposals: list[dict] = []
+    chat_phones = list(world["phones"])
+
+    for name in scenarios:
+        if name == "lead":
+            payloads = [("/lead", _lead(world)) for _ in range(requests)]
+        elif name == "propose":
+            payloads = [("/lead/propose", _lead(world)) for _ in range(requests)]
+        elif name == "callback":
+            payloads = [
+                ("/sms/callback", {"message_id": p["message_id"], "from_phone": p["phone"], "body": "YES"}) for p in proposals
+            ]
+        elif name == "inbound":
+            texts = [f"need {s.lower()} asap" for s in world["services"]] + ["the unit upstairs is blowing warm"]
+            payloads = [("/chat/inbound", {"from_phone": phone, "text": random.choice(texts)}) for phone in chat_phones[:requests]]
+        else:
+            payloads = [("/chat/reply", {"from_phone": phone, "text": random.choice(REPLIES)}) for phone in chat_phones[:requests]]
+        if not payloads:
+            continue
+        summary, responses = await runner.run(payloads)
+        results[name] = summary
+        if name == "propose":
+            proposals = [
+                {"message_id": r["message_id"], "phone": body["phone"]}
+                for (_, body), r in zip(payloads, responses)
+                if r and r.get("status") == "PROPOSED"
+            ]
+        print(f"{name:9s} {json.dumps(summary)}", file=sys.stderr)
+    return results
+
+
+def _start_uvicorn(port: int, env: dict) -> subprocess.Popen:
+    import httpx
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz").status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("uvicorn did not become healthy")
+
+
+async def _run(args, stub_url: str) -> dict:
+    import httpx
+
+    world = seed(uuid.uuid4().hex[:8], args.tenants, args.services, args.slots, args.requests)
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    if args.target == "inproc":
+        from app.main import app
+        from app.services import llm_client, notify
+        from app.services.llm_client import OpenAIBackend
+
+        llm_client.set_backend(OpenAIBackend("stub", base_url=stub_url))
+        notify.set_provider(notify.MockProvider(delay=args.sms_latency_ms / 1000))
+        try:
+            # Run the lifespan too, so background workers (outbox, refreshers) load the app as in production
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    return await run_scenarios(client, world, scenarios, args.requests, args.concurrency)
+        finally:
+            llm_client.set_backend(None)
+            notify.set_provider(None)
+
+    proc = None
+    base_url = args.target
+    if args.target == "uvicorn":
+        port = args.port
+        proc = _start_uvicorn(port, {
+            "DATABASE_URL": os.environ["DATABASE_URL"],
+            "LLM_BASE_URL": stub_url,
+            "SMS_PROVIDER": "mock",
+            "SMS_MOCK_DELAY_MS": str(args.sms_latency_ms),
+        })
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            return await run_scenarios(client, world, scenarios, args.requests, args.concurrency)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(10)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="inproc", help="inproc, uvicorn, or a base URL")
+    parser.add_argument("--port", type=int, default=8765, help="port for --target uvicorn")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--tenants", type=int, default=5)
+    parser.add_argument("--services", type=int, default=3, choices=range(1, len(SERVICES) + 1))
+    parser.add_argument("--slots", type=int, default=200, help="slots per tenant and service")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--sms-latency-ms", type=float, default=0.0)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    # Must be set before app modules are imported (settings are read at import time)
+    os.environ["DATABASE_URL"] = args.database_url
+    stub = make_server(0, args.llm_latency_ms)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{stub.server_port}/v1"
+    try:
+        scenarios = asyncio.run(_run(args, stub_url))
+    finally:
+        stub.shutdown()
+
+    results = {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "scenarios": scenarios,
+    }
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            problems = compare(results, json.load(fh), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Evaluate the local reply classifier: accuracy, LLM-escalation rate and scoring speed.
+
+    PYTHONPATH=$(pwd) python scripts/eval_reply_model.py              # k-fold cross-validation
+    PYTHONPATH=$(pwd) python scripts/eval_reply_model.py --model data/reply_model.json --data held_out.csv
+
+Replies scoring below ``--min-confidence``, and every ``cancel``, count as escalated to the
+LLM; accuracy is reported both over all replies and over the ones answered locally.
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from app.config import settings
+from app.services.reply_model import DEFAULT_BUCKETS, LABELS, ReplyModel, answers_locally, read_examples, train
+
+
+def score(model: ReplyModel, examples: list[tuple[str, str]]) -> tuple[list, float]:
+    start = time.perf_counter()
+    predictions = [model.predict(text) for text, _ in examples]
+    return predictions, time.perf_counter() - start
+
+
+def report(examples: list[tuple[str, str]], predictions: list, elapsed: float, min_confidence: float) -> dict:
+    correct = local = local_correct = 0
+    hits, predicted, actual = Counter(), Counter(), Counter()
+    for (_, label), prediction in zip(examples, predictions):
+        actual[label] += 1
+        predicted[prediction.label] += 1
+        if prediction.label == label:
+            correct += 1
+            hits[label] += 1
+        if answers_locally(prediction, min_confidence):
+            local += 1
+            local_correct += prediction.label == label
+    n = len(examples)
+    return {
+        "replies": n,
+        "accuracy": correct / n,
+        "escalation_rate": 1 - local / n,
+        "local_accuracy": local_correct / local if local else 0.0,
+        "us_per_reply": elapsed / n * 1e6,
+        "per_label": {
+            label: {
+                "precision": hits[label] / predicted[label] if predicted[label] else 0.0,
+                "recall": hits[label] / actual[label] if actual[label] else 0.0,
+            }
+            for label in LABELS
+            if actual[label]
+        },
+    }
+
+
+def cross_validate(examples, folds: int, seed: int, min_confidence: float, buckets: int, alpha: float) -> dict:
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    # Score every reply with a model that never saw it, then report once over all of them
+    scored: list[tuple[str, str]] = []
+    predictions: list = []
+    elapsed = 0.0
+    for k in range(folds):
+        held_out = shuffled[k::folds]
+        training = [ex for i, ex in enumerate(shuffled) if i % folds != k]
+        fold_predictions, fold_elapsed = score(train(training, buckets=buckets, alpha=alpha), held_out)
+        scored += held_out
+        predictions += fold_predictions
+        elapsed += fold_elapsed
+    return report(scored, predictions, elapsed, min_confidence)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", action="append", help="labelled CSV (repeatable; default data/reply_labels.csv)")
+    parser.add_argument("--model", help="evaluate this saved model instead of cross-validating")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS)
+    parser.add_argument("--alpha", type=float, default=0.5)
+    parser.add_argument("--min-confidence", type=float, default=settings.reply_model_min_confidence)
+    args = parser.parse_args()
+
+    examples = []
+    for path in args.data or ["data/reply_labels.csv"]:
+        examples += read_examples(path)
+    if args.model:
+        predictions, elapsed = score(ReplyModel.load(args.model), examples)
+        result = report(examples, predictions, elapsed, args.min_confidence)
+    else:
+        result = cross_validate(examples, args.folds, args.seed, args.min_confidence, args.buckets, args.alpha)
+
+    print(
+        f"replies={result['replies']} accuracy={result['accuracy']:.3f} "
+        f"escalation_rate={result['escalation_rate']:.3f} local_accuracy={result['local_accuracy']:.3f} "
+        f"us_per_reply={result['us_per_reply']:.1f}"
+    )
+    for label, scores in result["per_label"].items():
+        print(f"  {label:<11} precision={scores['precision']:.3f} recall={scores['recall']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
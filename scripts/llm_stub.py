@@ -0,0 +1,77 @@
+"""OpenAI-compatible chat completions stub with configurable latency.
+
+    python scripts/llm_stub.py --port 8099 --latency-ms 300
+    LLM_BASE_URL=http://127.0.0.1:8099/v1 uvicorn app.main:app
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+TEMPLATES = [
+    "Hi {name}, {service} is open {start}-{end}. Reply YES to confirm or RE-SCHEDULE for other times.",
+    "{name}, we can fit your {service} in on {start}. Reply YES to book or RE-SCHEDULE.",
+]
+
+
+def _answer(request: dict) -> str:
+    prompt = request["messages"][-1]["content"]
+    if prompt.startswith("Classify"):
+        return random.choice(["yes", "no", "unknown"])
+    if prompt.startswith("Extract"):
+        return json.dumps({"tenant_id": None, "service": "AC Repair"})
+    if "JSON array" in prompt:
+        return json.dumps(TEMPLATES)
+    return "Stub proposal, reply YES"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency: float = 0.0
+    jitter: float = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        body = json.dumps({
+            "id": "cmpl_stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": _answer(request)}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0) -> ThreadingHTTPServer:
+    handler = type("Handler", (StubHandler,), {"latency": latency_ms / 1000, "jitter": jitter_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    server = make_server(args.port, args.latency_ms, args.jitter_ms)
+    print(f"LLM stub on http://127.0.0.1:{server.server_port}/v1 (latency {args.latency_ms}ms)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
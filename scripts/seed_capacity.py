@@ -1,5 +1,14 @@
+"""Seed demo capacity, optionally plus a production-sized generated calendar.
+
+    PYTHONPATH=$(pwd) python scripts/seed_capacity.py
+    PYTHONPATH=$(pwd) python scripts/seed_capacity.py --tenants 300 --services 4 --days 90
+"""
+import argparse
+import random
+import time
 from datetime import datetime, timedelta
 
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
 from app.db import SessionLocal
@@ -7,6 +16,9 @@ from app.models import Base, Capacity, TenantPhone
 from app.db import init_db
 
 
+SERVICES = ["AC Repair", "Plumbing", "Electrical", "HVAC", "Installation", "Gutter Cleaning", "Roofing", "Pest Control"]
+
+
 def seed():
     init_db(Base)
     db: Session = SessionLocal()
@@ -18,7 +30,7 @@ def seed():
         for i in range(1, 6):
             start = now + timedelta(hours=i)
             end = start + timedelta(hours=1)
-            slots.append(Capacity(tenant_id=tenant, service=service, start_dt=start, end_dt=end, booked_bool=False))
+            slots.append(Capacity(tenant_id=tenant, service=service, start_dt=start, end_dt=end, total=1))
         db.add_all(slots)
         # Seed tenant phone mapping
         if not db.query(TenantPhone).filter(TenantPhone.phone == "+15551234567").first():
@@ -30,7 +42,95 @@ def seed():
         db.close()
 
 
-if __name__ == "__main__":
+def generate_rows(
+    rng: random.Random,
+    tenants: list[str],
+    services: int,
+    days: int,
+    day_start: int,
+    slots_per_day: int,
+    slot_minutes: int,
+    technicians: int,
+    availability: float,
+    booked_ratio: float,
+    start_date: datetime,
+):
+    """Yield capacity rows tenant by tenant; the same seed always yields the same calendar."""
+    for tenant in tenants:
+        offered = rng.sample(SERVICES, min(services, len(SERVICES)))
+        for service in offered:
+            for day in range(days):
+                base = start_date + timedelta(days=day, hours=day_start)
+                for i in range(slots_per_day):
+                    if rng.random() >= availability:
+                        continue
+                    start = base + timedelta(minutes=slot_minutes * i)
+                    total = rng.randint(1, technicians)
+                    yield dict(
+                        tenant_id=tenant,
+                        service=service,
+                        start_dt=start,
+                        end_dt=start + timedelta(minutes=slot_minutes),
+                        total=total,
+                        booked=sum(rng.random() < booked_ratio for _ in range(total)),
+                    )
+
+
+def seed_generated(args) -> int:
+    init_db(Base)
+    tenants = [f"{args.prefix}{i:05d}" for i in range(args.tenants)]
+    db: Session = SessionLocal()
+    try:
+        # Re-running with the same arguments must not duplicate calendars
+        existing = set(db.execute(select(Capacity.tenant_id).where(Capacity.tenant_id.like(f"{args.prefix}%")).distinct()).scalars())
+        rng = random.Random(args.seed)
+        start_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        rows = generate_rows(
+            rng, tenants, args.services, args.days, args.day_start, args.slots_per_day,
+            args.slot_minutes, args.technicians, args.availability, args.booked_ratio, start_date,
+        )
+        total, chunk = 0, []
+        started = time.perf_counter()
+        for row in rows:
+            if row["tenant_id"] in existing:
+                continue
+            chunk.append(row)
+            if len(chunk) >= args.chunk_size:
+                db.execute(insert(Capacity.__table__), chunk)
+                db.commit()
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            db.execute(insert(Capacity.__table__), chunk)
+            db.commit()
+            total += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {total} slots for {len(tenants) - len(existing)} generated tenants in {elapsed:.1f}s ({len(existing)} already present)")
+        return total
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=0, help="generated tenants (0: demo data only)")
+    parser.add_argument("--services", type=int, default=3, help="services per generated tenant")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--slots-per-day", type=int, default=8)
+    parser.add_argument("--slot-minutes", type=int, default=60)
+    parser.add_argument("--day-start", type=int, default=8, help="UTC hour of the first slot")
+    parser.add_argument("--technicians", type=int, default=4, help="max technicians per window (total is 1..N)")
+    parser.add_argument("--availability", type=float, default=0.9, help="fraction of slots offered")
+    parser.add_argument("--booked-ratio", type=float, default=0.2, help="fraction of technicians already booked")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="t_gen_")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
     seed()
+    if args.tenants:
+        seed_generated(args)
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Train the local reply classifier from labelled replies.
+
+    PYTHONPATH=$(pwd) python scripts/train_reply_model.py
+    PYTHONPATH=$(pwd) python scripts/train_reply_model.py --data data/reply_labels.csv --nlu-cache nlu_cache.db
+
+Labelled data is CSV (``text,label``, labels yes/no/reschedule/cancel/unknown). With
+``--nlu-cache`` the replies the LLM has already classified (NLU_CACHE_DB) are added,
+so the model learns from production traffic.
+"""
+import argparse
+import json
+import sqlite3
+from collections import Counter
+
+from app.config import settings
+from app.services.reply_model import DEFAULT_BUCKETS, read_examples, train
+
+
+def cached_llm_labels(path: str) -> list[tuple[str, str]]:
+    # Keys are "classify|<tenant>|<normalized text>", values the JSON-encoded label
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT key, value FROM nlu_cache WHERE key LIKE 'classify|%'").fetchall()
+    finally:
+        conn.close()
+    return [(key.split("|", 2)[2], json.loads(value)) for key, value in rows]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", action="append", help="labelled CSV (repeatable; default data/reply_labels.csv)")
+    parser.add_argument("--nlu-cache", help="NLU cache DB whose LLM reply labels are added to the training set")
+    parser.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS, help="hashed feature space size")
+    parser.add_argument("--alpha", type=float, default=0.5, help="additive smoothing")
+    parser.add_argument("--out", default=settings.reply_model_path)
+    args = parser.parse_args()
+
+    examples = []
+    for path in args.data or ["data/reply_labels.csv"]:
+        examples += read_examples(path)
+    if args.nlu_cache:
+        examples += cached_llm_labels(args.nlu_cache)
+    model = train(examples, buckets=args.buckets, alpha=args.alpha)
+    model.save(args.out)
+    counts = Counter(label for _, label in examples)
+    print(f"Trained on {len(examples)} replies {dict(counts)}: {len(model.weights)} features -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
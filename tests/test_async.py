@@ -0,0 +1,50 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+import app.main as main
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity
+
+
+def test_slow_llm_call_does_not_block_other_routes(monkeypatch):
+    init_db(Base)
+    tenant_id = f"t_async_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=3)
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    async def slow_proposal(lead, start, end):
+        await asyncio.sleep(0.5)
+        return "slow proposal"
+
+    monkeypatch.setattr(main, "generate_booking_proposal_async", slow_proposal)
+    lead = {
+        "event_id": f"evt_{uuid.uuid4().hex}",
+        "tenant_id": tenant_id,
+        "name": "Jane Doe",
+        "phone": "+15550001111",
+        "service": "AC Repair",
+    }
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            propose = asyncio.create_task(client.post("/lead/propose", json=lead))
+            await asyncio.sleep(0.05)
+            started = time.perf_counter()
+            health = await client.get("/healthz")
+            health_elapsed = time.perf_counter() - started
+            return await propose, health, health_elapsed
+
+    propose, health, health_elapsed = asyncio.run(run())
+    assert health.json()["ok"] is True
+    assert health_elapsed < 0.25
+    assert propose.json()["status"] == "PROPOSED"
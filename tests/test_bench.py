@@ -0,0 +1,39 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench", os.path.join(SCRIPTS, "bench.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_percentiles_and_baseline_comparison(bench):
+    values = list(range(1, 101))
+    assert (bench.percentile(values, 50), bench.percentile(values, 95), bench.percentile(values, 99)) == (50, 95, 99)
+    assert bench.percentile([7.0], 99) == 7.0
+
+    baseline = {"scenarios": {"lead": {"p95_ms": 100.0, "rps": 200.0, "errors": 0}}}
+    ok = {"scenarios": {"lead": {"p95_ms": 110.0, "rps": 190.0, "errors": 0}}}
+    slow = {"scenarios": {"lead": {"p95_ms": 150.0, "rps": 120.0, "errors": 2}}}
+    assert bench.compare(ok, baseline, 0.2) == []
+    assert len(bench.compare(slow, baseline, 0.2)) == 3
+
+
+def test_in_process_smoke_run(bench, tmp_path, capsys, monkeypatch):
+    # main() exports DATABASE_URL for subprocess targets; keep the test process env unchanged
+    monkeypatch.setenv("DATABASE_URL", os.getenv("DATABASE_URL", "sqlite:///./revin.db"))
+    out = tmp_path / "bench.json"
+    code = bench.main(["--requests", "4", "--concurrency", "2", "--tenants", "1", "--slots", "20", "--out", str(out)])
+    assert code == 0
+    results = json.loads(out.read_text())
+    assert set(results["scenarios"]) == {"lead", "propose", "callback", "inbound", "reply"}
+    assert all(s["errors"] == 0 and s["requests"] > 0 for s in results["scenarios"].values())
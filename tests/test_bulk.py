@@ -0,0 +1,83 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.main import app
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity, Job, Outbox
+
+
+client = TestClient(app)
+
+
+def _seed(tenant_id: str, service: str, count: int) -> None:
+    init_db(Base)
+    db = SessionLocal()
+    try:
+        base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for i in range(count):
+            start = base + timedelta(hours=i)
+            db.add(Capacity(tenant_id=tenant_id, service=service, start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _lead(tenant_id: str, service: str, **extra) -> dict:
+    return {
+        "event_id": f"evt_{uuid.uuid4().hex}",
+        "tenant_id": tenant_id,
+        "name": "Bulk Customer",
+        "phone": f"+1555{uuid.uuid4().int % 10**7:07d}",
+        "service": service,
+        **extra,
+    }
+
+
+def test_batch_books_per_group_and_replays_idempotently():
+    tenant_id = f"t_bulk_{uuid.uuid4().hex[:8]}"
+    _seed(tenant_id, "AC Repair", 30)
+    _seed(tenant_id, "Plumbing", 2)
+
+    leads = [_lead(tenant_id, "AC Repair") for _ in range(25)] + [_lead(tenant_id, "Plumbing") for _ in range(3)]
+    leads.append(_lead(tenant_id, "AC Repair", notes="please cancel"))
+    r = client.post("/leads/batch", json=leads)
+    body = r.json()
+    assert body["counts"] == {"BOOKED": 27, "NEEDS_DISPATCH": 1, "HANDOFF": 1}
+    assert [res["event_id"] for res in body["results"]] == [lead["event_id"] for lead in leads]
+
+    booked = [(lead["service"], res["slot"]["start"]) for lead, res in zip(leads, body["results"]) if res["status"] == "BOOKED"]
+    assert len(set(booked)) == 27
+    # Earliest slots go to the earliest leads in each group
+    ac = [res["slot"]["start"] for res in body["results"][:25]]
+    assert ac == sorted(ac)
+
+    db = SessionLocal()
+    try:
+        assert db.execute(select(func.count()).select_from(Job).where(Job.tenant_id == tenant_id)).scalar_one() == 27
+        phones = [lead["phone"] for lead in leads]
+        assert db.execute(select(func.count()).select_from(Outbox).where(Outbox.phone.in_(phones))).scalar_one() == 27
+    finally:
+        db.close()
+
+    # Replaying the same leads as NDJSON returns the stored jobs without claiming more slots
+    ndjson = "\n".join(json.dumps(lead) for lead in leads[:25]) + "\n"
+    r = client.post("/leads/batch", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    replay = r.json()["results"]
+    assert [res["job_id"] for res in replay] == [res["job_id"] for res in body["results"][:25]]
+
+
+def test_batch_reports_invalid_items_and_matches_single_lead_idempotency():
+    tenant_id = f"t_bulk_{uuid.uuid4().hex[:8]}"
+    _seed(tenant_id, "AC Repair", 3)
+    single = _lead(tenant_id, "AC Repair")
+    job_id = client.post("/lead", json=single).json()["job_id"]
+
+    ndjson = "\n".join([json.dumps(single), "{not json", json.dumps({"event_id": "evt_missing_fields"}), json.dumps(single)])
+    results = client.post("/leads/batch", content=ndjson).json()["results"]
+    assert results[0]["job_id"] == job_id and results[3]["job_id"] == job_id
+    assert results[1]["status"] == "INVALID" and results[1]["index"] == 1
+    assert results[2]["status"] == "INVALID"
@@ -0,0 +1,63 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity
+from app.services.capacity import pick_slot
+
+
+SLOTS = 40
+WORKERS = 16
+CLAIMS = 60
+
+
+def _seed_slots(tenant_id: str, service: str, count: int) -> None:
+    init_db(Base)
+    db = SessionLocal()
+    try:
+        base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        for i in range(count):
+            start = base + timedelta(hours=i)
+            db.add(Capacity(tenant_id=tenant_id, service=service, start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim(tenant_id: str, service: str):
+    db = SessionLocal()
+    try:
+        return pick_slot(db, tenant_id, service)
+    finally:
+        db.close()
+
+
+def test_pick_slot_concurrent_claims_never_double_book():
+    tenant_id = f"t_burst_{uuid.uuid4().hex[:8]}"
+    service = "AC Repair"
+    _seed_slots(tenant_id, service, SLOTS)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        results = list(pool.map(lambda _: _claim(tenant_id, service), range(CLAIMS)))
+    elapsed = time.perf_counter() - started
+
+    won = [r for r in results if r]
+    assert len(won) == SLOTS
+    assert len(set(won)) == SLOTS
+    assert results.count(None) == CLAIMS - SLOTS
+    # Loose floor so the test flags pathological contention, not slow CI boxes
+    assert CLAIMS / elapsed > 20
+
+    db = SessionLocal()
+    try:
+        booked = db.execute(
+            select(Capacity).where(Capacity.tenant_id == tenant_id, Capacity.booked == 1)
+        ).scalars().all()
+    finally:
+        db.close()
+    assert len(booked) == SLOTS
@@ -0,0 +1,60 @@
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.main import app
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity
+from app.services.catalog import service_catalog
+
+
+client = TestClient(app)
+
+
+def _count(tenant_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.execute(select(func.count()).select_from(Capacity).where(Capacity.tenant_id == tenant_id)).scalar_one()
+    finally:
+        db.close()
+
+
+def test_bulk_import_dedups_on_tenant_service_start():
+    init_db(Base)
+    tenant_id = f"t_imp_{uuid.uuid4().hex[:8]}"
+    rows = [
+        {"tenant_id": tenant_id, "service": "Window Tinting", "start": f"2030-03-0{d}T{h:02d}:00:00"}
+        for d in (1, 2)
+        for h in (9, 10, 11)
+    ]
+    ndjson = "\n".join(json.dumps(r) for r in rows + rows[:2]) + "\n"
+    r = client.post("/capacity/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert r.json() == {"inserted": 6, "duplicates": 2, "invalid": 0}
+
+    csv_body = "\n".join([
+        "tenant_id,service,start,end,total,booked",
+        f"{tenant_id},Window Tinting,2030-03-01T09:00:00,,,",
+        f"{tenant_id},Window Tinting,2030-03-03T09:00:00,2030-03-03T09:30:00,3,1",
+        f"{tenant_id},Window Tinting,not-a-date,,,",
+        f"{tenant_id},Window Tinting,2030-03-05T09:00:00,,2,3",
+    ])
+    r = client.post("/capacity/bulk", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert r.json() == {"inserted": 1, "duplicates": 1, "invalid": 2}
+    assert _count(tenant_id) == 7
+
+    # The import schedules a catalog rebuild; once it lands the new service matches
+    service_catalog.invalidate().result(timeout=5)
+    match = service_catalog.match("need window tinting", tenant_id)
+    assert match and match.service == "Window Tinting"
+
+    # JSON arrays work too, with explicit durations
+    r = client.post("/capacity/bulk", json=[{"tenant_id": tenant_id, "service": "Window Tinting", "start": "2030-03-04T09:00:00Z", "duration_minutes": 90}])
+    assert r.json()["inserted"] == 1
+    db = SessionLocal()
+    try:
+        row = db.execute(select(Capacity).where(Capacity.tenant_id == tenant_id).order_by(Capacity.start_dt.desc()).limit(1)).scalar_one()
+        assert (row.end_dt - row.start_dt).total_seconds() == 5400
+    finally:
+        db.close()
@@ -0,0 +1,48 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity
+from app.services import llm_client
+from app.services.catalog import ServiceMatcher, service_catalog
+from app.services.llm import extract_entities_from_text
+
+
+class FailingBackend:
+    def complete(self, operation, request):
+        raise AssertionError("catalog match should not reach the LLM")
+
+    async def complete_async(self, operation, request):
+        raise AssertionError("catalog match should not reach the LLM")
+
+
+def test_matcher_prefers_longest_phrase_and_flags_ambiguity():
+    matcher = ServiceMatcher({
+        "ac": ("AC Repair", 0.8),
+        "ac repair": ("AC Repair", 1.0),
+        "leak": ("Plumbing", 0.8),
+    })
+    match = matcher.match("Need AC repair today!")
+    assert (match.service, match.confidence, match.phrase) == ("AC Repair", 1.0, "ac repair")
+    assert matcher.match("ac is fine but there's a leak").confidence < 0.7
+    assert matcher.match("nothing relevant") is None
+
+
+def test_catalog_resolves_tenant_services_without_the_llm():
+    init_db(Base)
+    tenant_id = f"t_cat_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        db.add(Capacity(tenant_id=tenant_id, service="Gutter Cleaning", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    service_catalog.invalidate().result(timeout=5)
+    llm_client.set_backend(FailingBackend())
+    try:
+        assert extract_entities_from_text("can someone do gutter cleaning friday", tenant_id=tenant_id)["service"] == "Gutter Cleaning"
+        assert extract_entities_from_text("my a/c is not cooling")["service"] == "AC Repair"
+    finally:
+        llm_client.set_backend(None)
@@ -0,0 +1,82 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity
+from app.services import llm_client
+from app.services.llm_client import llm_call_scope
+from app.services.llm import extract_entities_from_text
+from app.services.nlu_cache import nlu_cache
+
+
+client = TestClient(app)
+
+
+class CountingBackend:
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.calls = []
+
+    def complete(self, operation, request):
+        self.calls.append(operation)
+        if operation == "extract":
+            return '{"tenant_id": "%s", "service": "ac repair"}' % self.tenant_id
+        return "Proposal text"
+
+    async def complete_async(self, operation, request):
+        return self.complete(operation, request)
+
+
+def test_chat_inbound_makes_one_nlu_call():
+    init_db(Base)
+    tenant_id = f"t_nlu_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    backend = CountingBackend(tenant_id)
+    llm_client.set_backend(backend)
+    nlu_cache.clear()
+    try:
+        before = llm_client.llm_call_stats().get("/chat/inbound", {})
+        # Unmapped phone: tenant comes from the same NLU pass as the service
+        r = client.post("/chat/inbound", json={"from_phone": "+15550009999", "text": f"{tenant_id} the unit upstairs is blowing warm {uuid.uuid4().hex}"})
+        after = llm_client.llm_call_stats()["/chat/inbound"]
+    finally:
+        llm_client.set_backend(None)
+
+    body = r.json()
+    assert body["status"] == "PROPOSED"
+    assert body["tenant_id"] == tenant_id
+    assert body["service"] == "AC Repair"
+    assert backend.calls.count("extract") == 1
+    assert after.get("extract", 0) - before.get("extract", 0) == 1
+
+
+def test_nlu_calls_over_the_limit_fall_back():
+    backend = CountingBackend("t_acme")
+    llm_client.set_backend(backend)
+    nlu_cache.clear()
+    try:
+        with llm_call_scope("/test", nlu_limit=1):
+            assert extract_entities_from_text("first message")["tenant_id"] == "t_acme"
+            assert extract_entities_from_text("second message")["tenant_id"] is None
+    finally:
+        llm_client.set_backend(None)
+    assert backend.calls == ["extract"]
+
+
+def test_llm_call_stats_key_unknown_paths_as_unmatched():
+    before = set(llm_client.llm_call_stats())
+    for _ in range(3):
+        assert client.get(f"/no/such/{uuid.uuid4().hex}").status_code == 404
+    after = llm_client.llm_call_stats()
+    assert set(after) - before <= {"unmatched"}
+    assert not any(route.startswith("/no/such/") for route in after)
@@ -0,0 +1,79 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import select, text
+
+from app.db import SessionLocal, engine, init_db
+from app.models import Base, Capacity, Proposal
+from app.services.capacity import hold_slot
+from app.services.conversation import ActiveProposal, conversations
+from app.services.proposal import (
+    confirm_proposal,
+    create_proposal,
+    get_latest_proposal_by_phone,
+    get_proposal_by_message_id,
+    new_proposal_id,
+)
+
+
+def _lead(tenant_id: str, phone: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        event_id=f"evt_{uuid.uuid4().hex}", tenant_id=tenant_id, name="C", phone=phone, address=None, service="AC Repair"
+    )
+
+
+def _propose(db, lead) -> Proposal:
+    proposal_id = new_proposal_id()
+    start, end = hold_slot(db, lead.tenant_id, lead.service, holder=proposal_id)
+    return create_proposal(db, lead, start, end, "Proposal text", proposal_id=proposal_id)
+
+
+def test_latest_open_proposal_is_written_through_and_dropped_on_confirm():
+    init_db(Base)
+    tenant_id = f"t_conv_{uuid.uuid4().hex[:8]}"
+    phone = f"+1555{uuid.uuid4().int % 10**7:07d}"
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+    db = SessionLocal()
+    try:
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1), total=2))
+        db.commit()
+        first = _propose(db, _lead(tenant_id, phone))
+        second = _propose(db, _lead(tenant_id, phone))
+        second_id, second_message = second.proposal_id, second.message_id
+
+        hits = conversations.stats()["hits"]
+        active = get_latest_proposal_by_phone(db, phone)
+        assert isinstance(active, ActiveProposal) and active.proposal_id == second_id
+        assert get_proposal_by_message_id(db, second_message, phone) is active
+        assert conversations.stats()["hits"] == hits + 2
+
+        assert confirm_proposal(db, active) is not None
+        # The confirmed proposal is no longer active; the older open one is found by query
+        assert conversations.get(phone) is None
+        assert get_latest_proposal_by_phone(db, phone).proposal_id == first.proposal_id
+        assert conversations.get(phone).proposal_id == first.proposal_id
+
+        # Without the cache only PROPOSED rows qualify
+        conversations.clear()
+        db.execute(Proposal.__table__.update().where(Proposal.phone == phone).values(status="CONFIRMED"))
+        db.commit()
+        assert get_latest_proposal_by_phone(db, phone) is None
+        assert get_proposal_by_message_id(db, second_message, phone).status == "CONFIRMED"
+    finally:
+        db.close()
+
+
+def test_phone_lookup_uses_the_composite_index():
+    init_db(Base)
+    stmt = (
+        select(Proposal)
+        .where(Proposal.phone == "+15550000000", Proposal.status == "PROPOSED")
+        .order_by(Proposal.created_at.desc())
+        .limit(1)
+    )
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = " ".join(str(row[-1]) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "idx_proposals_phone_status_created" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,165 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, inspect, select, text
+
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity, CapacityHold
+from app.services.capacity import claim_slots, hold_slot, pick_slot, release_hold, try_mark_slot_booked
+from app.services.slot_index import SlotIndex
+
+
+def _seed(tenant_id: str, totals: list[int]) -> list[datetime]:
+    init_db(Base)
+    base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+    starts = [base + timedelta(hours=i) for i in range(len(totals))]
+    db = SessionLocal()
+    try:
+        for start, total in zip(starts, totals):
+            db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1), total=total))
+        db.commit()
+    finally:
+        db.close()
+    return starts
+
+
+def _window(tenant_id: str, start: datetime) -> Capacity:
+    db = SessionLocal()
+    try:
+        return db.execute(select(Capacity).where(Capacity.tenant_id == tenant_id, Capacity.start_dt == start)).scalar_one()
+    finally:
+        db.close()
+
+
+def _pick(tenant_id: str):
+    db = SessionLocal()
+    try:
+        return pick_slot(db, tenant_id, "AC Repair")
+    finally:
+        db.close()
+
+
+def test_one_row_serves_every_technician_concurrently():
+    tenant_id = f"t_count_{uuid.uuid4().hex[:8]}"
+    (start,) = _seed(tenant_id, [8])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: _pick(tenant_id), range(12)))
+    assert [r[0] for r in results if r] == [start] * 8
+    assert results.count(None) == 4
+    assert _window(tenant_id, start).booked == 8
+
+
+def test_holds_reserve_units_of_a_window():
+    tenant_id = f"t_count_{uuid.uuid4().hex[:8]}"
+    (start,) = _seed(tenant_id, [2])
+    end = start + timedelta(hours=1)
+    db = SessionLocal()
+    try:
+        assert hold_slot(db, tenant_id, "AC Repair", holder="p_a")[0] == start
+        assert hold_slot(db, tenant_id, "AC Repair", holder="p_b")[0] == start
+        assert hold_slot(db, tenant_id, "AC Repair", holder="p_c") is None
+        assert pick_slot(db, tenant_id, "AC Repair") is None
+
+        assert try_mark_slot_booked(db, tenant_id, "AC Repair", start, end, holder="p_a")
+        row = _window(tenant_id, start)
+        assert (row.booked, row.held) == (1, 1)
+
+        # A claim that finds nothing free releases lapsed holds and takes their units
+        db.query(CapacityHold).filter(CapacityHold.holder == "p_b").update({"held_until": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        assert pick_slot(db, tenant_id, "AC Repair")[0] == start
+        # ...so the lapsed hold can no longer be converted or released
+        assert not try_mark_slot_booked(db, tenant_id, "AC Repair", start, end, holder="p_b")
+        assert not release_hold(db, tenant_id, "AC Repair", start, end, "p_b")
+        row = _window(tenant_id, start)
+        assert (row.booked, row.held) == (2, 0)
+    finally:
+        db.close()
+
+
+def test_bulk_claims_take_several_units_per_window():
+    tenant_id = f"t_count_{uuid.uuid4().hex[:8]}"
+    first, second = _seed(tenant_id, [3, 4])
+    db = SessionLocal()
+    try:
+        slots = claim_slots(db, tenant_id, "AC Repair", 5)
+        db.commit()
+    finally:
+        db.close()
+    assert [s[0] for s in slots] == [first] * 3 + [second] * 2
+    assert (_window(tenant_id, first).booked, _window(tenant_id, second).booked) == (3, 2)
+
+
+def test_legacy_boolean_rows_are_merged_into_counted_windows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    start = datetime(2030, 1, 1, 9)
+    end = start + timedelta(hours=1)
+    later = datetime.utcnow() + timedelta(hours=1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE capacity (id INTEGER PRIMARY KEY, tenant_id VARCHAR, service VARCHAR, start_dt DATETIME, "
+            "end_dt DATETIME, booked_bool BOOLEAN NOT NULL, held_by VARCHAR, held_until DATETIME)"
+        ))
+        conn.execute(text("CREATE INDEX ix_capacity_held_by ON capacity (held_by)"))
+        rows = [(1, True, None, None), (2, False, "p_live", later), (3, False, None, None), (4, False, "p_old", datetime(2020, 1, 1))]
+        for id_, booked, held_by, held_until in rows:
+            conn.execute(
+                text("INSERT INTO capacity VALUES (:id, 't_legacy', 'AC Repair', :start, :end, :booked, :held_by, :held_until)"),
+                dict(id=id_, start=start, end=end, booked=booked, held_by=held_by, held_until=held_until),
+            )
+        conn.execute(text("INSERT INTO capacity VALUES (5, 't_legacy', 'AC Repair', :start, :end, 0, NULL, NULL)"), dict(start=end, end=end + timedelta(hours=1)))
+
+    init_db(Base, bind=engine)
+    init_db(Base, bind=engine)  # idempotent
+
+    assert "booked_bool" not in {c["name"] for c in inspect(engine).get_columns("capacity")}
+    with engine.connect() as conn:
+        windows = conn.execute(text("SELECT id, total, booked, held, available FROM capacity ORDER BY id")).all()
+        holds = conn.execute(text("SELECT holder, capacity_id FROM capacity_holds")).all()
+    assert [tuple(w) for w in windows] == [(1, 4, 1, 1, 2), (5, 1, 0, 0, 1)]
+    assert [tuple(h) for h in holds] == [("p_live", 1)]
+    assert _window_index(engine)["unique"]
+    engine.dispose()
+
+
+def _window_index(engine) -> dict:
+    return {ix["name"]: ix for ix in inspect(engine).get_indexes("capacity")}["idx_capacity_tenant_service_start"]
+
+
+def test_window_index_becomes_unique_on_upgrade(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'windows.db'}")
+    init_db(Base, bind=engine)
+    start = datetime(2030, 1, 1, 9)
+    with engine.begin() as conn:
+        # A database from before the index was unique, with a window imported twice
+        conn.execute(text("DROP INDEX idx_capacity_tenant_service_start"))
+        conn.execute(text("CREATE INDEX idx_capacity_tenant_service_start ON capacity (tenant_id, service, start_dt)"))
+        for id_, booked in ((1, 1), (2, 0)):
+            conn.execute(
+                text("INSERT INTO capacity (id, tenant_id, service, start_dt, end_dt, total, booked, held, available) "
+                     "VALUES (:id, 't_win', 'AC Repair', :start, :end, 1, :booked, 0, 1 - :booked)"),
+                dict(id=id_, start=start, end=start + timedelta(hours=1), booked=booked),
+            )
+
+    init_db(Base, bind=engine)
+
+    assert _window_index(engine)["unique"]
+    with engine.connect() as conn:
+        windows = conn.execute(text("SELECT id, total, booked, available FROM capacity")).all()
+    assert [tuple(w) for w in windows] == [(1, 2, 1, 1)]
+    engine.dispose()
+
+
+def test_slot_index_counts_free_units_per_window():
+    index = SlotIndex()
+    start = datetime.utcnow() + timedelta(hours=1)
+    end = start + timedelta(hours=1)
+    index.load([SimpleNamespace(tenant_id="t", service="s", start_dt=start, end_dt=end, free=2)])
+    index.discard("t", "s", start, end)
+    assert index.first("t", "s") == (start, end)
+    index.discard("t", "s", start, end)
+    assert index.first("t", "s") is None
+    index.add("t", "s", start, end)
+    assert index.first("t", "s") == (start, end)
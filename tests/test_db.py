@@ -0,0 +1,105 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.db import (
+    AsyncSessionLocal,
+    SessionLocal,
+    _make_async_engine,
+    _make_engine,
+    async_engine,
+    engine,
+    engine_options,
+    init_db,
+)
+from app.models import Base, Job, Proposal
+from app.services.jobs import JobFilter, list_jobs
+from app.services.proposal import get_proposal_by_message_id
+
+
+def test_sqlite_profile_pragmas_on_both_engines():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+
+    async def pragmas():
+        async with async_engine.connect() as conn:
+            return (await conn.execute(text("PRAGMA journal_mode"))).scalar(), (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+
+    assert asyncio.run(pragmas()) == ("wal", 5000)
+
+
+def test_postgres_profile_sizes_the_pool():
+    options = engine_options("postgresql+psycopg2://app@db/revin")
+    assert options["pool_size"] == 10 and options["max_overflow"] == 20 and options["pool_pre_ping"]
+    assert "connect_args" not in options
+
+
+def _job(tenant_id: str, job_id: str) -> Job:
+    now = datetime.utcnow()
+    return Job(
+        job_id=job_id, tenant_id=tenant_id, customer_name="R", phone="+15550000000", service="AC Repair",
+        slot_start=now, slot_end=now, status="BOOKED", source_event_id=f"evt_{job_id}", created_at=now,
+    )
+
+
+def test_reads_route_to_read_engine_and_writes_to_primary(tmp_path):
+    init_db(Base)
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    seed = _make_engine(url)
+    Base.metadata.create_all(seed)
+    tenant_id = f"t_ro_{uuid.uuid4().hex[:8]}"
+    with Session(seed) as s:
+        s.add(_job(tenant_id, "job_on_replica"))
+        s.commit()
+    replica = _make_engine(url, read_only=True)
+
+    db = SessionLocal(info={"read_bind": replica})
+    try:
+        rows, _ = list_jobs(db, JobFilter(tenant_id=tenant_id))
+        assert [r["job_id"] for r in rows] == ["job_on_replica"]
+        # Outside read_replica() everything goes to the primary, which has no such job
+        assert db.execute(select(Job).where(Job.tenant_id == tenant_id)).first() is None
+        db.add(_job(tenant_id, f"job_on_primary_{uuid.uuid4().hex[:8]}"))
+        db.commit()
+
+        # Lookups that feed a confirm read the primary, not the replica's stale copy
+        message_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        fields = dict(
+            proposal_id=uuid.uuid4().hex, tenant_id=tenant_id, customer_name="R", phone="+15550000000",
+            service="AC Repair", slot_start=now, slot_end=now, message_id=message_id,
+            source_event_id=f"evt_ro_{uuid.uuid4().hex[:8]}", created_at=now,
+        )
+        with Session(seed) as s:
+            s.add(Proposal(status="PROPOSED", **fields))
+            s.commit()
+        db.add(Proposal(status="CONFIRMED", **fields))
+        db.commit()
+        assert get_proposal_by_message_id(db, message_id).status == "CONFIRMED"
+    finally:
+        db.close()
+
+    # The read engine refuses writes
+    with pytest.raises(OperationalError):
+        with replica.begin() as conn:
+            conn.execute(text("DELETE FROM jobs"))
+
+    async def read_async():
+        async_replica = _make_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", read_only=True)
+        try:
+            async with AsyncSessionLocal(info={"read_bind": async_replica.sync_engine}) as adb:
+                rows, _ = await adb.run_sync(list_jobs, JobFilter(tenant_id=tenant_id))
+                return [r["job_id"] for r in rows]
+        finally:
+            await async_replica.dispose()
+
+    assert asyncio.run(read_async()) == ["job_on_replica"]
+    seed.dispose()
+    replica.dispose()
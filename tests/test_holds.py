@@ -0,0 +1,106 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity, CapacityHold, Job, Proposal
+from app.services.capacity import hold_slot, pick_slot, release_expired_holds
+
+
+client = TestClient(app)
+
+
+def _seed_one_slot(tenant_id: str) -> datetime:
+    init_db(Base)
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+    return start
+
+
+def _lead(tenant_id: str, name: str) -> dict:
+    return {
+        "event_id": f"evt_{uuid.uuid4().hex}",
+        "tenant_id": tenant_id,
+        "name": name,
+        "phone": f"+1555{uuid.uuid4().int % 10**7:07d}",
+        "service": "AC Repair",
+        "notes": "please propose",
+    }
+
+
+def test_proposed_slot_is_held_until_confirmed():
+    tenant_id = f"t_hold_{uuid.uuid4().hex[:8]}"
+    start = _seed_one_slot(tenant_id)
+
+    first = _lead(tenant_id, "Jane")
+    r = client.post("/lead/propose", json=first)
+    assert r.json()["status"] == "PROPOSED"
+    message_id = r.json()["message_id"]
+
+    # The only slot is held, so a second customer is not offered the same time
+    r = client.post("/lead/propose", json=_lead(tenant_id, "John"))
+    assert r.json()["status"] == "NEEDS_DISPATCH"
+
+    r = client.post("/sms/callback", json={"message_id": message_id, "from_phone": first["phone"], "body": "YES"})
+    body = r.json()
+    assert body["status"] == "BOOKED"
+    assert body["slot_start"] == start.isoformat()
+
+
+def test_expired_hold_frees_the_slot():
+    tenant_id = f"t_hold_{uuid.uuid4().hex[:8]}"
+    start = _seed_one_slot(tenant_id)
+    live, other = uuid.uuid4().hex, uuid.uuid4().hex
+    db = SessionLocal()
+    try:
+        assert hold_slot(db, tenant_id, "AC Repair", holder=live)[0] == start
+        assert hold_slot(db, tenant_id, "AC Repair", holder=other) is None
+
+        db.query(CapacityHold).filter(CapacityHold.holder == live).update({"held_until": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        assert hold_slot(db, tenant_id, "AC Repair", holder=other)[0] == start
+    finally:
+        db.close()
+
+
+def test_lapsed_hold_on_a_full_window_is_not_booked_elsewhere():
+    tenant_id = f"t_hold_{uuid.uuid4().hex[:8]}"
+    start = _seed_one_slot(tenant_id)
+    later = start + timedelta(hours=3)
+    db = SessionLocal()
+    try:
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=later, end_dt=later + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+    lead = _lead(tenant_id, "Jane")
+    r = client.post("/lead/propose", json=lead).json()
+
+    # The hold lapses and someone else books the accepted window
+    db = SessionLocal()
+    try:
+        db.query(CapacityHold).filter(CapacityHold.holder == r["proposal_id"]).update({"held_until": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        release_expired_holds(db)
+        assert pick_slot(db, tenant_id, "AC Repair")[0] == start
+    finally:
+        db.close()
+
+    callback = {"message_id": r["message_id"], "from_phone": lead["phone"], "body": "yes"}
+    assert client.post("/sms/callback", json=callback).json()["status"] == "NEEDS_DISPATCH"
+    assert client.post("/sms/callback", json=callback).json()["status"] == "NEEDS_DISPATCH"
+    db = SessionLocal()
+    try:
+        assert db.get(Proposal, r["proposal_id"]).status == "EXPIRED"
+        assert db.query(Job).filter(Job.tenant_id == tenant_id).count() == 0
+        window = db.query(Capacity).filter(Capacity.tenant_id == tenant_id, Capacity.start_dt == later).one()
+        assert (window.booked, window.available) == (0, 1)
+    finally:
+        db.close()
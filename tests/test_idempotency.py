@@ -0,0 +1,142 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select
+
+from app.main import app
+from app.cache import BloomFilter
+from app.db import SessionLocal, engine, init_db
+from app.models import Base, Capacity, Job
+from app.services.booking import book_job, get_idempotent_job
+from app.services.capacity import pick_slot
+from app.services.idempotency import idempotency_filter
+
+
+client = TestClient(app)
+
+
+def _seed(tenant_id: str, count: int) -> None:
+    init_db(Base)
+    db = SessionLocal()
+    try:
+        base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for i in range(count):
+            start = base + timedelta(hours=i)
+            db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _booked_slots(tenant_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(func.coalesce(func.sum(Capacity.booked), 0)).where(Capacity.tenant_id == tenant_id)
+        ).scalar_one()
+    finally:
+        db.close()
+
+
+def test_concurrent_retries_book_one_job_and_release_extra_slots():
+    tenant_id = f"t_idem_{uuid.uuid4().hex[:8]}"
+    _seed(tenant_id, 10)
+    lead = SimpleNamespace(
+        event_id=f"evt_{uuid.uuid4().hex}", tenant_id=tenant_id, name="Jane",
+        phone="+15550000000", address=None, service="AC Repair",
+    )
+
+    def attempt(_):
+        db = SessionLocal()
+        try:
+            slot = pick_slot(db, tenant_id, "AC Repair")
+            return book_job(db, lead, slot).job_id
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        job_ids = set(pool.map(attempt, range(6)))
+
+    assert len(job_ids) == 1
+    assert _booked_slots(tenant_id) == 1
+    db = SessionLocal()
+    try:
+        assert db.execute(select(func.count()).select_from(Job).where(Job.source_event_id == lead.event_id)).scalar_one() == 1
+    finally:
+        db.close()
+
+
+def test_lead_retry_returns_stored_job_without_claiming_a_slot():
+    tenant_id = f"t_idem_{uuid.uuid4().hex[:8]}"
+    _seed(tenant_id, 3)
+    lead = {"event_id": f"evt_{uuid.uuid4().hex}", "tenant_id": tenant_id, "name": "Jane", "phone": "+15550000001", "service": "AC Repair"}
+    first = client.post("/lead", json=lead).json()
+    again = client.post("/lead", json=lead).json()
+    assert again["job_id"] == first["job_id"]
+    assert _booked_slots(tenant_id) == 1
+
+
+def test_warm_filter_skips_lookup_for_new_events():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [f"evt_{i}:book_job" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(bloom.might_contain(key) for key in keys)
+    false_positives = sum(bloom.might_contain(f"other_{i}") for i in range(10_000))
+    assert false_positives < 300
+
+    tenant_id = f"t_idem_{uuid.uuid4().hex[:8]}"
+    _seed(tenant_id, 2)
+    lead = {"event_id": f"evt_{uuid.uuid4().hex}", "tenant_id": tenant_id, "name": "Jane", "phone": "+15550000002", "service": "AC Repair"}
+    job_id = client.post("/lead", json=lead).json()["job_id"]
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    idempotency_filter.warm()
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        db = SessionLocal()
+        try:
+            assert get_idempotent_job(db, f"evt_new_{uuid.uuid4().hex}") is None
+            assert statements == []
+            assert get_idempotent_job(db, lead["event_id"]).job_id == job_id
+        finally:
+            db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+        idempotency_filter.ready = False
+
+
+def test_retry_in_the_same_window_gives_the_unit_back():
+    init_db(Base)
+    tenant_id = f"t_idem_{uuid.uuid4().hex[:8]}"
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    db = SessionLocal()
+    try:
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1), total=2))
+        db.commit()
+    finally:
+        db.close()
+    lead = {"event_id": f"evt_{uuid.uuid4().hex}", "tenant_id": tenant_id, "name": "Jane", "phone": f"+1555{uuid.uuid4().int % 10**7:07d}", "service": "AC Repair"}
+    message_id = client.post("/lead/propose", json=lead).json()["message_id"]
+
+    callback = {"message_id": message_id, "from_phone": lead["phone"], "body": "yes"}
+    first = client.post("/sms/callback", json=callback).json()
+    again = client.post("/sms/callback", json=callback).json()
+    assert again["job_id"] == first["job_id"]
+
+    db = SessionLocal()
+    try:
+        window = db.query(Capacity).filter(Capacity.tenant_id == tenant_id).one()
+        assert (window.booked, window.held, window.available) == (1, 0, 1)
+        # A claim that loses the idempotency race releases its unit even in the job's window
+        slot = pick_slot(db, tenant_id, "AC Repair")
+        retry = SimpleNamespace(event_id=f"{message_id}:confirm", tenant_id=tenant_id, name="Jane", phone=lead["phone"], address=None, service="AC Repair")
+        assert book_job(db, retry, slot).job_id == first["job_id"]
+        db.refresh(window)
+        assert (window.booked, window.available) == (1, 1)
+    finally:
+        db.close()
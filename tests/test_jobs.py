@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import SessionLocal, init_db
+from app.models import Base, Job
+
+
+client = TestClient(app)
+
+
+def _seed_jobs(tenant_id: str, count: int) -> list[str]:
+    init_db(Base)
+    base = datetime(2030, 1, 1, 9)
+    db = SessionLocal()
+    ids = []
+    try:
+        for i in range(count):
+            job_id = uuid.uuid4().hex
+            # Pairs share a created_at so the job_id tiebreak is exercised
+            created = base + timedelta(minutes=i // 2)
+            db.add(Job(
+                job_id=job_id, tenant_id=tenant_id, customer_name=f"C{i}", phone="+15550000000",
+                service="AC Repair", slot_start=created, slot_end=created + timedelta(hours=1),
+                status="CANCELLED" if i % 3 == 0 else "BOOKED", source_event_id=f"evt_{job_id}", created_at=created,
+            ))
+            ids.append(job_id)
+        db.commit()
+    finally:
+        db.close()
+    return ids
+
+
+def test_keyset_pages_cover_every_job_once_in_order():
+    tenant_id = f"t_jobs_{uuid.uuid4().hex[:8]}"
+    _seed_jobs(tenant_id, 9)
+
+    seen, cursor = [], None
+    while True:
+        params = {"tenant_id": tenant_id, "limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/jobs", params=params)
+        seen.extend(r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert len(seen) == 9 and len({j["job_id"] for j in seen}) == 9
+    db = SessionLocal()
+    try:
+        jobs = {j.job_id: j for j in db.query(Job).filter(Job.tenant_id == tenant_id)}
+    finally:
+        db.close()
+    keys = [(jobs[j["job_id"]].created_at, j["job_id"]) for j in seen]
+    assert keys == sorted(keys, reverse=True)
+
+    booked = client.get("/jobs", params={"tenant_id": tenant_id, "status": "BOOKED"}).json()
+    assert len(booked) == 6 and all(j["status"] == "BOOKED" for j in booked)
+    window = client.get("/jobs", params={"tenant_id": tenant_id, "created_from": "2030-01-01T09:01:00", "created_to": "2030-01-01T09:03:00"}).json()
+    assert len(window) == 4
+
+    assert client.get("/jobs", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_export_streams_ndjson_and_csv():
+    tenant_id = f"t_jobs_{uuid.uuid4().hex[:8]}"
+    ids = _seed_jobs(tenant_id, 5)
+
+    r = client.get("/jobs/export", params={"tenant_id": tenant_id})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert sorted(row["job_id"] for row in rows) == sorted(ids)
+
+    r = client.get("/jobs/export", params={"tenant_id": tenant_id, "format": "csv", "status": "BOOKED"})
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == 3 and {row["status"] for row in rows} == {"BOOKED"}
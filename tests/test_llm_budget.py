@@ -0,0 +1,105 @@
+import asyncio
+import time
+import uuid
+
+from app import metrics
+from app.services import llm_client
+from app.services.llm import classify_reply_text, classify_reply_text_async
+from app.services.llm_client import breaker, llm_call_scope
+from app.services.nlu_cache import nlu_cache
+
+
+class Backend:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def complete(self, operation, request):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return "yes"
+
+    async def complete_async(self, operation, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return "yes"
+
+
+def _text() -> str:
+    # Words the local reply model has never seen, so it escalates to the LLM
+    return f"zebra quartz {uuid.uuid4().hex[:6]}"
+
+
+def test_slow_answer_misses_the_budget_but_warms_the_cache():
+    backend = Backend(delay=0.3)
+    llm_client.set_backend(backend)
+    breaker.reset()
+    nlu_cache.clear()
+    text = _text()
+    try:
+        with llm_call_scope("/chat/reply", budget=0.05):
+            started = time.perf_counter()
+            assert classify_reply_text(text) == "unknown"
+            assert time.perf_counter() - started < 0.25
+            time.sleep(0.4)
+            # The late answer landed in the cache; the next identical reply does not call out
+            assert classify_reply_text(text) == "yes"
+    finally:
+        llm_client.set_backend(None)
+    assert backend.calls == 1
+    assert metrics.llm_budget_exceeded.collect()[("/chat/reply", "classify")] >= 1
+    # Slow counts against the breaker
+    assert breaker.failures == 1
+    breaker.reset()
+
+
+def test_async_budget_falls_back_and_keeps_the_call_running():
+    backend = Backend(delay=0.2)
+    llm_client.set_backend(backend)
+    breaker.reset()
+    nlu_cache.clear()
+    text = _text()
+
+    async def reply_twice():
+        with llm_call_scope("/chat/reply", budget=0.02):
+            first = await classify_reply_text_async(text)
+            await asyncio.sleep(0.3)
+            return first, await classify_reply_text_async(text)
+
+    try:
+        assert asyncio.run(reply_twice()) == ("unknown", "yes")
+    finally:
+        llm_client.set_backend(None)
+        breaker.reset()
+    assert backend.calls == 1
+
+
+def test_breaker_skips_the_llm_during_cooldown(monkeypatch):
+    backend = Backend(fail=True)
+    llm_client.set_backend(backend)
+    monkeypatch.setattr(breaker, "threshold", 2)
+    monkeypatch.setattr(breaker, "cooldown", 0.2)
+    breaker.reset()
+    nlu_cache.clear()
+    before = metrics.llm_short_circuits.collect().get(("classify",), 0.0)
+    try:
+        assert classify_reply_text(_text()) == "unknown"
+        assert classify_reply_text(_text()) == "unknown"
+        assert breaker.is_open
+        assert classify_reply_text(_text()) == "unknown"
+        assert backend.calls == 2
+        assert metrics.llm_short_circuits.collect()[("classify",)] - before == 1
+
+        # After the cooldown one trial call goes out; its success closes the breaker
+        time.sleep(0.25)
+        backend.fail = False
+        assert classify_reply_text(_text()) == "yes"
+        assert not breaker.is_open and backend.calls == 3
+    finally:
+        llm_client.set_backend(None)
+        breaker.reset()
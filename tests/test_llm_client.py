@@ -0,0 +1,53 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services import llm_client
+from app.services.llm import classify_reply_text
+from app.services.llm_client import OpenAIBackend
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    peers: list = []
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        _StubHandler.peers.append(self.client_address)
+        content = "yes" if request["max_tokens"] == 3 else "Stub proposal, reply YES"
+        body = json.dumps({
+            "id": "cmpl_stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_backend_reuses_pooled_connection_against_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _StubHandler.peers = []
+    try:
+        llm_client.set_backend(OpenAIBackend("stub", base_url=f"http://127.0.0.1:{server.server_port}/v1"))
+        request = dict(model="gpt-4o-mini", messages=[{"role": "user", "content": "Write a proposal"}], max_tokens=60)
+        assert llm_client.complete("proposal", request) == "Stub proposal, reply YES"
+        assert classify_reply_text("zebra quartz") == "yes"
+        assert llm_client.complete("proposal", request) == "Stub proposal, reply YES"
+    finally:
+        llm_client.set_backend(None)
+        server.shutdown()
+        server.server_close()
+
+    # Every call went over the same keep-alive connection
+    assert len(_StubHandler.peers) == 3
+    assert len(set(_StubHandler.peers)) == 1
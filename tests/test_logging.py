@@ -0,0 +1,38 @@
+import json
+import logging
+import time
+
+from app.logging import JsonFormatter, SampleFilter, parse_sample_rates
+
+
+def _record(msg: str, level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("revin", level, __file__, 1, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_formatter_passes_through_extras_with_cached_timestamp():
+    formatter = JsonFormatter()
+    record = _record("tenant_resolved", phone="+15551234567", tenant_id="t_acme", slots=3)
+    record.created = 1893456000.25
+    payload = json.loads(formatter.format(record))
+    assert payload["ts"] == "2030-01-01T00:00:00.250Z"
+    assert payload["message"] == "tenant_resolved"
+    assert (payload["phone"], payload["tenant_id"], payload["slots"]) == ("+15551234567", "t_acme", 3)
+    assert "args" not in payload and "lineno" not in payload
+
+    later = _record("x")
+    later.created = 1893456001.5
+    assert json.loads(formatter.format(later))["ts"] == "2030-01-01T00:00:01.500Z"
+    now = _record("x")
+    assert json.loads(formatter.format(now))["ts"][:4] == time.strftime("%Y", time.gmtime())
+
+
+def test_sampling_applies_to_named_info_events_only():
+    rates = parse_sample_rates("lead_received=0, job_booked=1")
+    assert rates == {"lead_received": 0.0, "job_booked": 1.0}
+    sampler = SampleFilter(rates)
+    assert not sampler.filter(_record("lead_received"))
+    assert sampler.filter(_record("job_booked"))
+    assert sampler.filter(_record("proposal_sent"))
+    assert sampler.filter(_record("lead_received", level=logging.WARNING))
@@ -0,0 +1,154 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import metrics
+from app.config import settings
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity, CapacityHold, Idempotency, Outbox, Proposal
+from app.services.capacity import hold_slot, reconcile_slot_index
+from app.services.maintenance import sweep
+from app.services.slot_index import slot_index
+
+
+def _proposal(tenant_id: str, status: str, created_at: datetime, slot: datetime) -> Proposal:
+    return Proposal(
+        proposal_id=uuid.uuid4().hex, tenant_id=tenant_id, customer_name="M", phone="+15550000000",
+        service="AC Repair", slot_start=slot, slot_end=slot + timedelta(hours=1), status=status,
+        message_id=uuid.uuid4().hex, source_event_id="evt_maint", created_at=created_at,
+    )
+
+
+def _outbox(status: str, created_at: datetime) -> Outbox:
+    return Outbox(
+        message_id=uuid.uuid4().hex, kind="sms", phone="+15550000000", body="hi", status=status,
+        attempts=0, next_attempt_at=created_at, created_at=created_at,
+    )
+
+
+def test_sweep_expires_and_deletes_only_rows_past_retention():
+    init_db(Base)
+    tenant_id = f"t_maint_{uuid.uuid4().hex[:8]}"
+    now = datetime.utcnow()
+    past = now - timedelta(days=3)
+    future = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=past, end_dt=past + timedelta(hours=1)),
+            Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=past + timedelta(hours=1), end_dt=past + timedelta(hours=2), total=2, booked=1),
+            Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=future, end_dt=future + timedelta(hours=1)),
+        ])
+        db.commit()
+        stale = _proposal(tenant_id, "PROPOSED", now - timedelta(days=2), future)
+        assert hold_slot(db, tenant_id, "AC Repair", holder=stale.proposal_id, ttl_seconds=3600)[0] == future
+        old_key, new_key = f"idem:{uuid.uuid4().hex}", f"idem:{uuid.uuid4().hex}"
+        sent, pending = _outbox("SENT", now - timedelta(days=10)), _outbox("PENDING", now - timedelta(days=10))
+        db.add_all([
+            stale,
+            _proposal(tenant_id, "PROPOSED", now, future),
+            _proposal(tenant_id, "CONFIRMED", now - timedelta(days=40), future),
+            Idempotency(key=old_key, job_id="j_old", created_at=now - timedelta(days=40)),
+            Idempotency(key=new_key, job_id="j_new", created_at=now),
+            sent,
+            pending,
+        ])
+        db.commit()
+        stale_id, sent_id, pending_id = stale.proposal_id, sent.id, pending.id
+    finally:
+        db.close()
+
+    counts = sweep()
+    assert counts["proposals_expired"] >= 1 and counts["capacity_deleted"] >= 1
+
+    db = SessionLocal()
+    try:
+        windows = db.execute(
+            select(Capacity.start_dt, Capacity.booked, Capacity.held, Capacity.available)
+            .where(Capacity.tenant_id == tenant_id).order_by(Capacity.start_dt)
+        ).all()
+        # The unbooked past window is gone; the booked one stays; the stale proposal's unit is back
+        assert [tuple(w) for w in windows] == [(past + timedelta(hours=1), 1, 0, 1), (future, 0, 0, 1)]
+        assert db.get(CapacityHold, stale_id) is None
+        statuses = db.execute(
+            select(Proposal.status, func.count()).where(Proposal.tenant_id == tenant_id).group_by(Proposal.status)
+        ).all()
+        assert dict(statuses) == {"EXPIRED": 1, "PROPOSED": 1}
+        assert db.get(Idempotency, old_key) is None and db.get(Idempotency, new_key) is not None
+        assert db.get(Outbox, sent_id) is None and db.get(Outbox, pending_id) is not None
+    finally:
+        db.close()
+
+
+def test_sweep_gives_released_units_back_to_the_slot_index():
+    init_db(Base)
+    tenant_id = f"t_maint_{uuid.uuid4().hex[:8]}"
+    now = datetime.utcnow()
+    first = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+    second = first + timedelta(hours=1)
+    db = SessionLocal()
+    try:
+        for start in (first, second):
+            db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+        reconcile_slot_index()
+        lapsed, stale = uuid.uuid4().hex, _proposal(tenant_id, "PROPOSED", now - timedelta(days=2), second)
+        assert hold_slot(db, tenant_id, "AC Repair", holder=lapsed)[0] == first
+        assert hold_slot(db, tenant_id, "AC Repair", holder=stale.proposal_id, ttl_seconds=3600)[0] == second
+        db.add(stale)
+        db.query(CapacityHold).filter(CapacityHold.holder == lapsed).update({"held_until": now - timedelta(seconds=1)})
+        db.commit()
+        assert slot_index.first(tenant_id, "AC Repair") is None
+
+        # Both the lapsed hold and the expired proposal's hold are offered again without a reconcile
+        sweep()
+        assert slot_index.first(tenant_id, "AC Repair") == (first, first + timedelta(hours=1))
+        assert slot_index.first(tenant_id, "AC Repair", after=first) == (second, second + timedelta(hours=1))
+    finally:
+        slot_index.clear()
+        db.close()
+
+
+def test_sweep_deletes_in_capped_batches(monkeypatch):
+    init_db(Base)
+    tenant_id = f"t_maint_{uuid.uuid4().hex[:8]}"
+    past = datetime.utcnow() - timedelta(days=3)
+    db = SessionLocal()
+    try:
+        # Clear older leftovers so the count below is this test's alone
+        sweep()
+        for i in range(5):
+            start = past + timedelta(minutes=i)
+            db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    monkeypatch.setattr(settings, "maintenance_batch_size", 2)
+    monkeypatch.setattr(settings, "maintenance_max_batches", 2)
+    assert sweep()["capacity_deleted"] == 4
+    assert sweep()["capacity_deleted"] == 1
+
+
+def test_sweep_counts_each_step_under_its_own_labels(monkeypatch):
+    init_db(Base)
+    tenant_id = f"t_maint_{uuid.uuid4().hex[:8]}"
+    old = datetime.utcnow() - timedelta(days=200)
+    db = SessionLocal()
+    try:
+        sweep()
+        db.add_all([
+            Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=old, end_dt=old + timedelta(hours=1)),
+            Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=old + timedelta(hours=1), end_dt=old + timedelta(hours=2), booked=1),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    before = metrics.maintenance_rows.collect()
+    counts = sweep()
+    after = metrics.maintenance_rows.collect()
+    assert (counts["capacity_deleted"], counts["capacity_booked_deleted"]) == (1, 1)
+    for labels in (("capacity", "deleted"), ("capacity", "booked_deleted")):
+        assert after[labels] - before.get(labels, 0.0) == 1
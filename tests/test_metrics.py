@@ -0,0 +1,75 @@
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import SessionLocal, init_db
+from app.metrics import Counter, Histogram
+from app.models import Base, Capacity
+
+
+client = TestClient(app)
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    for line in text.splitlines():
+        match = re.match(r"^(\w+)(?:\{(.*)\})? (\S+)$", line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or ""))
+        if all(found.get(k) == v for k, v in labels.items()):
+            return float(match.group(3))
+    raise AssertionError(f"{name} {labels} not exported")
+
+
+def test_sharded_counters_and_histograms_merge_across_threads():
+    counter = Counter("t_total", "test", ("kind",))
+    histogram = Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+
+    def work(_):
+        for _ in range(1000):
+            counter.inc("a")
+            histogram.observe(0.5)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, range(8)))
+    assert counter.collect() == {("a",): 8000.0}
+    samples = {(name, labels.get("le")): value for name, labels, value in histogram.samples()}
+    assert samples[("t_seconds_bucket", "0.1")] == 0
+    assert samples[("t_seconds_bucket", "1")] == 8000
+    assert samples[("t_seconds_bucket", "+Inf")] == 8000
+    assert samples[("t_seconds_sum", None)] == 4000
+
+
+def test_metrics_endpoint_reports_route_and_db_usage():
+    init_db(Base)
+    tenant_id = f"t_met_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    before = client.get("/metrics").text
+    try:
+        lead_count = _sample(before, "http_requests_total", route="/lead", method="POST", status="200")
+    except AssertionError:
+        lead_count = 0
+    client.post("/lead", json={"event_id": f"evt_{uuid.uuid4().hex}", "tenant_id": tenant_id, "name": "Jane", "phone": "+15550000003", "service": "AC Repair"})
+    client.get(f"/jobs/{uuid.uuid4().hex}")
+
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain")
+    text = r.text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert _sample(text, "http_requests_total", route="/lead", method="POST", status="200") == lead_count + 1
+    assert _sample(text, "http_requests_total", route="unmatched", status="404") >= 1
+    # Statements run through AsyncSession.run_sync are attributed to the request
+    assert _sample(text, "db_queries_per_request_sum", route="/lead") >= 3
+    assert _sample(text, "db_query_duration_seconds_count", engine="async") > 0
+    assert _sample(text, "nlu_cache_entries") >= 0
@@ -0,0 +1,45 @@
+import asyncio
+
+from app.services import llm_client
+from app.services.llm import classify_reply_text, classify_reply_text_async, extract_entities_from_text
+from app.services.nlu_cache import NluCache, nlu_cache
+
+
+class CountingBackend:
+    def __init__(self):
+        self.calls = []
+
+    def complete(self, operation, request):
+        self.calls.append(operation)
+        if operation == "extract":
+            return '{"tenant_id": "t_acme", "service": "plumbing"}'
+        return "yes"
+
+    async def complete_async(self, operation, request):
+        return self.complete(operation, request)
+
+
+def test_repeated_messages_skip_the_llm():
+    backend = CountingBackend()
+    llm_client.set_backend(backend)
+    nlu_cache.clear()
+    try:
+        assert classify_reply_text("Zebra quartz!") == "yes"
+        assert classify_reply_text("zebra   quartz") == "yes"
+        assert asyncio.run(classify_reply_text_async("ZEBRA QUARTZ")) == "yes"
+        assert extract_entities_from_text("Water all over the basement!")["service"] == "Plumbing"
+        assert extract_entities_from_text("water all over the basement")["service"] == "Plumbing"
+    finally:
+        llm_client.set_backend(None)
+    assert backend.calls == ["classify", "extract"]
+    assert nlu_cache.stats()["hits"] == 3
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "nlu.db")
+    first = NluCache(maxsize=8, ttl=60, path=path)
+    first.set(first.key("classify", "yes please"), "yes")
+
+    restarted = NluCache(maxsize=8, ttl=60, path=path)
+    assert restarted.get(restarted.key("classify", "Yes please!")) == "yes"
+    assert restarted.stats()["disk_hits"] == 1
@@ -0,0 +1,100 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from app.main import app
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity, Outbox, Proposal
+from app.services import outbox
+from app.services.notify import MockProvider, enqueue_sms
+
+
+client = TestClient(app)
+
+
+def _phone() -> str:
+    return f"+1555{uuid.uuid4().int % 10**7:07d}"
+
+
+def _row(message_id: str) -> Outbox:
+    db = SessionLocal()
+    try:
+        return db.execute(select(Outbox).where(Outbox.message_id == message_id)).scalar_one()
+    finally:
+        db.close()
+
+
+def _drain_all(provider: MockProvider) -> None:
+    while outbox.drain_outbox(provider=provider):
+        pass
+
+
+def test_proposal_sms_is_queued_with_the_proposal_and_delivered_by_worker():
+    init_db(Base)
+    tenant_id = f"t_out_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    phone = _phone()
+    lead = {"event_id": f"evt_{uuid.uuid4().hex}", "tenant_id": tenant_id, "name": "Jane", "phone": phone, "service": "AC Repair"}
+    r = client.post("/lead/propose", json=lead)
+    message_id = r.json()["message_id"]
+
+    # Not sent during the request; the row committed together with the proposal
+    row = _row(message_id)
+    assert row.status == "PENDING" and row.phone == phone
+    db = SessionLocal()
+    try:
+        assert db.execute(select(Proposal).where(Proposal.message_id == message_id)).scalar_one()
+    finally:
+        db.close()
+
+    provider = MockProvider()
+    _drain_all(provider)
+    assert (phone, row.body, message_id) in provider.sent
+    assert _row(message_id).status == "SENT"
+
+    # Confirming books the job and queues the confirmation in the same way
+    r = client.post("/sms/callback", json={"message_id": message_id, "from_phone": phone, "body": "YES"})
+    assert r.json()["status"] == "BOOKED"
+    _drain_all(provider)
+    assert any(p == phone and text.startswith("Booked AC Repair") for p, text, _ in provider.sent)
+
+
+def test_failed_sends_back_off_then_go_dead(monkeypatch):
+    init_db(Base)
+    flaky, broken = _phone(), _phone()
+    db = SessionLocal()
+    try:
+        flaky_id = enqueue_sms(db, flaky, "hello flaky")
+        broken_id = enqueue_sms(db, broken, "hello broken")
+        db.commit()
+    finally:
+        db.close()
+
+    monkeypatch.setattr(outbox.settings, "outbox_max_attempts", 2)
+    provider = MockProvider(fail={flaky: 1, broken: 5})
+    _drain_all(provider)
+    row = _row(flaky_id)
+    assert row.status == "PENDING" and row.attempts == 1 and row.next_attempt_at > datetime.utcnow()
+    assert "mock provider failure" in row.last_error
+
+    # Skip the backoff wait
+    db = SessionLocal()
+    try:
+        db.execute(update(Outbox).where(Outbox.message_id.in_([flaky_id, broken_id])).values(next_attempt_at=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+    _drain_all(provider)
+
+    assert _row(flaky_id).status == "SENT"
+    assert _row(broken_id).status == "DEAD" and _row(broken_id).attempts == 2
+    assert [m for _, _, m in provider.sent].count(flaky_id) == 1
@@ -0,0 +1,111 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.db import SessionLocal, init_db
+from app.main import app
+from app.models import Base, Capacity, Proposal
+from app.services import llm_client
+from app.services.capacity import hold_slot
+from app.services.llm import classify_reply_text
+from app.services.nlu_cache import nlu_cache
+from app.services.proposal import create_proposal, new_proposal_id
+from app.services.reply_model import ReplyModel, reply_classifier, train
+
+
+client = TestClient(app)
+
+
+class CountingBackend:
+    def __init__(self, label: str = "unknown"):
+        self.label = label
+        self.calls = 0
+
+    def complete(self, operation, request):
+        self.calls += 1
+        return self.label
+
+    async def complete_async(self, operation, request):
+        return self.complete(operation, request)
+
+
+def test_train_predict_and_round_trip(tmp_path):
+    model = train([
+        ("yes that works", "yes"), ("sounds good", "yes"),
+        ("cancel it", "cancel"), ("we don't need it", "cancel"),
+        ("another day please", "reschedule"),
+    ])
+    assert model.predict("Sounds good!").label == "yes"
+    assert model.predict("please cancel").label == "cancel"
+    # Words never seen in training carry no evidence
+    assert model.predict("zebra quartz").confidence == 0.0
+
+    path = str(tmp_path / "model.json")
+    model.save(path)
+    loaded = ReplyModel.load(path)
+    texts = ["cancel it", "yes that works", "CANCEL IT!"]
+    for saved, fresh in zip(map(loaded.predict, texts), map(model.predict, texts)):
+        assert (saved.label, saved.known) == (fresh.label, fresh.known)
+        assert abs(saved.confidence - fresh.confidence) < 1e-4
+
+
+def test_confident_replies_skip_the_llm():
+    backend = CountingBackend()
+    llm_client.set_backend(backend)
+    nlu_cache.clear()
+    before = metrics.reply_first_pass.collect()
+    try:
+        assert classify_reply_text("can you come in the afternoon instead") == "reschedule"
+        assert classify_reply_text("perfect, see you then") == "yes"
+        assert backend.calls == 0
+        assert classify_reply_text(f"zebra quartz {uuid.uuid4().hex[:6]}") == "unknown"
+        assert backend.calls == 1
+        # Cancelling cannot be undone, so the model never answers it alone
+        assert reply_classifier.predict("we fixed it ourselves").label == "cancel"
+        assert reply_classifier.confident_label("we fixed it ourselves") is None
+        assert classify_reply_text(f"we fixed it ourselves {uuid.uuid4().hex[:6]}") == "unknown"
+        assert backend.calls == 2
+    finally:
+        llm_client.set_backend(None)
+    after = metrics.reply_first_pass.collect()
+    assert after[("local",)] - before.get(("local",), 0.0) == 2
+    assert after[("escalated",)] - before.get(("escalated",), 0.0) == 2
+    assert "reply_llm_escalation_ratio" in client.get("/metrics").text
+
+
+def test_cancel_reply_releases_the_hold():
+    assert reply_classifier.model is not None
+    init_db(Base)
+    tenant_id = f"t_reply_{uuid.uuid4().hex[:8]}"
+    phone = f"+1555{uuid.uuid4().int % 10**7:07d}"
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+    db = SessionLocal()
+    try:
+        db.add(Capacity(tenant_id=tenant_id, service="AC Repair", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+        lead = SimpleNamespace(event_id="evt_reply", tenant_id=tenant_id, name="C", phone=phone, address=None, service="AC Repair")
+        proposal_id = new_proposal_id()
+        hold_slot(db, tenant_id, "AC Repair", holder=proposal_id)
+        create_proposal(db, lead, start, start + timedelta(hours=1), "Proposal text", proposal_id=proposal_id)
+    finally:
+        db.close()
+
+    llm_client.set_backend(CountingBackend("cancel"))
+    nlu_cache.clear()
+    try:
+        r = client.post("/chat/reply", json={"from_phone": phone, "text": "Never mind, we fixed it ourselves"})
+    finally:
+        llm_client.set_backend(None)
+    assert r.json()["status"] == "CANCELLED"
+
+    db = SessionLocal()
+    try:
+        assert db.get(Proposal, proposal_id).status == "CANCELLED"
+        window = db.query(Capacity).filter(Capacity.tenant_id == tenant_id).one()
+        assert (window.held, window.available) == (0, 1)
+    finally:
+        db.close()
+    assert client.post("/chat/reply", json={"from_phone": phone, "text": "hello?"}).json()["status"] == "HANDOFF"
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app import metrics
+from app.cache import SingleFlight
+from app.services import llm_client
+from app.services.llm import classify_reply_text, classify_reply_text_async, llm_flight
+from app.services.nlu_cache import nlu_cache
+
+
+class SlowBackend:
+    def __init__(self, delay: float, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.fail:
+            raise TimeoutError("upstream timed out")
+        return "yes"
+
+    def complete(self, operation, request):
+        time.sleep(self.delay)
+        return self._answer()
+
+    async def complete_async(self, operation, request):
+        await asyncio.sleep(self.delay)
+        return self._answer()
+
+
+def _coalesced() -> float:
+    return metrics.llm_coalesced.collect().get(("classify",), 0.0)
+
+
+def test_concurrent_threads_share_one_call():
+    backend = SlowBackend(delay=0.3)
+    llm_client.set_backend(backend)
+    nlu_cache.clear()
+    text = f"zebra quartz {uuid.uuid4().hex[:6]}"
+    before = _coalesced()
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            labels = list(pool.map(lambda i: classify_reply_text(text.upper() if i % 2 else text), range(8)))
+    finally:
+        llm_client.set_backend(None)
+    assert labels == ["yes"] * 8
+    assert backend.calls == 1
+    assert _coalesced() - before == 7
+    assert len(llm_flight) == 0
+
+
+def test_coroutines_share_one_call_and_its_failure():
+    backend = SlowBackend(delay=0.05, fail=True)
+    llm_client.set_backend(backend)
+    nlu_cache.clear()
+    text = f"zebra flint {uuid.uuid4().hex[:6]}"
+
+    async def burst():
+        return await asyncio.gather(*(classify_reply_text_async(text) for _ in range(5)))
+
+    try:
+        labels = asyncio.run(burst())
+    finally:
+        llm_client.set_backend(None)
+    # Every waiter gets the one call's outcome: the failure falls back for all of them
+    assert labels == ["unknown"] * 5
+    assert backend.calls == 1
+    assert len(llm_flight) == 0
+
+
+def test_async_waiter_joins_a_call_made_on_a_thread():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, "k", slow)
+        started.wait(5)
+
+        async def follow():
+            waiter = asyncio.ensure_future(flight.do_async("k", lambda: asyncio.sleep(0, "not called")))
+            await asyncio.sleep(0.05)
+            release.set()
+            return await waiter
+
+        assert asyncio.run(follow()) == ("done", True)
+        assert leader.result() == ("done", False)
+    assert flight.do("k", lambda: "again") == ("again", False)
@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.db import SessionLocal, init_db
+from app.models import Base, Capacity
+from app.services.capacity import hold_slot, pick_slot, reconcile_slot_index
+from app.services.slot_index import SlotIndex, slot_index
+
+
+def test_slot_index_tracks_claims():
+    init_db(Base)
+    tenant_id = f"t_idx_{uuid.uuid4().hex[:8]}"
+    base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    db = SessionLocal()
+    try:
+        for i in range(3):
+            start = base + timedelta(hours=i)
+            db.add(Capacity(tenant_id=tenant_id, service="Plumbing", start_dt=start, end_dt=start + timedelta(hours=1)))
+        db.commit()
+
+        reconcile_slot_index()
+        first = (base, base + timedelta(hours=1))
+        second = (base + timedelta(hours=1), base + timedelta(hours=2))
+        assert slot_index.first(tenant_id, "Plumbing") == first
+        assert slot_index.first(tenant_id, "Plumbing", after=first[0]) == second
+
+        assert pick_slot(db, tenant_id, "Plumbing") == first
+        assert slot_index.first(tenant_id, "Plumbing") == second
+        assert slot_index.first(tenant_id, "Electrical") is None
+    finally:
+        slot_index.clear()
+        db.close()
+
+
+def test_claims_take_the_index_candidate_and_drop_stale_ones():
+    init_db(Base)
+    tenant_id = f"t_idx_{uuid.uuid4().hex[:8]}"
+    base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    first = (base, base + timedelta(hours=1))
+    second = (base + timedelta(hours=1), base + timedelta(hours=2))
+    db = SessionLocal()
+    try:
+        for start, end in (first, second):
+            db.add(Capacity(tenant_id=tenant_id, service="Plumbing", start_dt=start, end_dt=end))
+        db.commit()
+        reconcile_slot_index()
+
+        # The claim goes to the window the index offers, not the table's earliest
+        slot_index.discard(tenant_id, "Plumbing", *first)
+        assert hold_slot(db, tenant_id, "Plumbing", holder=uuid.uuid4().hex) == second
+
+        # A window the index still offers but the table has filled is dropped, and the scan finds the free one
+        slot_index.add(tenant_id, "Plumbing", *second)
+        assert pick_slot(db, tenant_id, "Plumbing") == first
+        assert slot_index.first(tenant_id, "Plumbing") is None
+    finally:
+        slot_index.clear()
+        db.close()
+
+
+def test_reload_replays_changes_made_while_reading():
+    index = SlotIndex()
+    start = datetime(2030, 1, 1, 9)
+    a = (start, start + timedelta(hours=1))
+    b = (start + timedelta(hours=1), start + timedelta(hours=2))
+    row = SimpleNamespace(tenant_id="t_race", service="Plumbing", start_dt=a[0], end_dt=a[1], free=1)
+    index.load([row])
+
+    # The reconcile snapshot still shows window a free, but a claim takes it and a
+    # release frees window b before the snapshot is swapped in
+    index.begin_load()
+    index.discard("t_race", "Plumbing", *a)
+    index.add("t_race", "Plumbing", *b)
+    index.load([row])
+    assert index.first("t_race", "Plumbing", after=datetime(2029, 1, 1)) == b
+
+    # Without a reload in progress nothing is recorded
+    index.load([row])
+    assert index.first("t_race", "Plumbing", after=datetime(2029, 1, 1)) == a
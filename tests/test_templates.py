@@ -0,0 +1,102 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import init_db
+from app.models import Base
+from app.schemas import LeadIn
+from app.services import llm_client
+from app.services.llm import generate_booking_proposal
+from app.services.templates import TemplateError, compile_template, proposal_templates
+
+
+class TemplateBackend:
+    def __init__(self):
+        self.calls = []
+
+    def complete(self, operation, request):
+        self.calls.append(operation)
+        return json.dumps([
+            "Hi {name}! {service} is open {start}-{end}. Reply YES to confirm.",
+            "{name}, we have {start} for your {service}. Reply YES or RE-SCHEDULE.",
+            "Missing the slot entirely",
+        ])
+
+    async def complete_async(self, operation, request):
+        return self.complete(operation, request)
+
+
+def _lead(tenant_id: str) -> LeadIn:
+    return LeadIn(tenant_id=tenant_id, event_id=f"evt_{uuid.uuid4().hex[:8]}", name="Ana", phone="+15550001111", service="AC Repair")
+
+
+def test_compile_rejects_unknown_placeholders():
+    tpl = compile_template("Hi {name}, {start} to {end}")
+    assert tpl.render({"name": "Ana", "start": "Mon 9AM", "end": "10AM"}) == "Hi Ana, Mon 9AM to 10AM"
+    for body in ("Hi {phone} at {start}", "{start!r}", "{start:>10}", "no slot here"):
+        with pytest.raises(TemplateError):
+            compile_template(body)
+
+
+def test_proposal_uses_generated_templates_after_first_miss():
+    init_db(Base)
+    proposal_templates.clear()
+    backend = TemplateBackend()
+    llm_client.set_backend(backend)
+    try:
+        lead = _lead(f"t_tpl_{uuid.uuid4().hex[:8]}")
+        start = datetime(2030, 1, 7, 9, 0)
+        first = generate_booking_proposal(lead, start, start + timedelta(hours=1))
+        assert first.startswith("Hi Ana, we can do AC Repair")
+
+        # The miss queued one background generation; wait for it
+        proposal_templates._executor.submit(lambda: None).result(timeout=5)
+        assert backend.calls == ["proposal"]
+
+        text = generate_booking_proposal(lead, start, start + timedelta(hours=1))
+        assert "Mon Jan 07 9:00AM" in text and "Missing" not in text
+        assert text == generate_booking_proposal(lead, start, start + timedelta(hours=1))
+
+        # Stored templates survive a reload without another LLM call
+        proposal_templates.clear()
+        assert proposal_templates.lookup(lead.tenant_id, "AC Repair") == []
+        proposal_templates.refresh()
+        assert len(proposal_templates.lookup(lead.tenant_id, "AC Repair")) == 2
+        assert backend.calls == ["proposal"]
+    finally:
+        llm_client.set_backend(None)
+
+
+def test_config_templates_with_wildcards(tmp_path, monkeypatch):
+    init_db(Base)
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"*": {"*": ["{service} for {name}: {start}. Reply YES."]}}))
+    monkeypatch.setattr("app.services.templates.settings.proposal_templates_file", str(path))
+    proposal_templates.refresh()
+    try:
+        lead = _lead(f"t_cfg_{uuid.uuid4().hex[:8]}")
+        start = datetime(2030, 1, 7, 14, 30)
+        assert generate_booking_proposal(lead, start, start + timedelta(hours=1)) == "AC Repair for Ana: Mon Jan 07 2:30PM. Reply YES."
+    finally:
+        monkeypatch.undo()
+        proposal_templates.clear()
+
+
+def test_cold_store_reloads_on_the_generator_thread():
+    init_db(Base)
+    lead = _lead(f"t_cold_{uuid.uuid4().hex[:8]}")
+    proposal_templates.save(lead.tenant_id, "AC Repair", ["{name}: {service} at {start}. Reply YES."])
+    proposal_templates.clear()
+    backend = TemplateBackend()
+    llm_client.set_backend(backend)
+    try:
+        start = datetime(2030, 1, 7, 9, 0)
+        # The request path never reads the table; it sends the fallback and queues the reload
+        assert generate_booking_proposal(lead, start, start + timedelta(hours=1)).startswith("Hi Ana, we can do AC Repair")
+        proposal_templates._executor.submit(lambda: None).result(timeout=5)
+        assert backend.calls == []
+        assert generate_booking_proposal(lead, start, start + timedelta(hours=1)) == "Ana: AC Repair at Mon Jan 07 9:00AM. Reply YES."
+    finally:
+        llm_client.set_backend(None)
@@ -0,0 +1,86 @@
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from app.db import RoutingSession, SessionLocal, _make_engine, engine, init_db
+from app.main import app
+from app.models import Base, TenantPhone
+from app.services.tenants import TenantDirectory, tenant_directory
+
+
+client = TestClient(app)
+
+
+def _phone() -> str:
+    return f"+1555{uuid.uuid4().int % 10**7:07d}"
+
+
+def _map(phone: str, tenant_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.add(TenantPhone(phone=phone, tenant_id=tenant_id, created_at=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_directory_reloads_only_when_the_table_changes():
+    init_db(Base)
+    known, unknown = _phone(), _phone()
+    _map(known, "t_dir_a")
+    directory = TenantDirectory()
+    # Cold: a miss, never a database read on the request path
+    assert directory.resolve(known) is None
+    assert directory.reloads == 0
+    assert directory.refresh()
+    assert directory.resolve(known) == "t_dir_a"
+    assert directory.resolve(unknown) is None
+    assert directory.resolve(unknown) is None
+    assert (directory.hits, directory.misses, directory.reloads) == (1, 3, 1)
+
+    # No change: the poll is a single aggregate query and nothing reloads
+    assert not directory.refresh()
+    _map(unknown, "t_dir_b")
+    assert directory.resolve(unknown) is None  # until the next poll
+    assert directory.refresh()
+    assert directory.resolve(unknown) == "t_dir_b"
+    assert directory.reloads == 2
+
+
+def test_admin_reload_picks_up_in_place_edits():
+    init_db(Base)
+    phone = _phone()
+    _map(phone, "t_dir_old")
+    tenant_directory.reload()
+    db = SessionLocal()
+    try:
+        db.execute(update(TenantPhone).where(TenantPhone.phone == phone).values(tenant_id="t_dir_new"))
+        db.commit()
+    finally:
+        db.close()
+    # An edit keeps count, max id and created_at: invisible to the poll
+    assert not tenant_directory.refresh()
+    assert tenant_directory.resolve(phone) == "t_dir_old"
+
+    r = client.post("/admin/tenants/reload")
+    assert r.status_code == 200 and r.json()["phones"] >= 1
+    assert tenant_directory.resolve(phone) == "t_dir_new"
+
+
+def test_reload_reads_the_primary_not_a_lagging_replica(tmp_path, monkeypatch):
+    init_db(Base)
+    replica = _make_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(replica)
+    # A read replica that has not seen the new mapping yet
+    sessions = sessionmaker(bind=engine, class_=RoutingSession, info={"read_bind": replica})
+    monkeypatch.setattr("app.services.tenants.SessionLocal", sessions)
+    phone = _phone()
+    _map(phone, "t_dir_primary")
+
+    directory = TenantDirectory()
+    assert directory.refresh()
+    assert directory.resolve(phone) == "t_dir_primary"
+    assert not directory.refresh()